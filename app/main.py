@@ -1,21 +1,47 @@
 from pydantic import BaseModel
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .routes.api_router import api_router
 from contextlib import asynccontextmanager
-from .utilities.db import get_session, create_db_and_tables
+from fastapi.concurrency import run_in_threadpool
+from .utilities.db import create_db_and_tables, verify_schema_revision, warm_pools, dispose_async_engines, get_pool_stats
 from .settings import settings
+from .utilities import auth
+from .utilities.timing import TimingMiddleware
+from .utilities.response_cache import response_cache
+from .routes.item.service import item_writer
+from .utilities.events import broker
+from .utilities.jobs import job_runner
+from .utilities import metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Setup: Initialize before app starts
-    get_session()
-    create_db_and_tables()
+    if settings.SCHEMA_MANAGEMENT == "create_all":
+        await run_in_threadpool(create_db_and_tables)
+    elif settings.SCHEMA_MANAGEMENT == "verify":
+        await run_in_threadpool(verify_schema_revision)
+    await warm_pools(settings.DB_POOL_WARM)
+    broker.start()
+    await job_runner.start()
+    if settings.METRICS:
+        metrics.sample_pools(get_pool_stats)
     yield  # This is crucial - it yields control back to FastAPI
     # Cleanup: Code after this will run when app shuts down
     # You can add cleanup code here if needed
-    pass
+    await job_runner.stop()
+    metrics.stop_sampling_pools()
+    broker.stop()
+    await item_writer.close()
+    auth.password_hasher.shutdown()
+    metrics.mark_process_dead()
+    await dispose_async_engines()
+
+# orjson renders the already-validated response models several times faster
+# than the stdlib encoder
+default_response_class = ORJSONResponse if settings.FAST_JSON else JSONResponse
 
 app = FastAPI(
     title="Todo API",
@@ -24,7 +50,8 @@ app = FastAPI(
     openapi_url="/api/openapi.json",
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=default_response_class,
 )
 
 app.add_middleware(
@@ -35,6 +62,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Middleware added later wraps what was added before: timing covers CORS,
+# and metrics, added last, is outermost so its latency covers both
+if settings.REQUEST_TIMING:
+    app.add_middleware(
+        TimingMiddleware,
+        header=settings.SERVER_TIMING_HEADER,
+        slow_query_seconds=settings.SLOW_QUERY_SECONDS,
+        n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+    )
+if settings.METRICS:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 
 class Health(BaseModel): 
     message: str
@@ -43,4 +82,36 @@ class Health(BaseModel):
 def read_root():
     return {"message": "Hello World!"}
 
+@app.get("/health/pool", tags=["main"], summary="Connection Pool Stats", description="Checked-out, idle and overflow connections plus checkout wait times for each database pool.")
+def read_pool_stats():
+    return {"pools": get_pool_stats()}
+
+@app.get("/health/cache", tags=["main"], summary="Cache Stats", description="Size and hit/miss counters of the user and response caches.")
+def read_cache_stats():
+    return {"user_cache": auth.user_cache.stats(), "response_cache": response_cache.stats()}
+
+@app.get("/health/writes", tags=["main"], summary="Write Batching Stats", description="Batches, rows per batch and queue depth of the group-commit item writer.")
+def read_write_stats():
+    return {"item_writer": item_writer.stats()}
+
+@app.get("/health/events", tags=["main"], summary="Change Feed Stats", description="Open event streams, subscribed topics and published/delivered event counts.")
+def read_event_stats():
+    return {"broker": broker.stats()}
+
+@app.get("/health/jobs", tags=["main"], summary="Background Job Stats", description="Queued and running background jobs plus succeeded, failed, retried and rejected counts.")
+def read_job_stats():
+    return {"job_runner": job_runner.stats()}
+
+@app.get("/health/auth", tags=["main"], summary="Password Hashing Stats", description="Queue depth, rejections and queue wait of the bcrypt worker pool.")
+def read_auth_stats():
+    return {"password_hasher": auth.password_hasher.stats()}
+
+if settings.METRICS:
+    @app.get("/metrics", tags=["main"], summary="Prometheus Metrics", description="Request latency, in-flight requests, pool, auth failure, response cache and bcrypt queue metrics in the Prometheus text format.")
+    def read_metrics():
+        # Pool gauges are sampled at scrape time, not on every request
+        metrics.observe_pools(get_pool_stats())
+        content, content_type = metrics.render()
+        return Response(content=content, media_type=content_type)
+
 app.include_router(api_router)
\ No newline at end of file
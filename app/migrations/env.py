@@ -3,6 +3,9 @@ from sqlmodel import SQLModel
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from app.settings import settings
+# Registers every table on SQLModel.metadata; without it autogenerate
+# compares against an empty schema and emits drop_table for everything
+import app.models.user  # noqa: F401
 from alembic import context
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,30 @@
+"""group change sequence
+
+Revision ID: 6d2f9a4b8c17
+Revises: a8c4e1f7b362
+Create Date: 2026-10-19 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2f9a4b8c17'
+down_revision: Union[str, None] = 'a8c4e1f7b362'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('group', sa.Column('change_seq', sa.BigInteger(), nullable=True))
+    # Existing groups count as written at the current head
+    op.execute('UPDATE "group" SET change_seq = (SELECT value FROM changecounter)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('group') as batch_op:
+        batch_op.drop_column('change_seq')
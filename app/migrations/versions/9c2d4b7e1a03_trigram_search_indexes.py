@@ -0,0 +1,47 @@
+"""trigram search indexes
+
+Revision ID: 9c2d4b7e1a03
+Revises: c1e0b5a7d2f6
+Create Date: 2026-10-18 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2d4b7e1a03'
+down_revision: Union[str, None] = 'c1e0b5a7d2f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, column) served by pg_trgm for ILIKE '%q%' and similarity()
+TRGM_INDEXES = [
+    ('ix_item_name_trgm', 'item', 'name'),
+    ('ix_item_description_trgm', 'item', 'description'),
+    ('ix_group_name_trgm', 'group', 'name'),
+    ('ix_group_description_trgm', 'group', 'description'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Other backends use the in-process index in app/utilities/search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRGM_INDEXES:
+        op.create_index(
+            name, table, [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, column in TRGM_INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,56 @@
+"""change sequence from transaction ids
+
+Revision ID: a8c4e1f7b362
+Revises: f2b8d6a4c913
+Create Date: 2026-10-19 01:10:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c4e1f7b362'
+down_revision: Union[str, None] = 'f2b8d6a4c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = {
+    'changecounter': ('value', 'pruned_through'),
+    'item': ('change_seq',),
+    'groupuserlink': ('change_seq',),
+    'tombstone': ('change_seq',),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postgres transaction ids outgrow a 32-bit integer
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, type_=sa.BigInteger(), existing_type=sa.Integer())
+    with op.batch_alter_table('changecounter') as batch_op:
+        batch_op.add_column(sa.Column('xid_base', sa.BigInteger(), nullable=False, server_default='0'))
+    if op.get_bind().dialect.name == 'postgresql':
+        # Every later transaction id plus the base lands above the numbers
+        # the counter handed out, so existing sync tokens stay valid
+        op.execute(
+            'UPDATE changecounter SET xid_base = GREATEST(value + 1 - pg_current_xact_id()::text::bigint, 0)'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # The counter carries on above the numbers taken from transaction ids
+        op.execute(
+            'UPDATE changecounter SET value = GREATEST(value, pg_current_xact_id()::text::bigint + xid_base)'
+        )
+    with op.batch_alter_table('changecounter') as batch_op:
+        batch_op.drop_column('xid_base')
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, type_=sa.Integer(), existing_type=sa.BigInteger())
@@ -0,0 +1,35 @@
+"""lookup indexes
+
+Revision ID: b7d3e2f4a915
+Revises: 3f8a61c2d9b4
+Create Date: 2026-10-18 21:05:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3e2f4a915'
+down_revision: Union[str, None] = '3f8a61c2d9b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Login and every authenticated request look users up by email; unique
+    # so two accounts can't share one (fails if duplicates already exist)
+    op.create_index(op.f('ix_user_email'), 'user', ['email'], unique=True)
+    # Item listings/exports filter on the owner
+    op.create_index(op.f('ix_item_user_id'), 'item', ['user_id'], unique=False)
+    # user_id is the second column of the link's primary key, which can't
+    # serve "groups of a user"
+    op.create_index(op.f('ix_groupuserlink_user_id'), 'groupuserlink', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_groupuserlink_user_id'), table_name='groupuserlink')
+    op.drop_index(op.f('ix_item_user_id'), table_name='item')
+    op.drop_index(op.f('ix_user_email'), table_name='user')
@@ -0,0 +1,80 @@
+"""baseline schema
+
+Revision ID: c1e0b5a7d2f6
+Revises: 4efa81fabe5e
+Create Date: 2026-10-19 01:40:00.000000
+
+"""
+from typing import Sequence, Union
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1e0b5a7d2f6'
+down_revision: Union[str, None] = '4efa81fabe5e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# init was autogenerated against an empty metadata and only drops the old
+# integer-id tables; the app's create_all made the current ones. Create
+# them here where that never happened, so the later revisions have their
+# tables either way.
+#
+# An empty database has nothing for init to drop, so skip it there:
+#
+#     alembic stamp 4efa81fabe5e
+#     alembic upgrade head
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'user' not in existing:
+        op.create_table('user',
+        sa.Column('username', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('email', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('full_name', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('isActive', sa.Boolean(), nullable=False),
+        sa.Column('hashed_password', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_user_username'), 'user', ['username'], unique=True)
+    if 'group' not in existing:
+        op.create_table('group',
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('admin', sa.Uuid(), nullable=False),
+        sa.ForeignKeyConstraint(['admin'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'item' not in existing:
+        op.create_table('item',
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('is_done', sa.Boolean(), nullable=False),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('user_id', sa.Uuid(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'groupuserlink' not in existing:
+        op.create_table('groupuserlink',
+        sa.Column('group_id', sa.Uuid(), nullable=False),
+        sa.Column('user_id', sa.Uuid(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['group.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('group_id', 'user_id')
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('groupuserlink')
+    op.drop_table('item')
+    op.drop_table('group')
+    op.drop_index(op.f('ix_user_username'), table_name='user')
+    op.drop_table('user')
@@ -0,0 +1,41 @@
+"""revoked tokens
+
+Revision ID: d41c7a9e2b58
+Revises: b7d3e2f4a915
+Create Date: 2026-10-18 22:10:00.000000
+
+"""
+from typing import Sequence, Union
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c7a9e2b58'
+down_revision: Union[str, None] = 'b7d3e2f4a915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('revokedtoken',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('user_id', sa.Uuid(), nullable=True),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_revokedtoken_jti'), 'revokedtoken', ['jti'], unique=False)
+    # The denylist refresh reads rows revoked since its last pass
+    op.create_index(op.f('ix_revokedtoken_revoked_at'), 'revokedtoken', ['revoked_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_revokedtoken_revoked_at'), table_name='revokedtoken')
+    op.drop_index(op.f('ix_revokedtoken_jti'), table_name='revokedtoken')
+    op.drop_table('revokedtoken')
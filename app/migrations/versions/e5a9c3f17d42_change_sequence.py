@@ -0,0 +1,63 @@
+"""change sequence and tombstones
+
+Revision ID: e5a9c3f17d42
+Revises: d41c7a9e2b58
+Create Date: 2026-10-18 23:40:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c3f17d42'
+down_revision: Union[str, None] = 'd41c7a9e2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    counter = op.create_table('changecounter',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('pruned_through', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Existing rows become change 1, so a first sync (from 0) includes them
+    op.bulk_insert(counter, [{'id': 1, 'value': 1, 'pruned_through': 0}])
+    op.add_column('item', sa.Column('change_seq', sa.Integer(), nullable=True))
+    op.add_column('groupuserlink', sa.Column('change_seq', sa.Integer(), nullable=True))
+    op.execute('UPDATE item SET change_seq = 1')
+    op.execute('UPDATE groupuserlink SET change_seq = 1')
+    op.create_index('ix_item_user_id_change_seq', 'item', ['user_id', 'change_seq'], unique=False)
+    op.create_index('ix_groupuserlink_group_id_change_seq', 'groupuserlink', ['group_id', 'change_seq'], unique=False)
+    op.create_table('tombstone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Uuid(), nullable=True),
+    sa.Column('group_id', sa.Uuid(), nullable=True),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('change_seq', sa.Integer(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstone_user_id_change_seq', 'tombstone', ['user_id', 'change_seq'], unique=False)
+    op.create_index('ix_tombstone_group_id_change_seq', 'tombstone', ['group_id', 'change_seq'], unique=False)
+    # Pruning finds tombstones past SYNC_TOMBSTONE_DAYS
+    op.create_index(op.f('ix_tombstone_deleted_at'), 'tombstone', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tombstone_deleted_at'), table_name='tombstone')
+    op.drop_index('ix_tombstone_group_id_change_seq', table_name='tombstone')
+    op.drop_index('ix_tombstone_user_id_change_seq', table_name='tombstone')
+    op.drop_table('tombstone')
+    op.drop_index('ix_groupuserlink_group_id_change_seq', table_name='groupuserlink')
+    op.drop_index('ix_item_user_id_change_seq', table_name='item')
+    with op.batch_alter_table('groupuserlink') as batch_op:
+        batch_op.drop_column('change_seq')
+    with op.batch_alter_table('item') as batch_op:
+        batch_op.drop_column('change_seq')
+    op.drop_table('changecounter')
@@ -1,7 +1,94 @@
 from uuid import UUID
+from datetime import datetime, timezone
+from sqlalchemy import DDL, BigInteger, Index, event, select, text, update
 from sqlmodel import SQLModel, Field
 
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(moment: datetime) -> datetime:
+    # SQLite hands DateTime columns back naive; they were written as UTC
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+class ChangeCounter(SQLModel, table=True):
+    """
+    Change sequence bookkeeping, a single row: the last number handed out
+    (SQLite), the offset added to transaction ids (Postgres) and the number
+    up to which tombstones have been pruned
+    """
+    id: int = Field(default=1, primary_key=True)
+    value: int = Field(default=0, sa_type=BigInteger)
+    xid_base: int = Field(default=0, sa_type=BigInteger)
+    pruned_through: int = Field(default=0, sa_type=BigInteger)
+
+event.listen(ChangeCounter.__table__, "after_create", DDL("INSERT INTO changecounter (id, value, xid_base, pruned_through) VALUES (1, 0, 0, 0)"))
+
+
+def _xid_base(connection) -> int:
+    # Set once by the migration; kept per pooled DBAPI connection
+    base = connection.info.get("change_xid_base")
+    if base is None:
+        base = connection.execute(select(ChangeCounter.__table__.c.xid_base)).scalar_one()
+        connection.info["change_xid_base"] = base
+    return base
+
+
+def next_change_seq(connection) -> int:
+    """
+    The change sequence number of ``connection``'s current transaction;
+    every row the transaction writes gets that number.
+
+    On Postgres it is the transaction id (plus a fixed offset), so writers
+    take no lock for it; ``change_head`` only reports numbers below the
+    oldest transaction still running. SQLite runs one write transaction at
+    a time anyway, so there the first tracked write bumps a counter row.
+    """
+    transaction = connection.get_transaction()
+    cached = connection.info.get("change_seq")
+    if cached is not None and cached[0] is transaction:
+        return cached[1]
+    if connection.dialect.name == "postgresql":
+        xid = connection.execute(text("SELECT pg_current_xact_id()::text::bigint")).scalar_one()
+        seq = xid + _xid_base(connection)
+    else:
+        counter = ChangeCounter.__table__
+        connection.execute(update(counter).values(value=counter.c.value + 1))
+        seq = connection.execute(select(counter.c.value)).scalar_one()
+    connection.info["change_seq"] = (transaction, seq)
+    return seq
+
+
+def change_head(connection) -> int:
+    """
+    The highest change number below which every transaction has finished:
+    nothing can still commit with a number up to it, so a client that has
+    seen it never misses a change.
+
+    On Postgres that is just under the snapshot's oldest running
+    transaction, which a long-running write transaction (in any database
+    of the cluster) holds back until it ends.
+    """
+    if connection.dialect.name == "postgresql":
+        xmin = connection.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")).scalar_one()
+        return xmin - 1 + _xid_base(connection)
+    return connection.execute(select(ChangeCounter.__table__.c.value)).scalar_one()
+
+
+def _change_seq_default(context) -> int:
+    return next_change_seq(context.connection)
+
+
+# Column arguments of a tracked table's change_seq: stamped on insert and update
+CHANGE_SEQ_COLUMN = {"default": _change_seq_default, "onupdate": _change_seq_default}
+
+
 class GroupUserLink(SQLModel, table=True):
+    # Delta sync reads a group's memberships added after a sequence number
+    __table_args__ = (Index("ix_groupuserlink_group_id_change_seq", "group_id", "change_seq"),)
     group_id: UUID | None = Field(default=None, foreign_key="group.id", primary_key=True)
-    user_id: UUID | None = Field(default=None, foreign_key="user.id", primary_key=True)
+    # Second in the primary key, so "groups of a user" needs its own index
+    user_id: UUID | None = Field(default=None, foreign_key="user.id", primary_key=True, index=True)
+    change_seq: int | None = Field(default=None, sa_type=BigInteger, sa_column_kwargs=CHANGE_SEQ_COLUMN)
@@ -1,9 +1,11 @@
 from uuid import UUID, uuid4
+from datetime import datetime
 from pydantic import EmailStr
+from sqlalchemy import BigInteger
 from sqlmodel import SQLModel
 from typing import Optional, List
 from sqlmodel import Relationship, Field
-from . import GroupUserLink
+from . import CHANGE_SEQ_COLUMN, GroupUserLink, utcnow
 
 class GroupBase(SQLModel):
     name: str
@@ -15,10 +17,46 @@ class GroupInvite(SQLModel):
     message: Optional[str] = None
 
 
+class GroupMemberBulk(SQLModel):
+    user_ids: List[UUID] = []
+    emails: List[EmailStr] = []
+
+
 class Group(GroupBase, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     admin: UUID = Field(foreign_key="user.id")
+    # Bumped on every update; with updated_at it backs the ETag/Last-Modified validators
+    version: int = Field(default=1)
+    updated_at: datetime = Field(default_factory=utcnow, sa_column_kwargs={"onupdate": utcnow})
+    # Stamped on every write, so the search index can tell a renamed group
+    change_seq: Optional[int] = Field(default=None, sa_type=BigInteger, sa_column_kwargs=CHANGE_SEQ_COLUMN)
     users: List["User"] = Relationship(back_populates='groups', link_model=GroupUserLink)
 
 
-from .user import User
+class GroupRead(GroupBase):
+    id: UUID
+    admin: UUID
+    version: int
+    updated_at: datetime
+
+
+class GroupList(SQLModel):
+    groups: List[GroupRead]
+    next_cursor: Optional[str] = None
+
+
+class GroupSearch(SQLModel):
+    groups: List[GroupRead]
+    search_term: str
+
+
+class GroupMembers(SQLModel):
+    group_id: UUID
+    group_name: str
+    members: List["UserRead"]
+    admin_id: UUID
+    next_cursor: Optional[str] = None
+
+
+from .user import User, UserRead
+GroupMembers.model_rebuild()
@@ -1,7 +1,10 @@
-from typing import Annotated, Optional, ForwardRef
+from datetime import datetime
+from typing import Annotated, Optional, ForwardRef, List, Literal
 from pydantic import StringConstraints
+from sqlalchemy import BigInteger, Index
 from sqlmodel import SQLModel, Field, Relationship
 from uuid import UUID, uuid4
+from . import CHANGE_SEQ_COLUMN, utcnow
 
 class ItemBase(SQLModel):
     name: Annotated[str, StringConstraints(min_length=2, max_length=100)]
@@ -9,8 +12,37 @@ class ItemBase(SQLModel):
     is_done: bool
 
 class Item(ItemBase, table=True):
+    # Delta sync reads a user's items changed after a sequence number
+    __table_args__ = (Index("ix_item_user_id_change_seq", "user_id", "change_seq"),)
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    user_id: UUID | None = Field(default=None, foreign_key="user.id")
+    user_id: UUID | None = Field(default=None, foreign_key="user.id", index=True)
+    # Bumped on every update; with updated_at it backs the ETag/Last-Modified validators
+    version: int = Field(default=1)
+    updated_at: datetime = Field(default_factory=utcnow, sa_column_kwargs={"onupdate": utcnow})
+    # Sequence number of the last transaction that wrote the row (delta sync)
+    change_seq: int | None = Field(default=None, sa_type=BigInteger, sa_column_kwargs=CHANGE_SEQ_COLUMN)
     user: "User" = Relationship(back_populates="items")
 
+class ItemRead(ItemBase):
+    id: UUID
+    user_id: UUID | None = None
+    version: int
+    updated_at: datetime
+
+class ItemList(SQLModel):
+    items: List[ItemRead]
+    next_cursor: Optional[str] = None
+
+class ItemSearch(SQLModel):
+    items: List[ItemRead]
+    search_term: str
+
+class ItemOperation(SQLModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[UUID] = None
+    item: Optional[ItemBase] = None
+
+class ItemBatch(SQLModel):
+    operations: List[ItemOperation]
+
 from .user import User
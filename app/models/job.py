@@ -0,0 +1,42 @@
+from uuid import UUID, uuid4
+from datetime import datetime
+from sqlalchemy import JSON, Column
+from sqlmodel import SQLModel, Field
+from typing import Any, Optional
+from . import utcnow
+
+
+class JobBase(SQLModel):
+    kind: str
+    # queued -> running -> succeeded | failed (back to queued between retries)
+    status: str = "queued"
+    attempts: int = 0
+    progress: Optional[dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    result: Optional[dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
+
+
+class Job(JobBase, table=True):
+    """
+    A background job. Only stored as a row with JOB_STORE="database";
+    otherwise the runner keeps these objects in memory.
+    """
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    # Who may poll the job
+    user_id: Optional[UUID] = None
+    params: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    # A running job whose lease has passed was interrupted and is run again
+    locked_until: Optional[datetime] = None
+    status: str = Field(default="queued", index=True)
+
+
+class JobRead(JobBase):
+    id: UUID
+
+
+class JobAccepted(SQLModel):
+    job_id: UUID
+    status: str
+    status_url: str
@@ -0,0 +1,46 @@
+from uuid import UUID
+from datetime import datetime
+from sqlalchemy import BigInteger, Index
+from sqlmodel import SQLModel, Field
+from typing import Optional, List
+from . import CHANGE_SEQ_COLUMN, utcnow
+
+
+class Tombstone(SQLModel, table=True):
+    """
+    A deleted item (item_id set, user_id its owner) or a removed group
+    membership (group_id and the removed user_id), kept for delta sync for
+    SYNC_TOMBSTONE_DAYS
+    """
+    __table_args__ = (
+        Index("ix_tombstone_user_id_change_seq", "user_id", "change_seq"),
+        Index("ix_tombstone_group_id_change_seq", "group_id", "change_seq"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    item_id: Optional[UUID] = None
+    group_id: Optional[UUID] = None
+    user_id: UUID
+    change_seq: int | None = Field(default=None, sa_type=BigInteger, sa_column_kwargs=CHANGE_SEQ_COLUMN)
+    deleted_at: datetime = Field(default_factory=utcnow, index=True)
+
+
+class Membership(SQLModel):
+    group_id: UUID
+    user_id: UUID
+
+
+class SyncChanges(SQLModel):
+    items: List["ItemRead"]
+    deleted_item_ids: List[UUID]
+    members_added: List[Membership]
+    members_removed: List[Membership]
+    # Pass back as ?since= for the changes after these
+    token: str
+    has_more: bool
+    # The token is older than the kept tombstones: reload everything, then
+    # sync from ``token``
+    reset: bool = False
+
+
+from .item import ItemRead
+SyncChanges.model_rebuild()
@@ -1,12 +1,14 @@
 from sqlmodel import SQLModel, Field, Relationship
 from pydantic import BaseModel, EmailStr, StringConstraints
 from typing import Optional, Annotated, List
-from . import GroupUserLink
+from . import GroupUserLink, utcnow
+from datetime import datetime
 from uuid import UUID, uuid4
 
 class UserBase(SQLModel):
     username: Annotated[str, StringConstraints(min_length=4, max_length=64)] = Field(unique=True, index=True)
-    email: Optional[EmailStr] = None
+    # Looked up on every login and authenticated request
+    email: Optional[EmailStr] = Field(default=None, unique=True, index=True)
     full_name: Optional[Annotated[str, StringConstraints(min_length=6, max_length=64)]] = None
 
 class UserLogin(SQLModel):
@@ -24,7 +26,12 @@ class UserCreate(UserBase):
     password: Annotated[str, StringConstraints(min_length=8, max_length=64)]
 
 class UserRead(UserBase):
-    id: int
+    id: UUID
+    isActive: bool
+
+class ProtectedRead(SQLModel):
+    message: str
+    user: UserRead
 
 class Token(BaseModel):
     access_token: str
@@ -33,5 +40,19 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+class RevokedToken(SQLModel, table=True):
+    """
+    A revoked access token (jti set) or every token a user was issued up to
+    revoked_at (user_id set, on logout of a legacy token or deactivation).
+    Rows are only needed until expires_at, when the tokens die anyway.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    jti: Optional[str] = Field(default=None, index=True)
+    user_id: Optional[UUID] = Field(default=None, foreign_key="user.id")
+    revoked_at: datetime = Field(default_factory=utcnow, index=True)
+    expires_at: datetime
+
 from .item import Item
 from .group import Group
+from .sync import Tombstone
+from .job import Job
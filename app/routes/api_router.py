@@ -2,10 +2,16 @@ from fastapi import APIRouter
 from .item.controller import items_router 
 from .auth.controller import auth_router
 from .group.controller import group_router
+from .events.controller import events_router
+from .sync.controller import sync_router
+from .jobs.controller import jobs_router
 from ..settings import settings
 
 api_router = APIRouter(prefix=settings.API_V1_STR)
 
 api_router.include_router(auth_router)
 api_router.include_router(items_router)
-api_router.include_router(group_router)
\ No newline at end of file
+api_router.include_router(group_router)
+api_router.include_router(events_router)
+api_router.include_router(sync_router)
+api_router.include_router(jobs_router)
\ No newline at end of file
@@ -1,23 +1,27 @@
 from fastapi import APIRouter, Depends
 from .service import AuthService
 from ...utilities.tags import Tags
-from ...models.user import User, UserLogin, UserCreate
-from ...utilities.auth import get_user_from_token
-from ...utilities.db import get_session
+from ...models.user import User, UserLogin, UserCreate, ProtectedRead, Token
+from ...utilities.auth import get_current_user, auth_scheme
+from ...utilities.db import get_db
 
 auth_router = APIRouter(prefix="/auth", tags=[Tags.users])
 
 
 @auth_router.post("/register")
-def register(user: UserCreate, session = Depends(get_session)):
-    return AuthService.register(user, session)
+async def register(user: UserCreate, session = Depends(get_db)):
+    return await AuthService.register(user, session)
 
 
-@auth_router.post("/protected")
-def protected(user: User = Depends(get_user_from_token)):
+@auth_router.post("/protected", response_model=ProtectedRead)
+def protected(user: User = Depends(get_current_user)):
     return AuthService.protected(user)
 
-@auth_router.post("/login")
-def login(user: UserLogin, session = Depends(get_session)):
-    return AuthService.login(user, session)
+@auth_router.post("/login", response_model=Token)
+async def login(user: UserLogin, session = Depends(get_db)):
+    return await AuthService.login(user, session)
 
+
+@auth_router.post("/logout")
+async def logout(token = Depends(auth_scheme), user: User = Depends(get_current_user), session = Depends(get_db)):
+    return await AuthService.logout(token, user, session)
@@ -1,18 +1,19 @@
 from ...models.user import User, UserLogin
 from fastapi import status, HTTPException
 from sqlmodel import select, Session
-from ...utilities.auth import pwd_context, create_access_token
+from ...utilities.auth import password_hasher, create_access_token, decode_token
+from ...utilities.revocation import revoke_token, revoke_user
+from ...utilities.db import release_connection, run_service
+from ...utilities import metrics
 from ...settings import settings
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from ...models.user import User as UserModel 
 
 class AuthService:
     @classmethod
-    def register(cls, user: User, session: Session):
+    async def register(cls, user: User, session):
         # Check if user with this email already exists
-        existing_user = session.exec(select(UserModel).where(
-            UserModel.email == user.email
-        )).first()
+        existing_user = await run_service(session, cls._get_user_by_email, user.email)
         
         if existing_user:
             raise HTTPException(
@@ -20,11 +21,26 @@ class AuthService:
                 detail="Email already registered"
             )
         
+        # The lookup left a connection checked out; hand it back so none
+        # waits on bcrypt
+        await release_connection(session)
+        hashed_password = await password_hasher.hash(user.password)
+        return await run_service(session, cls._create_user, user, hashed_password)
+
+    @classmethod
+    def _get_user_by_email(cls, email: str, session: Session, active_only: bool = False):
+        query = select(UserModel).where(UserModel.email == email)
+        if active_only:
+            query = query.where(UserModel.isActive == True)
+        return session.exec(query).first()
+
+    @classmethod
+    def _create_user(cls, user: User, hashed_password: str, session: Session):
         # Create new user with hashed password
         new_user = UserModel(
             username=user.username,
             email=user.email,
-            hashed_password=pwd_context.hash(user.password),
+            hashed_password=hashed_password,
             full_name=user.full_name,
             isActive=True
         )
@@ -46,28 +62,50 @@ class AuthService:
         return {"message": "Protected route accessed", "user": user.model_dump(exclude="hashed_password")}
 
     @classmethod
-    def login(cls, user: UserLogin, session: Session):
-        user_data = session.exec(select(UserModel).where(
-            UserModel.email == user.email, 
-            UserModel.isActive == True
-        )).first()
+    async def login(cls, user: UserLogin, session):
+        user_data = await run_service(session, cls._get_user_by_email, user.email, active_only=True)
         
         if not user_data:
+            metrics.auth_failure("bad_credentials")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-            
-        does_pass_match = pwd_context.verify(user.password, user_data.hashed_password)
+
+        # Hand the connection back before waiting on bcrypt
+        await release_connection(session)
+        does_pass_match = await password_hasher.verify(user.password, user_data.hashed_password)
         if not does_pass_match:
+            metrics.auth_failure("bad_credentials")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        claims = {"email": user.email}
+        if settings.STATELESS_AUTH:
+            # Everything get_current_user needs to skip the user lookup
+            claims.update(
+                uid=str(user_data.id), username=user_data.username, full_name=user_data.full_name
+            )
         access_token = create_access_token(
-            data={"email": user.email}, expires_delta=access_token_expires
+            data=claims, expires_delta=access_token_expires
         )
         return {"access_token": access_token, "token_type": "bearer"}
+
+    @classmethod
+    async def logout(cls, token, user: User, session):
+        claims = decode_token(token)
+        await run_service(session, cls._revoke, claims, user.id)
+        return {"message": "Logged out"}
+
+    @classmethod
+    def _revoke(cls, claims: dict, user_id, session: Session):
+        if "jti" in claims:
+            revoke_token(session, claims["jti"], datetime.fromtimestamp(claims["exp"], timezone.utc))
+        else:
+            # Tokens issued before jti existed can only be revoked together
+            revoke_user(session, user_id)
+        session.commit()
@@ -0,0 +1,68 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from ...utilities.tags import Tags
+from ..group.service import GroupService
+from ...utilities.auth import authenticate, get_current_user
+from ...models.user import User
+from ...utilities.db import get_db, release_connection, run_service
+from ...utilities.events import broker
+from ...settings import settings
+
+events_router = APIRouter(prefix="/events", tags=[Tags.events])
+
+async def _group_ids(user: User, session) -> list:
+    group_ids = await run_service(session, GroupService.get_group_ids, user)
+    # A stream stays open for as long as the client listens; don't hold a
+    # connection for it
+    await release_connection(session)
+    return group_ids
+
+@events_router.get("/stream")
+async def stream_events(user: User = Depends(get_current_user), session = Depends(get_db)):
+    """
+    Server-sent events for changes to the user's items, groups and group
+    members. Each event names what changed; fetch it through the regular
+    endpoints. A "resync" event means events were dropped and everything
+    should be re-fetched.
+    """
+    group_ids = await _group_ids(user, session)
+
+    async def body():
+        subscription = broker.connect(user.id, group_ids)
+        try:
+            while True:
+                event = await subscription.get(settings.EVENTS_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@events_router.websocket("/ws")
+async def events_socket(websocket: WebSocket, token: str = Query(..., description="Access token"), session = Depends(get_db)):
+    """The same events as /events/stream, as JSON messages over a WebSocket"""
+    try:
+        user = await authenticate(token, session)
+    except HTTPException:
+        await release_connection(session)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    group_ids = await _group_ids(user, session)
+    await websocket.accept()
+    subscription = broker.connect(user.id, group_ids)
+    try:
+        while True:
+            event = await subscription.get(settings.EVENTS_KEEPALIVE_SECONDS)
+            await websocket.send_json(event if event is not None else {"type": "keepalive"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
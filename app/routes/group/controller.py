@@ -1,131 +1,169 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, Path, Query, Body
+from fastapi import APIRouter, Depends, Path, Query, Body, Request, Response
 from typing import Union, List, Optional
 from ...utilities.tags import Tags
-from ...utilities.auth import get_user_from_token
+from ...utilities.auth import get_current_user, read_from_replica
 from ...models.user import User
-from sqlmodel import Session, SQLModel
-from ...utilities.db import get_session
-from ...models.group import GroupBase, GroupInvite
+from sqlmodel import SQLModel
+from ...utilities.db import get_db, release_connection, run_service
+from ...utilities.jobs import accepted, job_runner
+from ...models.job import JobAccepted
+from ...models.group import GroupBase, GroupInvite, GroupMemberBulk, GroupList, GroupMembers, GroupRead, GroupSearch
 from .service import GroupService
+from ...utilities.etag import is_not_modified, make_etag, not_modified, validator_headers
+from ...settings import settings
 
 
 group_router = APIRouter(prefix="/groups", tags=[Tags.groups])
 
 # Group management routes
 @group_router.post("/", summary="Create a new group")
-def create_group(
+async def create_group(
     group: GroupBase,
-    user: User = Depends(get_user_from_token), 
-    session: Session = Depends(get_session)
+    user: User = Depends(get_current_user), 
+    session = Depends(get_db)
 ):
     """
     Create a new group with the current user as admin
     """
-    return GroupService.create_group(group, user, session)
+    return await run_service(session, GroupService.create_group, group, user)
 
-@group_router.get("/{group_id}", summary="Get a specific group")
-def read_group(
+@group_router.get("/{group_id}", response_model=GroupRead, summary="Get a specific group", dependencies=[Depends(read_from_replica)])
+async def read_group(
+    request: Request,
+    response: Response,
     group_id: UUID = Path(..., title="The ID of the group to retrieve"), 
-    user: User = Depends(get_user_from_token), 
-    session: Session = Depends(get_session)
+    user: User = Depends(get_current_user), 
+    session = Depends(get_db)
 ):
     """
     Get details of a specific group if the user is a member
     """
-    return GroupService.get_group(group_id, user, session)
+    group = await run_service(session, GroupService.get_group, group_id, user)
+    etag = make_etag("group", group.id, group.version)
+    if is_not_modified(request, etag, group.updated_at):
+        return not_modified(etag, group.updated_at)
+    response.headers.update(validator_headers(etag, group.updated_at))
+    return group
 
-@group_router.get("/", summary="Get all user groups")
-def read_all_groups(
+@group_router.get("/", response_model=GroupList, summary="Get all user groups", dependencies=[Depends(read_from_replica)])
+async def read_all_groups(
     q: Optional[str] = Query(None, title="Search query string"), 
-    user: User = Depends(get_user_from_token), 
-    session: Session = Depends(get_session)
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE, title="Page size"),
+    cursor: Optional[str] = Query(None, title="next_cursor from the previous page"),
+    user: User = Depends(get_current_user), 
+    session = Depends(get_db)
 ):
     """
-    Get all groups that the authenticated user is a member of
+    Get a page of the groups that the authenticated user is a member of
     """
-    return GroupService.get_all_groups(user, session, q)
+    return await run_service(session, GroupService.get_all_groups, user, q=q, limit=limit, cursor=cursor)
 
 @group_router.put("/{group_id}", summary="Update a group")
-def update_group(
+async def update_group(
     group_id: UUID = Path(..., title="The ID of the group to update"),
     group: GroupBase = Body(..., title="Updated group data"),
-    user: User = Depends(get_user_from_token), 
-    session: Session = Depends(get_session)
+    user: User = Depends(get_current_user), 
+    session = Depends(get_db)
 ):
     """
     Update a group if the user is the admin
     """
-    return GroupService.update_group(group_id, group, user, session)
+    return await run_service(session, GroupService.update_group, group_id, group, user)
 
-@group_router.delete("/{group_id}", summary="Delete a group")
-def delete_group(
+@group_router.delete("/{group_id}", status_code=202, response_model=JobAccepted, summary="Delete a group")
+async def delete_group(
+    response: Response,
     group_id: UUID = Path(..., title="The ID of the group to delete"),
-    user: User = Depends(get_user_from_token), 
-    session: Session = Depends(get_session)
+    user: User = Depends(get_current_user), 
+    session = Depends(get_db)
 ):
     """
-    Delete a group if the user is the admin
+    Delete a group if the user is the admin. The members are unlinked in
+    the background; poll the returned job
     """
-    return GroupService.delete_group(group_id, user, session)
+    await run_service(session, GroupService.check_admin, group_id, user, "delete this group")
+    await release_connection(session)
+    return accepted(await job_runner.enqueue("group.delete", user.id, group_id=group_id), response)
 
 # Group membership routes
 @group_router.post("/{group_id}/members/{user_id}", summary="Add user to group")
-def add_member(
+async def add_member(
     group_id: UUID = Path(..., title="The ID of the group"),
-    user_id: int = Path(..., title="The ID of the user to add"),
-    user: User = Depends(get_user_from_token),
-    session: Session = Depends(get_session)
+    user_id: UUID = Path(..., title="The ID of the user to add"),
+    user: User = Depends(get_current_user),
+    session = Depends(get_db)
 ):
     """
     Add a user to a group if the current user is the admin
     """
-    return GroupService.add_user_to_group(group_id, user_id, user, session)
+    return await run_service(session, GroupService.add_user_to_group, group_id, user_id, user)
+
+@group_router.post("/{group_id}/members", summary="Add many users to group")
+async def add_members(
+    group_id: UUID = Path(..., title="The ID of the group"),
+    members: GroupMemberBulk = Body(..., title="Users to add, by id and/or email"),
+    user: User = Depends(get_current_user),
+    session = Depends(get_db)
+):
+    """
+    Add many users to a group at once if the current user is the admin
+    """
+    return await run_service(session, GroupService.add_users_to_group, group_id, members, user)
 
 @group_router.delete("/{group_id}/members/{user_id}", summary="Remove user from group")
-def remove_member(
+async def remove_member(
     group_id: UUID = Path(..., title="The ID of the group"),
-    user_id: int = Path(..., title="The ID of the user to remove"),
-    user: User = Depends(get_user_from_token),
-    session: Session = Depends(get_session)
+    user_id: UUID = Path(..., title="The ID of the user to remove"),
+    user: User = Depends(get_current_user),
+    session = Depends(get_db)
 ):
     """
     Remove a user from a group if the current user is the admin
     """
-    return GroupService.remove_user_from_group(group_id, user_id, user, session)
+    return await run_service(session, GroupService.remove_user_from_group, group_id, user_id, user)
 
-@group_router.get("/{group_id}/members", summary="Get group members")
-def get_members(
+@group_router.get("/{group_id}/members", response_model=GroupMembers, summary="Get group members", dependencies=[Depends(read_from_replica)])
+async def get_members(
     group_id: UUID = Path(..., title="The ID of the group"),
-    user: User = Depends(get_user_from_token),
-    session: Session = Depends(get_session)
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE, title="Page size"),
+    cursor: Optional[str] = Query(None, title="next_cursor from the previous page"),
+    user: User = Depends(get_current_user),
+    session = Depends(get_db)
 ):
     """
-    Get all members of a group if the user is a member
+    Get a page of the members of a group if the user is a member
     """
-    return GroupService.get_group_members(group_id, user, session)
+    return await run_service(session, GroupService.get_group_members, group_id, user, limit=limit, cursor=cursor)
 
 # Group invitation route
-@group_router.post("/{group_id}/invite", summary="Invite user to group by email")
-def invite_to_group(
+@group_router.post("/{group_id}/invite", status_code=202, response_model=JobAccepted, summary="Invite user to group by email")
+async def invite_to_group(
+    response: Response,
     group_id: UUID = Path(..., title="The ID of the group"),
     invite_data: GroupInvite = Body(..., title="Invitation data"),
-    user: User = Depends(get_user_from_token),
-    session: Session = Depends(get_session)
+    user: User = Depends(get_current_user),
+    session = Depends(get_db)
 ):
     """
-    Invite a user to a group by email if the current user is the admin
+    Invite a user to a group by email if the current user is the admin.
+    The invitation is processed in the background; poll the returned job
     """
-    return GroupService.invite_user_to_group(group_id, invite_data, user, session)
+    await run_service(session, GroupService.check_admin, group_id, user, "send invitations to this group")
+    await release_connection(session)
+    job = await job_runner.enqueue("group.invite", user.id, group_id=group_id, email=invite_data.email, user_id=user.id)
+    return accepted(job, response)
 
 # Search route
-@group_router.get("/search/{search_term}", summary="Search for groups by name")
-def search_groups(
+@group_router.get("/search/{search_term}", response_model=GroupSearch, summary="Search for groups by name", dependencies=[Depends(read_from_replica)])
+async def search_groups(
     search_term: str = Path(..., title="The search term to look for in group names"),
-    user: User = Depends(get_user_from_token),
-    session: Session = Depends(get_session)
+    description: bool = Query(False, title="Also match group descriptions"),
+    limit: int = Query(20, ge=1, le=settings.MAX_PAGE_SIZE, title="Maximum number of results"),
+    user: User = Depends(get_current_user),
+    session = Depends(get_db)
 ):
     """
-    Search for groups by name that the user is a member of
+    Search for groups by name that the user is a member of, best match first
     """
-    return GroupService.search_groups(search_term, user, session)
+    return await run_service(session, GroupService.search_groups, search_term, user, description=description, limit=limit)
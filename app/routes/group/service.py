@@ -1,8 +1,56 @@
 from fastapi import HTTPException
 from typing import Union, List
-from ...models.group import Group, GroupBase
+from uuid import UUID
+from sqlalchemy import delete, func, insert
+from ...models import GroupUserLink
+from ...models.sync import Tombstone
+from ...models.group import Group, GroupBase, GroupInvite, GroupList, GroupMemberBulk, GroupMembers
 from sqlmodel import Session, select
 from ...models.user import User
+from ...settings import settings
+from ...utilities.db import insert_ignore
+from ...utilities.events import broker, group_topic, user_topic
+from ...utilities.jobs import job_runner
+from ...utilities.pagination import keyset_page
+from ...utilities.response_cache import response_cache
+from ...utilities.search import fallback_indexes, ranked_search, substring_filter
+from ...utilities.write_batch import run_in_own_session
+
+def _user_groups_head(scope):
+    """Last change to a user's groups: a rename, or the user joining one"""
+    _, user_id = scope
+    return (
+        select(func.max(Group.change_seq), func.max(GroupUserLink.change_seq))
+        .join(GroupUserLink, GroupUserLink.group_id == Group.id)
+        .where(GroupUserLink.user_id == user_id)
+    )
+
+fallback_indexes.register(Group, ("name", "description"), head=_user_groups_head)
+
+def _member_groups(user: User):
+    """Groups the user belongs to, via the link table's primary key"""
+    return select(Group).join(GroupUserLink, GroupUserLink.group_id == Group.id).where(GroupUserLink.user_id == user.id)
+
+def _user_groups(user, **_):
+    """Response cache scope of a user's group listings"""
+    return ("groups", user)
+
+def _group(group_id, **_):
+    """Response cache scope of everything cached about one group"""
+    return ("group", group_id)
+
+def _publish_members(event_type: str, group_id, user_ids):
+    user_ids = list(user_ids)
+    broker.publish(group_topic(group_id), event_type, group_id=group_id, user_ids=user_ids)
+    if event_type == "member.added":
+        # New members only follow the group's topic once told about it
+        for user_id in user_ids:
+            broker.publish(user_topic(user_id), event_type, group_id=group_id, user_ids=user_ids)
+
+def _invalidate_group(group_id, user_ids):
+    # A group's name shows up in each member's listing as well as its own
+    response_cache.invalidate(_group(group_id), *(_user_groups(user_id) for user_id in user_ids))
+
 
 class GroupService:
     @classmethod
@@ -17,7 +65,9 @@ class GroupService:
         
         session.add(group_data)
         session.commit()
+        response_cache.invalidate(_user_groups(user.id))
         session.refresh(group_data)
+        broker.publish(user_topic(user.id), "group.created", group_id=group_data.id, user_ids=[user.id])
         return {"group_name": group.name, "group_id": group_data.id}
     
     @classmethod
@@ -27,15 +77,16 @@ class GroupService:
         return group
     
     @classmethod
-    def get_all_groups(cls, user: User, session: Session, q: Union[str, None] = None):
-        """Get all groups that user is a member of"""
-        query = select(Group).where(Group.users.any(id=user.id))
+    @response_cache.cached(_user_groups, model=GroupList)
+    def get_all_groups(cls, user: User, session: Session, q: Union[str, None] = None, limit: int = 100, cursor: Union[str, None] = None):
+        """Get a page of the groups that user is a member of"""
+        query = _member_groups(user)
         
         if q:
-            query = query.where(Group.name.ilike(f"%{q}%"))
+            query = substring_filter(session, Group, query, q, scope=_user_groups(user.id))
             
-        groups = session.exec(query).all()
-        return {"groups": groups}
+        groups, next_cursor = keyset_page(session, query, Group.id, limit, cursor)
+        return {"groups": groups, "next_cursor": next_cursor}
     
     @classmethod
     def update_group(cls, group_id: int, group: GroupBase, user: User, session: Session):
@@ -53,37 +104,53 @@ class GroupService:
         update_data = group.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(group_data, key, value)
+        group_data.version += 1
             
         session.add(group_data)
         session.commit()
+        _invalidate_group(group_id, cls._member_ids(group_id, session))
+        broker.publish(group_topic(group_id), "group.updated", group_id=group_id)
         session.refresh(group_data)
         
         return {"group_name": group_data.name, "group_id": group_id}
     
     @classmethod
-    def delete_group(cls, group_id: int, user: User, session: Session):
-        """Delete group if user is the admin"""
-        group_data = cls._get_user_group(group_id, user, session)
-        
-        # Check if user is admin
-        if group_data.admin != user.id:
-            raise HTTPException(
-                status_code=403,
-                detail="Only the group admin can delete this group"
-            )
-            
-        session.delete(group_data)
+    def check_admin(cls, group_id: UUID, user: User, action: str, session: Session):
+        """Raise unless the user is the group's admin, before queueing a job on the group"""
+        cls._require_admin(cls._get_user_group(group_id, user, session), user, action)
+
+    @classmethod
+    def delete_members_batch(cls, group_id: UUID, limit: int, session: Session) -> int:
+        """Unlink up to ``limit`` members of a group being deleted; 0 once none are left"""
+        user_ids = list(session.exec(
+            select(GroupUserLink.user_id).where(GroupUserLink.group_id == group_id).limit(limit)
+        ).all())
+        if not user_ids:
+            return 0
+        session.execute(delete(GroupUserLink).where(
+            GroupUserLink.group_id == group_id,
+            GroupUserLink.user_id.in_(user_ids),
+        ))
+        session.execute(insert(Tombstone), [{"group_id": group_id, "user_id": user_id} for user_id in user_ids])
         session.commit()
-        return {"group_id": group_id}
+        _invalidate_group(group_id, user_ids)
+        return len(user_ids)
+
+    @classmethod
+    def delete_group(cls, group_id: UUID, session: Session) -> bool:
+        """Delete a group whose members are already unlinked"""
+        # A plain DELETE: session.delete() would load the members to unlink them
+        deleted = session.execute(delete(Group).where(Group.id == group_id)).rowcount
+        session.commit()
+        _invalidate_group(group_id, [])
+        broker.publish(group_topic(group_id), "group.deleted", group_id=group_id)
+        return bool(deleted)
     
     @classmethod
     def _get_user_group(cls, group_id: int, user: User, session: Session) -> Group:
         """Helper method to check if user is a member of the group"""
         group = session.exec(
-            select(Group).where(
-                Group.id == group_id,
-                Group.users.any(id=user.id)
-            )
+            _member_groups(user).where(Group.id == group_id)
         ).first()
         
         if not group:
@@ -94,16 +161,34 @@ class GroupService:
         return group
 
     @classmethod
-    def add_user_to_group(cls, group_id: int, user_to_add_id: int, user: User, session: Session):
-        """Add a user to a group if current user is admin"""
-        group = cls._get_user_group(group_id, user, session)
-        
-        # Check if user is admin
+    def _require_admin(cls, group: Group, user: User, action: str):
         if group.admin != user.id:
             raise HTTPException(
                 status_code=403,
-                detail="Only the group admin can add users to this group"
+                detail=f"Only the group admin can {action}"
             )
+
+    @classmethod
+    def _member_ids(cls, group_id: UUID, session: Session) -> list[UUID]:
+        return list(session.exec(select(GroupUserLink.user_id).where(GroupUserLink.group_id == group_id)).all())
+
+    @classmethod
+    def get_group_ids(cls, user: User, session: Session) -> list[UUID]:
+        """Ids of the groups the user belongs to"""
+        return list(session.exec(select(GroupUserLink.group_id).where(GroupUserLink.user_id == user.id)).all())
+
+    @classmethod
+    def _is_member(cls, group_id: UUID, user_id: UUID, session: Session) -> bool:
+        # Primary key lookup on the link row; never loads group.users
+        return session.get(GroupUserLink, (group_id, user_id)) is not None
+
+    @classmethod
+    def add_user_to_group(cls, group_id: UUID, user_to_add_id: UUID, user: User, session: Session):
+        """Add a user to a group if current user is admin"""
+        group = cls._get_user_group(group_id, user, session)
+        
+        # Check if user is admin
+        cls._require_admin(group, user, "add users to this group")
         
         # Get the user to add
         user_to_add = session.get(User, user_to_add_id)
@@ -113,28 +198,73 @@ class GroupService:
                 detail=f"User with id {user_to_add_id} not found"
             )
         
-        # Check if already in group
-        if user_to_add in group.users:
-            return {"message": f"User {user_to_add_id} is already in group {group_id}"}
-        
-        # Add user to group
-        group.users.append(user_to_add)
-        session.add(group)
+        # Add user to group; an existing link is left alone
+        added = insert_ignore(session, GroupUserLink, [{"group_id": group.id, "user_id": user_to_add.id}])
         session.commit()
+        if not added:
+            return {"message": f"User {user_to_add_id} is already in group {group_id}"}
+        _invalidate_group(group.id, [user_to_add_id])
+        _publish_members("member.added", group.id, [user_to_add_id])
         
         return {"message": f"User {user_to_add_id} added to group {group_id}"}
+
+    @classmethod
+    def add_users_to_group(cls, group_id: UUID, members: GroupMemberBulk, user: User, session: Session):
+        """Add many users, by id and/or email, to a group if current user is admin"""
+        group = cls._get_user_group(group_id, user, session)
+        cls._require_admin(group, user, "add users to this group")
+
+        if len(members.user_ids) + len(members.emails) > settings.MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {settings.MAX_BATCH_SIZE} users can be added at once."
+            )
+
+        # Resolve ids and emails with one IN query each
+        found = {}
+        if members.user_ids:
+            found.update((user_id, user_id) for user_id in session.exec(
+                select(User.id).where(User.id.in_(members.user_ids))
+            ).all())
+        if members.emails:
+            found.update((str(email), user_id) for email, user_id in session.exec(
+                select(User.email, User.id).where(User.email.in_(members.emails))
+            ).all())
+
+        requested = [*members.user_ids, *(str(email) for email in members.emails)]
+        not_found = [key for key in requested if key not in found]
+        user_ids = set(found.values())
+
+        already = set()
+        if user_ids:
+            already = set(session.exec(
+                select(GroupUserLink.user_id).where(
+                    GroupUserLink.group_id == group.id,
+                    GroupUserLink.user_id.in_(user_ids),
+                )
+            ).all())
+        added = insert_ignore(session, GroupUserLink, [
+            {"group_id": group.id, "user_id": user_id} for user_id in user_ids - already
+        ])
+        session.commit()
+        if added:
+            _invalidate_group(group.id, user_ids - already)
+            _publish_members("member.added", group.id, user_ids - already)
+
+        return {
+            "group_id": group_id,
+            "added": added,
+            "already_members": sorted(already, key=str),
+            "not_found": not_found,
+        }
     
     @classmethod
-    def remove_user_from_group(cls, group_id: int, user_to_remove_id: int, user: User, session: Session):
+    def remove_user_from_group(cls, group_id: UUID, user_to_remove_id: UUID, user: User, session: Session):
         """Remove a user from a group if current user is admin"""
         group = cls._get_user_group(group_id, user, session)
         
         # Check if user is admin
-        if group.admin != user.id:
-            raise HTTPException(
-                status_code=403,
-                detail="Only the group admin can remove users from this group"
-            )
+        cls._require_admin(group, user, "remove users from this group")
         
         # Get the user to remove
         user_to_remove = session.get(User, user_to_remove_id)
@@ -145,7 +275,7 @@ class GroupService:
             )
         
         # Check if in group
-        if user_to_remove not in group.users:
+        if not cls._is_member(group.id, user_to_remove.id, session):
             return {"message": f"User {user_to_remove_id} is not in group {group_id}"}
         
         # Check if trying to remove admin
@@ -156,66 +286,97 @@ class GroupService:
             )
         
         # Remove user from group
-        group.users.remove(user_to_remove)
-        session.add(group)
+        session.execute(delete(GroupUserLink).where(
+            GroupUserLink.group_id == group.id,
+            GroupUserLink.user_id == user_to_remove.id,
+        ))
+        session.add(Tombstone(group_id=group.id, user_id=user_to_remove.id))
         session.commit()
+        _invalidate_group(group.id, [user_to_remove_id])
+        _publish_members("member.removed", group.id, [user_to_remove_id])
         
         return {"message": f"User {user_to_remove_id} removed from group {group_id}"}
 
     @classmethod
-    def get_group_members(cls, group_id: int, user: User, session: Session):
-        """Get all members of a group if the user is a member"""
+    @response_cache.cached(_group, model=GroupMembers)
+    def get_group_members(cls, group_id: UUID, user: User, session: Session, limit: int = 100, cursor: Union[str, None] = None):
+        """Get a page of the members of a group if the user is a member"""
         group = cls._get_user_group(group_id, user, session)
+
+        # Page through the link table instead of loading group.users whole
+        query = select(User).join(GroupUserLink, GroupUserLink.user_id == User.id).where(GroupUserLink.group_id == group.id)
+        members, next_cursor = keyset_page(session, query, User.id, limit, cursor)
         
         return {
             "group_id": group_id, 
             "group_name": group.name, 
-            "members": group.users,
-            "admin_id": group.admin
+            "members": members,
+            "admin_id": group.admin,
+            "next_cursor": next_cursor,
         }
 
     @classmethod
-    def invite_user_to_group(cls, group_id: int, invite_data, user: User, session: Session):
-        """Invite a user to a group by email if current user is admin"""
+    def invite_user_to_group(cls, group_id: UUID, invite_data, user: User, session: Session):
+        """Invite a user to a group by email if current user is admin (run as a "group.invite" job)"""
         group = cls._get_user_group(group_id, user, session)
         
         # Check if user is admin
-        if group.admin != user.id:
-            raise HTTPException(
-                status_code=403,
-                detail="Only the group admin can send invitations to this group"
-            )
+        cls._require_admin(group, user, "send invitations to this group")
         
         # Get the user to invite by email
-        user_to_invite = session.exec(select(User).where(User.email == invite_data.email)).first()
-        if not user_to_invite:
+        user_to_invite_id = session.exec(select(User.id).where(User.email == invite_data.email)).first()
+        if not user_to_invite_id:
             return {"message": f"Invitation will be sent to {invite_data.email} once they register"}
             
-        # Check if already in group
-        if user_to_invite in group.users:
-            return {"message": f"User with email {invite_data.email} is already in group {group_id}"}
-        
-        # Add user to group directly if they exist
-        group.users.append(user_to_invite)
-        session.add(group)
+        # Add user to group directly if they exist; an existing link is left alone
+        added = insert_ignore(session, GroupUserLink, [{"group_id": group.id, "user_id": user_to_invite_id}])
         session.commit()
+        if not added:
+            return {"message": f"User with email {invite_data.email} is already in group {group_id}"}
+        _invalidate_group(group.id, [user_to_invite_id])
+        _publish_members("member.added", group.id, [user_to_invite_id])
         
         return {"message": f"User with email {invite_data.email} added to group {group_id}"}
 
     @classmethod
-    def search_groups(cls, search_term: str, user: User, session: Session):
-        """Search for groups by name that the user is a member of"""
+    def search_groups(cls, search_term: str, user: User, session: Session, description: bool = False, limit: int = 20):
+        """Search for groups by name (and optionally description) that the user is a member of, best match first"""
         if not search_term or len(search_term) < 2:
             raise HTTPException(
                 status_code=400, 
                 detail="Search term must be at least 2 characters long"
             )
             
-        query = select(Group).where(
-            Group.users.any(id=user.id),
-            Group.name.ilike(f"%{search_term}%")
-        )
-        
-        groups = session.exec(query).all()
+        query = _member_groups(user)
+        groups = ranked_search(session, Group, query, search_term, description, limit, scope=_user_groups(user.id))
         return {"groups": groups, "search_term": search_term}
 
+
+
+@job_runner.handler("group.delete", concurrency=2)
+async def _delete_group_job(job, group_id: str):
+    """Unlink the members JOB_BATCH_SIZE at a time, then drop the group"""
+    group_id = UUID(group_id)
+    removed = (job.progress or {}).get("members_removed", 0)
+    while True:
+        count = await run_in_own_session(GroupService.delete_members_batch, group_id, settings.JOB_BATCH_SIZE)
+        if not count:
+            break
+        removed += count
+        await job_runner.progress(job, members_removed=removed)
+    await run_in_own_session(GroupService.delete_group, group_id)
+    return {"group_id": group_id, "members_removed": removed}
+
+
+def _invite_as(group_id: UUID, email: str, user_id: UUID, session: Session):
+    # The job has the inviter's id; the admin check runs again against it
+    inviter = session.get(User, user_id)
+    if inviter is None or not inviter.isActive:
+        # Deleted or deactivated since the invite was queued: no retry helps
+        raise HTTPException(status_code=403, detail="The inviting user no longer exists or is inactive")
+    return GroupService.invite_user_to_group(group_id, GroupInvite(email=email), inviter, session)
+
+
+@job_runner.handler("group.invite")
+async def _invite_job(job, group_id: str, email: str, user_id: str):
+    return await run_in_own_session(_invite_as, UUID(group_id), email, UUID(user_id))
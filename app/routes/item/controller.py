@@ -1,32 +1,86 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import Union
-from ...models.item import ItemBase
+from ...models.item import ItemBase, ItemBatch, ItemList, ItemRead, ItemSearch
 from ...utilities.tags import Tags
 from .service import ItemService
-from ...utilities.auth import get_user_from_token
+from ...utilities.auth import get_current_user, read_from_replica
 from ...models.user import User
-from sqlmodel import Session
-from ...utilities.db import get_session
+from ...utilities.db import get_db, release_connection, run_service
+from ...utilities.export import ExportFormat, MEDIA_TYPES
+from ...utilities.etag import is_not_modified, make_etag, not_modified, validator_headers
+from ...settings import settings
 
-items_router = APIRouter(prefix="/items", tags=[Tags.items], dependencies=[Depends(get_user_from_token)])
+items_router = APIRouter(prefix="/items", tags=[Tags.items], dependencies=[Depends(get_current_user)])
 
 @items_router.post("/")
-def create_item(item: ItemBase, user: User = Depends(get_user_from_token), session: Session = Depends(get_session)):
-    return ItemService.create_item(item, user, session)
+async def create_item(item: ItemBase, user: User = Depends(get_current_user), session = Depends(get_db)):
+    if settings.ITEM_WRITE_BATCHING:
+        # Authentication may have checked out a connection; don't hold it
+        # while the batch that needs one fills
+        await release_connection(session)
+        return await ItemService.queue_item(item, user)
+    return await run_service(session, ItemService.create_item, item, user)
 
-@items_router.get("/{item_id}")
-def read_item(item_id: UUID, user: User = Depends(get_user_from_token), session: Session = Depends(get_session)):
-    return ItemService.get_item(item_id, user, session)
+@items_router.post("/batch")
+async def batch_items(batch: ItemBatch, user: User = Depends(get_current_user), session = Depends(get_db)):
+    return await run_service(session, ItemService.batch_items, batch, user)
 
-@items_router.get("/")
-def read_all_item(q: Union[str, None] = None, user: User = Depends(get_user_from_token), session: Session = Depends(get_session)):
-    return ItemService.get_all_items(user, session, q)
+@items_router.get("/export")
+async def export_items(format: ExportFormat = Query("ndjson"), user: User = Depends(get_current_user)):
+    return StreamingResponse(
+        ItemService.export_items(user, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="items.{format}"'},
+    )
+
+@items_router.post("/import")
+async def import_items(request: Request, user: User = Depends(get_current_user), session = Depends(get_db)):
+    """Import items from an NDJSON request body, one ItemBase object per line"""
+    return await ItemService.import_items(request.stream(), user, session)
+
+@items_router.get("/search", response_model=ItemSearch, dependencies=[Depends(read_from_replica)])
+async def search_items(
+    q: str = Query(..., min_length=2, description="Substring to look for"),
+    description: bool = Query(False, description="Also match item descriptions"),
+    limit: int = Query(20, ge=1, le=settings.MAX_PAGE_SIZE),
+    user: User = Depends(get_current_user),
+    session = Depends(get_db),
+):
+    return await run_service(session, ItemService.search_items, q, user, description=description, limit=limit)
+
+@items_router.get("/{item_id}", response_model=ItemRead, dependencies=[Depends(read_from_replica)])
+async def read_item(item_id: UUID, request: Request, response: Response, user: User = Depends(get_current_user), session = Depends(get_db)):
+    item = await run_service(session, ItemService.get_item, item_id, user)
+    etag = make_etag("item", item.id, item.version)
+    if is_not_modified(request, etag, item.updated_at):
+        return not_modified(etag, item.updated_at)
+    response.headers.update(validator_headers(etag, item.updated_at))
+    return item
+
+@items_router.get("/", response_model=ItemList, dependencies=[Depends(read_from_replica)])
+async def read_all_item(
+    request: Request,
+    response: Response,
+    q: Union[str, None] = None,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Union[str, None] = Query(None, description="next_cursor from the previous page"),
+    user: User = Depends(get_current_user),
+    session = Depends(get_db),
+):
+    # Compare against the collection fingerprint before any row is fetched
+    version = await run_service(session, ItemService.get_items_version, user)
+    etag = make_etag("items", user.id, version, q, limit, cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers.update(validator_headers(etag))
+    return await run_service(session, ItemService.get_all_items, user, q=q, limit=limit, cursor=cursor)
 
 @items_router.put("/{item_id}")
-def update_item(item_id: UUID, item: ItemBase, user: User = Depends(get_user_from_token), session: Session = Depends(get_session)):
-    return ItemService.update_item(item_id, item, user, session)
+async def update_item(item_id: UUID, item: ItemBase, user: User = Depends(get_current_user), session = Depends(get_db)):
+    return await run_service(session, ItemService.update_item, item_id, item, user)
 
 @items_router.delete("/{item_id}")
-def delete_item(item_id: UUID, user: User = Depends(get_user_from_token), session: Session = Depends(get_session)):
-    return ItemService.delete_item(item_id, user, session)
+async def delete_item(item_id: UUID, user: User = Depends(get_current_user), session = Depends(get_db)):
+    return await run_service(session, ItemService.delete_item, item_id, user)
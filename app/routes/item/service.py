@@ -1,8 +1,36 @@
+import json
+import logging
 from fastapi import HTTPException
-from typing import Union
-from ...models.item import Item, ItemBase
+from pydantic import ValidationError
+from typing import AsyncIterator, Union
+from uuid import uuid4
+from sqlalchemy import delete, func, insert, update
+from ...models import next_change_seq, utcnow
+from ...models.item import Item, ItemBase, ItemBatch, ItemList
+from ...models.sync import Tombstone
 from sqlmodel import Session, select
+from ...settings import settings
+from ...utilities.events import broker, user_topic
+from ...utilities.db import bulk_insert, remember_writer, run_service, stream_rows
+from ...utilities.export import ExportFormat, encode_batches
 from ...models.user import User
+from ...utilities.pagination import keyset_page
+from ...utilities.response_cache import response_cache
+from ...utilities.search import fallback_indexes, ranked_search, substring_filter
+from ...utilities.write_batch import WriteBatcher, run_in_own_session
+
+def _user_items_head(scope):
+    """Last change to a user's items, read off the (user_id, change_seq) index"""
+    _, user_id = scope
+    return select(func.max(Item.change_seq)).where(Item.user_id == user_id)
+
+fallback_indexes.register(Item, ("name", "description"), head=_user_items_head)
+
+logger = logging.getLogger(__name__)
+
+def _user_items(user, **_):
+    """Response cache scope of a user's item listings"""
+    return ("items", user)
 
 class ItemService:
     @classmethod
@@ -15,23 +43,71 @@ class ItemService:
             )
         return itemData
     
+    @classmethod
+    @response_cache.cached(_user_items)
+    def get_items_version(self, user: User, session: Session):
+        """Cheap fingerprint of the user's items: changes whenever any item is created, updated or deleted"""
+        return tuple(session.exec(
+            select(func.count(Item.id), func.max(Item.updated_at), func.coalesce(func.sum(Item.version), 0))
+            .where(Item.user_id == user.id)
+        ).one())
+
     @classmethod
     def create_item(self, item: ItemBase, user: User, session: Session):
         item_data = Item(
             **item.model_dump(),
             user_id=user.id
         )
+        item_id = item_data.id
         session.add(item_data)
         session.commit()
+        response_cache.invalidate(_user_items(user.id))
+        broker.publish(user_topic(user.id), "item.created", item_ids=[item_id])
         return {"item_name": item.name}
     
     @classmethod
-    def get_all_items(self, user: User, session: Session, q: Union[str, None] = None):
+    async def queue_item(self, item: ItemBase, user: User):
+        """create_item through the group-commit batcher (ITEM_WRITE_BATCHING)"""
+        await item_writer.submit({**item.model_dump(), "id": uuid4(), "user_id": user.id})
+        return {"item_name": item.name}
+
+    @classmethod
+    def _insert_batch(self, rows: list[dict], session: Session):
+        self._insert_chunk(rows, session=session)
+        # The batch's own session has no request user to pin to the primary
+        for user_id in {row["user_id"] for row in rows}:
+            remember_writer(user_id)
+
+    @classmethod
+    @response_cache.cached(_user_items, model=ItemList)
+    def get_all_items(self, user: User, session: Session, q: Union[str, None] = None, limit: int = 100, cursor: Union[str, None] = None):
         query = select(Item).where(Item.user_id == user.id)
         if q:
-            query = query.where(Item.name.ilike(f"%{q}%"))
-        items = session.exec(query).all()
-        return {"items": items}
+            query = substring_filter(session, Item, query, q, scope=_user_items(user.id))
+        items, next_cursor = keyset_page(session, query, Item.id, limit, cursor)
+        return {"items": items, "next_cursor": next_cursor}
+
+    @classmethod
+    def search_items(self, q: str, user: User, session: Session, description: bool = False, limit: int = 20):
+        if len(q) < 2:
+            raise HTTPException(
+                status_code=400,
+                detail="Search term must be at least 2 characters long"
+            )
+        query = select(Item).where(Item.user_id == user.id)
+        items = ranked_search(session, Item, query, q, description, limit, scope=_user_items(user.id))
+        return {"items": items, "search_term": q}
+
+    @classmethod
+    def export_items(self, user: User, format: ExportFormat = "ndjson"):
+        """Stream every item of the user, encoded batch by batch"""
+        columns = ["id", "name", "description", "is_done"]
+        query = (
+            select(*(getattr(Item, column) for column in columns))
+            .where(Item.user_id == user.id)
+            .order_by(Item.id)
+        )
+        return encode_batches(stream_rows(query, settings.EXPORT_BATCH_SIZE), columns, format)
 
     @classmethod
     def update_item(self, item_id: int, item: ItemBase, user: User, session: Session):
@@ -46,9 +122,12 @@ class ItemService:
         update_data = item.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(itemData, key, value)
+        itemData.version += 1
         
         session.add(itemData)
         session.commit()
+        response_cache.invalidate(_user_items(user.id))
+        broker.publish(user_topic(user.id), "item.updated", item_ids=[item_id])
         session.refresh(itemData)
         
         return {"item_name": itemData.name, "item_id": item_id}
@@ -62,5 +141,197 @@ class ItemService:
                 detail=f"Item with id {item_id} not found."
             )
         session.delete(itemData)
+        session.add(Tombstone(item_id=item_id, user_id=user.id))
+        session.commit()
+        response_cache.invalidate(_user_items(user.id))
+        broker.publish(user_topic(user.id), "item.deleted", item_ids=[item_id])
+        return {"item_id": item_id}
+    @classmethod
+    def batch_items(self, batch: ItemBatch, user: User, session: Session):
+        """
+        Apply many create/update/delete operations in one transaction.
+
+        Creates go out as a single executemany INSERT, updates as an
+        executemany UPDATE by primary key and deletes as one DELETE ... IN,
+        after a single IN (...) query checks which ids the user owns.
+        Updates are applied before deletes. Each operation gets its own
+        result; a failed one is skipped without aborting the rest.
+        """
+        operations = batch.operations
+        if len(operations) > settings.MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"A batch can hold at most {settings.MAX_BATCH_SIZE} operations."
+            )
+
+        results = [None] * len(operations)
+        creates, updates, deletes = [], [], []
+        for index, operation in enumerate(operations):
+            if operation.op == "create":
+                if operation.item is None:
+                    results[index] = {"index": index, "op": "create", "status": 400, "detail": "Missing item."}
+                    continue
+                item_id = uuid4()
+                creates.append({**operation.item.model_dump(), "id": item_id, "user_id": user.id})
+                results[index] = {"index": index, "op": "create", "status": 201, "item_id": item_id}
+            elif operation.id is None:
+                results[index] = {"index": index, "op": operation.op, "status": 400, "detail": "Missing id."}
+            elif operation.op == "update" and operation.item is None:
+                results[index] = {"index": index, "op": "update", "status": 400, "item_id": operation.id, "detail": "Missing item."}
+            else:
+                (updates if operation.op == "update" else deletes).append((index, operation))
+
+        # One ownership check for every id the batch touches
+        requested = {operation.id for _, operation in updates + deletes}
+        owned = {}
+        if requested:
+            owned = dict(session.exec(
+                select(Item.id, Item.version).where(Item.id.in_(requested), Item.user_id == user.id)
+            ).all())
+
+        update_rows, delete_ids = [], set()
+        for index, operation in updates + deletes:
+            if operation.id not in owned:
+                results[index] = {
+                    "index": index, "op": operation.op, "status": 404, "item_id": operation.id,
+                    "detail": f"Item with id {operation.id} not found."
+                }
+                continue
+            if operation.op == "update":
+                owned[operation.id] += 1
+                update_rows.append({
+                    **operation.item.model_dump(exclude_unset=True),
+                    "id": operation.id,
+                    "version": owned[operation.id],
+                })
+            else:
+                delete_ids.add(operation.id)
+            results[index] = {"index": index, "op": operation.op, "status": 200, "item_id": operation.id}
+
+        if creates:
+            session.execute(insert(Item), creates)
+        if update_rows:
+            session.execute(update(Item), update_rows)
+        if delete_ids:
+            session.execute(delete(Item).where(Item.id.in_(delete_ids), Item.user_id == user.id))
+            session.execute(insert(Tombstone), [{"item_id": item_id, "user_id": user.id} for item_id in delete_ids])
+        session.commit()
+
+        if creates or update_rows or delete_ids:
+            response_cache.invalidate(_user_items(user.id))
+        for event_type, item_ids in (
+            ("item.created", [row["id"] for row in creates]),
+            ("item.updated", [row["id"] for row in update_rows]),
+            ("item.deleted", list(delete_ids)),
+        ):
+            if item_ids:
+                broker.publish(user_topic(user.id), event_type, item_ids=item_ids)
+
+        return {
+            "results": results,
+            "created": len(creates),
+            "updated": len(update_rows),
+            "deleted": len(delete_ids),
+        }
+
+    @classmethod
+    async def import_items(self, body: AsyncIterator[bytes], user: User, session):
+        """
+        Import items from an NDJSON body as it arrives.
+
+        Lines are validated against ItemBase and inserted IMPORT_CHUNK_SIZE
+        at a time (COPY on Postgres), each chunk in its own transaction, so
+        memory holds one chunk whatever the upload size. Invalid lines are
+        reported by line number and skipped.
+        """
+        stats = {"lines": 0, "inserted": 0, "failed": 0}
+        errors = []
+        chunk = []
+
+        def fail(line_number, detail):
+            stats["failed"] += 1
+            if len(errors) < settings.IMPORT_MAX_ERRORS:
+                errors.append({"line": line_number, "detail": detail})
+
+        async def flush():
+            if chunk:
+                await run_service(session, self._insert_chunk, list(chunk))
+                stats["inserted"] += len(chunk)
+                chunk.clear()
+                logger.info("item import progress user=%s lines=%d inserted=%d failed=%d",
+                            user.id, stats["lines"], stats["inserted"], stats["failed"])
+
+        async for line_number, line in _ndjson_lines(body, settings.IMPORT_MAX_LINE_BYTES):
+            if line is None:
+                stats["lines"] += 1
+                fail(line_number, f"Line longer than {settings.IMPORT_MAX_LINE_BYTES} bytes.")
+                continue
+            if not line.strip():
+                continue
+            stats["lines"] += 1
+            try:
+                item = ItemBase.model_validate(json.loads(line))
+            except ValueError as e:
+                if isinstance(e, ValidationError):
+                    detail = e.errors(include_url=False, include_context=False, include_input=False)
+                else:
+                    detail = f"Invalid JSON: {e}"
+                fail(line_number, detail)
+                continue
+            chunk.append({**item.model_dump(), "id": uuid4(), "user_id": user.id})
+            if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+                await flush()
+        await flush()
+
+        return {**stats, "errors": errors, "errors_truncated": stats["failed"] > len(errors)}
+
+    @classmethod
+    def _insert_chunk(self, rows: list[dict], session: Session):
+        # COPY skips the Python-side column defaults, so stamp them here
+        stamped = {"version": 1, "updated_at": utcnow(), "change_seq": next_change_seq(session.connection())}
+        bulk_insert(session, Item, [{**row, **stamped} for row in rows])
         session.commit()
-        return {"item_id": item_id}
\ No newline at end of file
+        created = {}
+        for row in rows:
+            created.setdefault(row["user_id"], []).append(row["id"])
+        response_cache.invalidate(*(_user_items(user_id) for user_id in created))
+        for user_id, item_ids in created.items():
+            broker.publish(user_topic(user_id), "item.created", item_ids=item_ids)
+
+
+item_writer = WriteBatcher(
+    lambda rows: run_in_own_session(ItemService._insert_batch, rows),
+    max_rows=settings.ITEM_WRITE_BATCH_ROWS,
+    max_delay=settings.ITEM_WRITE_BATCH_DELAY_MS / 1000,
+    name="item create batch",
+)
+
+
+async def _ndjson_lines(body: AsyncIterator[bytes], max_line_bytes: int):
+    """
+    Yield (line number, line) from a byte stream without buffering more
+    than one line. Lines over ``max_line_bytes`` come back as None.
+    """
+    buffer = b""
+    line_number = 0
+    oversized = False
+    async for data in body:
+        buffer += data
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            line_number += 1
+            if oversized or len(line) > max_line_bytes:
+                oversized = False
+                yield line_number, None
+            else:
+                yield line_number, line.decode("utf-8", errors="replace")
+        if len(buffer) > max_line_bytes:
+            # Keep reading until the newline but drop the bytes
+            oversized = True
+            buffer = b""
+    if buffer or oversized:
+        line_number += 1
+        yield line_number, None if oversized or len(buffer) > max_line_bytes else buffer.decode("utf-8", errors="replace")
@@ -0,0 +1,22 @@
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Path
+from ...models.job import JobRead
+from ...utilities.tags import Tags
+from ...utilities.auth import get_current_user
+from ...models.user import User
+from ...utilities.jobs import job_runner
+
+jobs_router = APIRouter(prefix="/jobs", tags=[Tags.jobs])
+
+@jobs_router.get("/{job_id}", response_model=JobRead, summary="Get a background job's status")
+async def read_job(
+    job_id: UUID = Path(..., title="The ID of the job"),
+    user: User = Depends(get_current_user),
+):
+    """
+    Status, attempts, progress and result (or error) of a job the user started
+    """
+    job = await job_runner.get(job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail=f"Job with id {job_id} not found")
+    return job
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Union
+from ...models.sync import SyncChanges
+from ...utilities.tags import Tags
+from .service import SyncService
+from ...utilities.auth import get_current_user
+from ...models.user import User
+from ...utilities.db import get_db, run_service
+from ...settings import settings
+
+sync_router = APIRouter(prefix="/sync", tags=[Tags.sync])
+
+@sync_router.get("/", response_model=SyncChanges)
+async def get_changes(
+    since: Union[str, None] = Query(None, description="token from the previous sync; omit for everything"),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    user: User = Depends(get_current_user),
+    session = Depends(get_db),
+):
+    """
+    Changes since ``since``: call again with the returned token while
+    has_more is true. On reset, reload the lists and sync from the token.
+    """
+    if SyncService.prune_due():
+        await run_service(session, SyncService.prune_tombstones)
+    return await run_service(session, SyncService.get_changes, since, user, limit=limit)
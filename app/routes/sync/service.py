@@ -0,0 +1,118 @@
+import time
+from datetime import timedelta
+from fastapi import HTTPException
+from typing import Union
+from sqlalchemy import delete, func, or_, update
+from sqlmodel import Session, select
+from ...models import ChangeCounter, GroupUserLink, change_head, utcnow
+from ...models.item import Item
+from ...models.sync import Tombstone
+from ...models.user import User
+from ...settings import settings
+from ...utilities.pagination import decode_cursor, encode_cursor
+
+# How often a worker looks for tombstones past SYNC_TOMBSTONE_DAYS
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+def _since_seq(token: Union[str, None]) -> int:
+    if not token:
+        return 0
+    try:
+        return int(decode_cursor(token)["seq"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+
+class SyncService:
+    _next_prune = 0.0
+
+    @classmethod
+    def get_changes(cls, since: Union[str, None], user: User, session: Session, limit: int = 100):
+        """
+        Changes visible to the user after the ``since`` token, oldest first:
+        their items written or deleted, and members added to or removed
+        from their groups (their own joins and removals included).
+
+        Every row written by one transaction shares its sequence number, and
+        a page always ends on a transaction boundary, so resuming from the
+        returned token never skips or splits a transaction. A single
+        transaction larger than ``limit`` comes back whole, and so does the
+        membership of a group the user joined: its older links were never
+        sent to them.
+        """
+        since_seq = _since_seq(since)
+        # Everything numbered up to head has committed (see change_head)
+        head = change_head(session.connection())
+        pruned_through = session.exec(select(ChangeCounter.pruned_through)).one()
+        if 0 < since_seq < pruned_through:
+            return {
+                "items": [], "deleted_item_ids": [], "members_added": [], "members_removed": [],
+                "token": encode_cursor({"seq": head}), "has_more": False, "reset": True,
+            }
+
+        group_ids = select(GroupUserLink.group_id).where(GroupUserLink.user_id == user.id)
+        queries = {
+            "items": select(Item).where(Item.user_id == user.id),
+            "deleted_items": select(Tombstone).where(Tombstone.user_id == user.id, Tombstone.item_id.is_not(None)),
+            "members_added": select(GroupUserLink).where(GroupUserLink.group_id.in_(group_ids)),
+            "members_removed": select(Tombstone).where(
+                Tombstone.item_id.is_(None),
+                or_(Tombstone.group_id.in_(group_ids), Tombstone.user_id == user.id),
+            ),
+        }
+
+        def fetch(query, model, last, limit=None):
+            query = query.where(model.change_seq > since_seq, model.change_seq <= last).order_by(model.change_seq)
+            return session.exec(query if limit is None else query.limit(limit)).all()
+
+        models = {"items": Item, "deleted_items": Tombstone, "members_added": GroupUserLink, "members_removed": Tombstone}
+        # One extra row tells us whether a source has more
+        pages = {name: fetch(query, models[name], head, limit + 1) for name, query in queries.items()}
+        full = [rows[-1].change_seq for rows in pages.values() if len(rows) > limit]
+        through = head
+        if full:
+            # Stop before the first transaction some source may not have
+            # returned whole
+            through = min(full) - 1
+            if not any(row.change_seq <= through for rows in pages.values() for row in rows):
+                through = min(full)
+                pages = {name: fetch(query, models[name], through) for name, query in queries.items()}
+            pages = {name: [row for row in rows if row.change_seq <= through] for name, rows in pages.items()}
+
+        joined = [link.group_id for link in pages["members_added"] if link.user_id == user.id]
+        if joined:
+            existing = session.exec(
+                select(GroupUserLink)
+                .where(GroupUserLink.group_id.in_(joined), GroupUserLink.change_seq <= since_seq)
+                .order_by(GroupUserLink.change_seq)
+            ).all()
+            pages["members_added"] = [*existing, *pages["members_added"]]
+
+        return {
+            "items": pages["items"],
+            "deleted_item_ids": [row.item_id for row in pages["deleted_items"]],
+            "members_added": pages["members_added"],
+            "members_removed": pages["members_removed"],
+            "token": encode_cursor({"seq": through}),
+            "has_more": through < head,
+        }
+
+    @classmethod
+    def prune_due(cls) -> bool:
+        return time.monotonic() >= cls._next_prune
+
+    @classmethod
+    def prune_tombstones(cls, session: Session) -> int:
+        """Drop tombstones older than SYNC_TOMBSTONE_DAYS; tokens from before them now get a reset"""
+        cls._next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+        cutoff = utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+        through = session.exec(select(func.max(Tombstone.change_seq)).where(Tombstone.deleted_at < cutoff)).one()
+        if through is None:
+            return 0
+        pruned = session.execute(delete(Tombstone).where(Tombstone.change_seq <= through)).rowcount
+        session.execute(
+            update(ChangeCounter).where(ChangeCounter.pruned_through < through).values(pruned_through=through)
+        )
+        session.commit()
+        return pruned
@@ -37,6 +37,92 @@ class Settings(BaseSettings):
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
     FRONTEND_HOST: str = "http://localhost:5173"
+    # Authenticated-user cache in get_user_from_token (0 disables it). Per
+    # worker unless USER_CACHE_URL names a Redis-compatible server: a user
+    # deactivated or renamed through one worker is still accepted by the
+    # others until their entry is USER_CACHE_TTL seconds old
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL: float = 10
+    USER_CACHE_URL: str | None = None
+    # Issue tokens carrying the user id, token id and issue time, and trust
+    # them without a user lookup; revocations (logout, deactivation) reach
+    # other workers within REVOCATION_REFRESH_SECONDS
+    STATELESS_AUTH: bool = False
+    REVOCATION_REFRESH_SECONDS: float = 5
+    # Read-through cache of the item/group listings, off by default. With
+    # RESPONSE_CACHE_URL (a Redis-compatible server, redis://...) workers
+    # share entries and invalidations. A RESPONSE_CACHE_SIZE above 0 without
+    # it caches per worker instead: only safe with a single worker, as the
+    # others keep serving (and 304-ing) a stale listing for up to the TTL
+    RESPONSE_CACHE_SIZE: int = 0
+    RESPONSE_CACHE_TTL: float = 10
+    RESPONSE_CACHE_URL: str | None = None
+    # bcrypt process pool size (default: min(4, CPUs); 0 hashes in the threadpool)
+    PASSWORD_HASH_WORKERS: int | None = None
+    # Hash/verify calls admitted at once before auth routes answer 503
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Keyset pagination of list endpoints
+    DEFAULT_PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 1000
+    # Operations accepted by one POST /items/batch call
+    MAX_BATCH_SIZE: int = 1000
+    # Rows fetched per server-side cursor round trip by GET /items/export
+    EXPORT_BATCH_SIZE: int = 1000
+    # POST /items/import: rows per insert/commit, longest line accepted and
+    # how many line errors are echoed back
+    IMPORT_CHUNK_SIZE: int = 5000
+    IMPORT_MAX_LINE_BYTES: int = 64 * 1024
+    IMPORT_MAX_ERRORS: int = 100
+    # POST /items/ through group commit: concurrent creates share one
+    # INSERT/COMMIT of up to ITEM_WRITE_BATCH_ROWS rows, each request waiting
+    # at most ITEM_WRITE_BATCH_DELAY_MS for company (more rows per commit,
+    # fewer fsyncs, for up to that much latency)
+    ITEM_WRITE_BATCHING: bool = False
+    ITEM_WRITE_BATCH_ROWS: int = 256
+    ITEM_WRITE_BATCH_DELAY_MS: float = 2
+    # Change feed (/events): events buffered per subscriber before it is
+    # told to resync, keepalive interval, and a Redis-compatible server
+    # (redis://...) relaying events between workers
+    EVENTS_QUEUE_SIZE: int = 256
+    EVENTS_KEEPALIVE_SECONDS: float = 15
+    EVENTS_FANOUT_URL: str | None = None
+    # GET /sync: days deleted items and memberships are remembered; a
+    # client whose token is older must reload everything
+    SYNC_TOMBSTONE_DAYS: float = 30
+    # Background jobs (group deletion, invites): worker tasks per process,
+    # jobs waiting before new ones are refused with 503, attempts per job,
+    # first retry delay (doubling after each failure) and rows a job
+    # changes per transaction
+    JOB_WORKERS: int = 4
+    JOB_QUEUE_SIZE: int = 1000
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY_SECONDS: float = 1
+    JOB_BATCH_SIZE: int = 500
+    # "database" keeps jobs in the job table, so queued and interrupted
+    # ones survive a restart; running jobs hold a lease renewed per batch.
+    # Finished jobs are kept JOB_RETENTION_HOURS for polling. Run more
+    # than one worker process with "database": in-memory jobs are only
+    # known to the process that queued them, so GET /jobs/{id} answered by
+    # another one is a 404.
+    JOB_STORE: Literal["memory", "database"] = "memory"
+    JOB_LEASE_SECONDS: float = 60
+    JOB_RETENTION_HOURS: float = 24
+    # Render JSON responses with orjson (ORJSONResponse) app-wide
+    FAST_JSON: bool = False
+    # Per-request wall time and SQL count/time, logged to "app.requests";
+    # SERVER_TIMING_HEADER also returns them in a Server-Timing header
+    REQUEST_TIMING: bool = True
+    SERVER_TIMING_HEADER: bool = True
+    # SQL diagnostics on "app.sql" (need REQUEST_TIMING): statements slower
+    # than SLOW_QUERY_SECONDS, and statements repeated N_PLUS_ONE_THRESHOLD
+    # or more times in one request (0 turns the N+1 check off)
+    SLOW_QUERY_SECONDS: float | None = 0.5
+    N_PLUS_ONE_THRESHOLD: int = 0
+    # Log every statement through SQLAlchemy's echo
+    DB_ECHO: bool = False
+    # Prometheus metrics at /metrics (set PROMETHEUS_MULTIPROC_DIR in the
+    # environment to aggregate across uvicorn workers)
+    METRICS: bool = True
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
     BACKEND_CORS_ORIGINS: Annotated[
@@ -57,10 +143,44 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # Full SQLAlchemy URL overriding the POSTGRES_* settings,
+    # e.g. "sqlite:///./todo.db" for local runs and benchmarks
+    DATABASE_URL: str | None = None
+    # Hot standbys for read-only routes, as a JSON list or comma-separated.
+    # A user's reads stay on the primary for REPLICA_STICKY_SECONDS after
+    # they commit a write, so they see their own changes. Only the worker
+    # that took the write knows about it unless REPLICA_STICKY_URL names a
+    # Redis-compatible server the workers share; with several workers and
+    # no shared server, a read right after a write may miss it.
+    DATABASE_REPLICA_URLS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    REPLICA_STICKY_SECONDS: float = 5
+    REPLICA_STICKY_URL: str | None = None
+    # Serve requests from an async engine and AsyncSession instead of the
+    # threadpool-bound sync Session
+    DB_ASYNC: bool = False
+
+    # Connection pool (QueuePool) sizing
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds to wait for a free connection before giving up
+    DB_POOL_TIMEOUT: float = 30
+    # Recycle connections older than this many seconds (-1 disables)
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Open a fresh connection per checkout, for PgBouncer deployments
+    DB_NULL_POOL: bool = False
+    # Connections opened at startup so early requests don't wait on connects
+    DB_POOL_WARM: int = 0
+    # Schema handling at startup: create_all (reflects every table), verify
+    # (checks the Alembic revision is at head and refuses to start if not)
+    # or skip
+    SCHEMA_MANAGEMENT: Literal["create_all", "verify", "skip"] = "create_all"
 
     @computed_field  # type: ignore[prop-decorator]
     @property
-    def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
+    def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn | str:
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return MultiHostUrl.build(
             scheme="postgresql+psycopg",
             username=self.POSTGRES_USER,
@@ -1,12 +1,24 @@
-from passlib.context import CryptContext
-from fastapi.security import HTTPBearer
+import asyncio
+import os
+import threading
+import time
+from functools import cache
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi import HTTPException, status, Depends
 from typing import Optional
+from uuid import UUID, uuid4
 from datetime import datetime, timedelta, timezone
-from sqlmodel import select
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import select, Session
 from ..settings import settings
 import jwt
-from .db import get_session
+from .db import get_db, get_session, get_async_session, route_reads
+from .cache import CacheBackend, MemoryCacheBackend, NullCacheBackend, RedisCacheBackend
+from .timing import span
+from .revocation import denylist
+from . import metrics
 
 # These would be imported from your config or main module
 # You might want to move these to a dedicated config module
@@ -15,29 +27,250 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Built on first use: passlib (and its bcrypt backend
+# probe) is one of the slower imports, and only auth routes need it.
+@cache
+def _pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Authenticated users keyed by token subject (email). Entries hold column
+# values only, never session-bound instances. Invalidation on write reaches
+# every worker only with a shared backend (USER_CACHE_URL, or one swapped
+# in with set_user_cache_backend).
+def _user_cache_backend() -> CacheBackend:
+    if settings.USER_CACHE_URL:
+        return RedisCacheBackend.from_url(settings.USER_CACHE_URL, prefix="todo:user:", ttl=settings.USER_CACHE_TTL)
+    if settings.USER_CACHE_SIZE > 0:
+        return MemoryCacheBackend(max_size=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+    return NullCacheBackend()
+
+user_cache: CacheBackend = _user_cache_backend()
+
+def set_user_cache_backend(backend: CacheBackend):
+    global user_cache
+    user_cache = backend
 
 # auth scheme for token
 auth_scheme = HTTPBearer(description="Token")
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 # Authentication functions
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
+
+def _timed(fn, *args):
+    # Runs in the worker; the start time lets the caller derive queue wait
+    started_at = time.time()
+    return fn(*args), started_at
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing/verification in a process pool so it neither holds
+    the GIL nor ties up the threadpool serving other requests.
+
+    At most ``max_pending`` operations are admitted at once; anything beyond
+    that fails fast with 503 instead of queueing behind a login storm.
+    With ``workers=0`` the work runs in the threadpool instead.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Imported here so multiprocessing stays out of startup
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _admit(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                metrics.auth_failure("overloaded")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many authentication requests, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+
+    async def _run(self, fn, *args):
+        self._admit()
+        submitted_at = time.time()
+        try:
+            with span("bcrypt"):
+                if self.workers:
+                    loop = asyncio.get_running_loop()
+                    result, started_at = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+                else:
+                    result, started_at = await run_in_threadpool(_timed, fn, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+        queued = max(started_at - submitted_at, 0.0)
+        metrics.BCRYPT_QUEUE_SECONDS.observe(queued)
+        with self._lock:
+            self.completed += 1
+            self.queue_seconds_total += queued
+            self.queue_seconds_max = max(self.queue_seconds_max, queued)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_seconds_avg": self.queue_seconds_total / self.completed if self.completed else 0.0,
+                "queue_seconds_max": self.queue_seconds_max,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+password_hasher = PasswordHasher(
+    workers=(
+        settings.PASSWORD_HASH_WORKERS
+        if settings.PASSWORD_HASH_WORKERS is not None
+        else min(4, os.cpu_count() or 1)
+    ),
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    issued = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = issued + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = issued + timedelta(minutes=15)
+    # jti and a sub-second iat let a single token, or everything a user was
+    # issued before a given moment, be revoked
+    to_encode.setdefault("jti", uuid4().hex)
+    to_encode.update({"exp": expire, "iat": issued.timestamp()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def _credentials_exception(reason: str):
+    metrics.auth_failure(reason)
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_token(token) -> dict:
+    """Validate the JWT and return its claims; "email" is always present"""
+    # Move this import inside the function to avoid circular imports
+    from ..models.user import TokenData
+
+    try:
+        payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        email: str = payload.get("email")
+        if email is None:
+            raise _credentials_exception("invalid_token")
+        token_data = TokenData(email=email)
+        if "uid" in payload:
+            payload["uid"] = UUID(payload["uid"])
+    except (jwt.PyJWTError, ValueError, TypeError) as e:
+        raise _credentials_exception("invalid_token")
+    payload["email"] = token_data.email
+    return payload
+
+# Claims that let get_user_from_token skip the user lookup (STATELESS_AUTH)
+_STATELESS_CLAIMS = {"uid", "jti", "iat"}
+
+def _is_stateless(claims: dict) -> bool:
+    return settings.STATELESS_AUTH and _STATELESS_CLAIMS <= claims.keys()
+
+def _user_from_claims(claims: dict):
+    # Deactivated users are revoked, so a token that got past the denylist
+    # belongs to an active one
+    return _user_from_cache({
+        "id": claims["uid"],
+        "email": claims["email"],
+        "username": claims.get("username"),
+        "full_name": claims.get("full_name"),
+        "isActive": True,
+    })
+
+def _authenticated(session, claims: dict, user):
+    if denylist.is_revoked(claims.get("jti"), user.id, claims.get("iat")):
+        raise _credentials_exception("revoked")
+    # Lets the session tell the replica routing whose writes it commits
+    session.info["user_id"] = user.id
+    return user
+
+def _check_user(user):
+    if user is None:
+        raise _credentials_exception("unknown_user")
+        
+    # Check if user is active
+    if not user.isActive:
+        metrics.auth_failure("inactive_user")
+        raise HTTPException(status_code=400, detail="Inactive user")
+        
+    return user
+
+def _user_to_cache(user) -> dict:
+    # The password hash stays out of the cache; it lazy-loads if ever needed
+    return user.model_dump(exclude={"hashed_password"})
+
+def _user_from_cache(data: dict):
+    from ..models.user import User
+
+    # Rebuild as a detached, clean instance so merge(load=False) can attach
+    # it to the request session without a round trip. A shared backend
+    # hands the id back as a string.
+    user = User(**{**data, "id": UUID(str(data["id"]))})
+    make_transient_to_detached(user)
+    return user
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    from ..models.user import User
+
+    emails = session.info.setdefault("user_cache_invalidate", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            history = inspect(obj).attrs.email.history
+            emails.update(e for e in (obj.email, *history.deleted) if e)
+    # Drop now as well as on commit, so no request re-reads the old row
+    # from this cache while the transaction is open
+    for email in emails:
+        user_cache.delete(email)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for email in session.info.pop("user_cache_invalidate", ()):
+        user_cache.delete(email)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("user_cache_invalidate", None)
+
 def get_user_from_token(
     token: str = Depends(auth_scheme),
     session = Depends(get_session)  # This will be overridden when used
@@ -54,31 +287,75 @@ def get_user_from_token(
     """
 
     # Move this import inside the function to avoid circular imports
-    from ..models.user import TokenData, User
-    
+    from ..models.user import User
+
+    with span("jwt"):
+        claims = decode_token(token)
+    denylist.refresh_if_due(session)
+
+    if _is_stateless(claims):
+        return _authenticated(session, claims, session.merge(_user_from_claims(claims), load=False))
+
+    email = claims["email"]
+    cached = user_cache.get(email)
+    if cached is not None:
+        return _authenticated(session, claims, _check_user(session.merge(_user_from_cache(cached), load=False)))
 
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("email")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except jwt.PyJWTError as e:
-        raise credentials_exception
-    
     # Query the user from database
-    user = session.exec(select(User).where(User.email == token_data.email)).first()
-    if user is None:
-        raise credentials_exception
-        
-    # Check if user is active
-    if not user.isActive:
-        raise HTTPException(status_code=400, detail="Inactive user")
-        
-    return user
\ No newline at end of file
+    user = session.exec(select(User).where(User.email == email)).first()
+    if user is not None:
+        user_cache.set(email, _user_to_cache(user))
+    return _authenticated(session, claims, _check_user(user))
+
+async def get_user_from_token_async(
+    token: str = Depends(auth_scheme),
+    session = Depends(get_async_session)
+):
+    """
+    Async counterpart of `get_user_from_token`, reading the user through the
+    request's AsyncSession.
+    """
+
+    # Move this import inside the function to avoid circular imports
+    from ..models.user import User
+
+    with span("jwt"):
+        claims = decode_token(token)
+    if denylist.due():
+        await session.run_sync(denylist.refresh_if_due)
+
+    if _is_stateless(claims):
+        return _authenticated(session, claims, await session.merge(_user_from_claims(claims), load=False))
+
+    email = claims["email"]
+    cached = await user_cache.aget(email)
+    if cached is not None:
+        return _authenticated(session, claims, _check_user(await session.merge(_user_from_cache(cached), load=False)))
+
+    # Query the user from database
+    user = (await session.exec(select(User).where(User.email == email))).first()
+    if user is not None:
+        await user_cache.aset(email, _user_to_cache(user))
+    return _authenticated(session, claims, _check_user(user))
+
+# User dependency used by the routers, picked by Settings.DB_ASYNC
+get_current_user = get_user_from_token_async if settings.DB_ASYNC else get_user_from_token
+
+async def authenticate(token: str, session):
+    """
+    Resolve a bearer token to its user outside the HTTP security
+    dependency, e.g. for a WebSocket that passes it as a query parameter
+    """
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    if settings.DB_ASYNC:
+        return await get_user_from_token_async(credentials, session)
+    return await run_in_threadpool(get_user_from_token, credentials, session)
+
+async def read_from_replica(session = Depends(get_db), user = Depends(get_current_user)):
+    """
+    Dependency for read-only routes: the request's queries after
+    authentication go to a read replica, unless the user committed a write
+    in the last REPLICA_STICKY_SECONDS (so they read their own writes) or
+    no replica is configured
+    """
+    await route_reads(session, user.id)
@@ -0,0 +1,204 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+
+class CacheBackend:
+    """
+    Interface for the in-process caches.
+
+    Values must be plain data (dicts, lists, scalars) rather than ORM
+    objects, so a backend shared between workers can serialize them.
+    """
+
+    def get(self, key: Hashable) -> Any | None:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    async def aget(self, key: Hashable) -> Any | None:
+        """``get`` from a coroutine"""
+        return self.get(key)
+
+    async def aset(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """``set`` from a coroutine"""
+        self.set(key, value, ttl)
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-worker LRU cache with a TTL and hit/miss counters"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self).__name__,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class NullCacheBackend(CacheBackend):
+    """Caching switched off: every lookup misses"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": type(self).__name__}
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache kept in a Redis-compatible server (Redis, Valkey, KeyDB, ...), so
+    every worker shares one copy. Values are stored as JSON under
+    ``prefix``; ``client`` is anything with redis-py's get/set/delete and
+    scan_iter, e.g. ``redis.Redis.from_url(url)``. Entries expire after
+    ``ttl`` seconds; eviction is the server's maxmemory-policy (allkeys-lru
+    for an LRU cache). Hit/miss counters are per worker.
+
+    The client blocks on the network, so it is never called on the event
+    loop: services running under ``AsyncSession.run_sync`` (DB_ASYNC) hop
+    to the threadpool for each call, and coroutines use ``aget``/``aset``.
+    """
+
+    def __init__(self, client, prefix: str = "todo:", ttl: float = 60):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        # Only needed when a shared cache is configured
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    @staticmethod
+    def _call(fn, *args, **kwargs):
+        if in_greenlet():
+            # On the event loop inside run_sync: wait for the threadpool instead
+            return await_only(run_in_threadpool(fn, *args, **kwargs))
+        return fn(*args, **kwargs)
+
+    def get(self, key):
+        raw = self._call(self.client.get, self._key(key))
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        # UUIDs, datetimes and the like are stored the way responses render them
+        raw = json.dumps(jsonable_encoder(value))
+        self._call(self.client.set, self._key(key), raw, px=max(int(ttl * 1000), 1))
+
+    def delete(self, key):
+        self._call(self.client.delete, self._key(key))
+
+    def clear(self):
+        self._call(self._clear)
+
+    def _clear(self):
+        for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            self.client.delete(key)
+
+    async def aget(self, key):
+        return await run_in_threadpool(self.get, key)
+
+    async def aset(self, key, value, ttl=None):
+        await run_in_threadpool(self.set, key, value, ttl)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self).__name__,
+                "prefix": self.prefix,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,16 +1,391 @@
+import itertools
+import re
+from contextlib import AsyncExitStack, ExitStack
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import await_only
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..settings import settings
+from .cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend
+from .pool import PoolStats, pool_options
+from .timing import instrument_engine
 
 # SQLModel setup
 DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
-engine = create_engine(str(DATABASE_URL), echo=True)
+
+
+def _connect_args(url: str) -> dict:
+    # SQLite connections are handed between threadpool workers by FastAPI
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"check_same_thread": False}
+    return {}
+
+
+def _is_memory(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _async_url(url: str) -> str:
+    """Swap the sync driver in ``url`` for its asyncio counterpart"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    elif url.get_backend_name() == "postgresql":
+        # psycopg 3 ships a native asyncio implementation
+        url = url.set(drivername="postgresql+psycopg")
+    return url.render_as_string(hide_password=False)
+
+
+def _create_engine(url: str, name: str):
+    engine = create_engine(
+        url,
+        echo=settings.DB_ECHO,
+        connect_args=_connect_args(url),
+        **pool_options(settings, in_memory=_is_memory(url)),
+    )
+    instrument_engine(engine)
+    return engine, PoolStats(name).attach(engine)
+
+
+def _create_async_engine(url: str, name: str):
+    engine = create_async_engine(
+        _async_url(url),
+        echo=settings.DB_ECHO,
+        **pool_options(settings, is_async=True, in_memory=_is_memory(url)),
+    )
+    instrument_engine(engine)
+    return engine, PoolStats(name).attach(engine)
+
+
+engine, pool_stats = _create_engine(str(DATABASE_URL), "primary")
+
+# Only built when async mode is on so the sync path never needs an async driver
+async_engine = None
+async_pool_stats = None
+if settings.DB_ASYNC:
+    async_engine, async_pool_stats = _create_async_engine(str(DATABASE_URL), "primary-async")
+
+# Read replicas, in the same flavour as the engine serving requests
+replica_engines = []
+replica_pool_stats = []
+for index, url in enumerate(settings.DATABASE_REPLICA_URLS):
+    if settings.DB_ASYNC:
+        replica, stats = _create_async_engine(url, f"replica-{index}-async")
+    else:
+        replica, stats = _create_engine(url, f"replica-{index}")
+    replica_engines.append(replica)
+    replica_pool_stats.append(stats)
+_next_replica = itertools.cycle(range(len(replica_engines)))
+
+
+def get_pool_stats() -> list[dict]:
+    """Snapshot of every engine pool serving requests"""
+    return [
+        stats.snapshot()
+        for stats in (pool_stats, async_pool_stats, *replica_pool_stats) if stats is not None
+    ]
 
 # Create tables on startup
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations" / "versions"
+_REVISION = re.compile(r"^revision\b[^=]*=\s*['\"](\w+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision\b[^=]*=(.*)$", re.MULTILINE)
+
+
+def migration_heads() -> set[str]:
+    """
+    Head revisions of the migration scripts, read from their
+    revision/down_revision lines. Importing alembic.script to ask it costs
+    more than the whole create_all this check replaces.
+    """
+    revisions, parents = set(), set()
+    for script in MIGRATIONS_DIR.glob("*.py"):
+        source = script.read_text()
+        revision = _REVISION.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down = _DOWN_REVISION.search(source)
+        if down is not None:
+            parents.update(re.findall(r"['\"](\w+)['\"]", down.group(1)))
+    return revisions - parents
+
+
+def verify_schema_revision():
+    """
+    Check the database is at the Alembic head revision, instead of
+    reflecting every table like create_all: a single query against
+    alembic_version.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError, ProgrammingError
+
+    heads = migration_heads()
+    try:
+        with engine.connect() as connection:
+            current = set(connection.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    except (OperationalError, ProgrammingError):
+        current = set()
+    if current != heads:
+        raise SchemaOutOfDate(
+            f"Database is at revision {sorted(current) or 'none'}, expected {sorted(heads)}; "
+            "run `alembic upgrade head` (on an empty database, `alembic stamp 4efa81fabe5e` first)"
+        )
+
+
+def _warm_count(pool, connections: int) -> int:
+    return min(connections, pool.size()) if isinstance(pool, QueuePool) else 0
+
+
+async def warm_pools(connections: int):
+    """
+    Open ``connections`` connections (capped at the pool size) up front in
+    the primary pool and each replica's, so the first requests after a boot
+    don't each pay for a connect. Only QueuePools keep connections around;
+    other pools are left alone.
+    """
+    if async_engine is not None:
+        async with AsyncExitStack() as stack:
+            for pool_engine in (async_engine, *replica_engines):
+                for _ in range(_warm_count(pool_engine.pool, connections)):
+                    await stack.enter_async_context(pool_engine.connect())
+        return
+    counts = [(pool_engine, _warm_count(pool_engine.pool, connections)) for pool_engine in (engine, *replica_engines)]
+    if not any(count for _, count in counts):
+        return
+
+    def connect_all():
+        with ExitStack() as stack:
+            for pool_engine, count in counts:
+                for _ in range(count):
+                    stack.enter_context(pool_engine.connect())
+
+    await run_in_threadpool(connect_all)
+
+
+async def dispose_async_engines():
+    if async_engine is None:
+        return
+    for pool_engine in (async_engine, *replica_engines):
+        await pool_engine.dispose()
+
+
+class RoutingSession(Session):
+    """
+    Session whose reads go to the replica ``route_reads`` picked for it,
+    if any. Flushes always use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing:
+            return replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+def _recent_writers() -> CacheBackend:
+    if settings.REPLICA_STICKY_URL:
+        return RedisCacheBackend.from_url(
+            settings.REPLICA_STICKY_URL, prefix="todo:writer:", ttl=settings.REPLICA_STICKY_SECONDS
+        )
+    return MemoryCacheBackend(max_size=100_000, ttl=settings.REPLICA_STICKY_SECONDS)
+
+
+# Users who committed a write lately; their reads stay on the primary until
+# the replicas have caught up. Shared by the workers with REPLICA_STICKY_URL,
+# otherwise only the worker that took the write knows.
+recent_writers = _recent_writers()
+
+
+async def route_reads(session, user_id=None):
+    """
+    Send the rest of ``session``'s reads to a replica (round robin), unless
+    there is none or ``user_id`` wrote within REPLICA_STICKY_SECONDS
+    """
+    if not replica_engines or (user_id is not None and await recent_writers.aget(user_id)):
+        return
+    # Whatever ran so far (authentication) used the primary; hand that
+    # connection back rather than hold it next to the replica's
+    await release_connection(session)
+    replica = replica_engines[next(_next_replica)]
+    session.info["replica"] = getattr(replica, "sync_engine", replica)
+
+
+def mark_write(session):
+    """Note a write the ORM events can't see (e.g. COPY on the raw connection)"""
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _flushed(session, flush_context):
+    mark_write(session)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _executed(orm_execute_state):
+    if not orm_execute_state.is_select:
+        mark_write(orm_execute_state.session)
+
+
+def remember_writer(user_id):
+    """Keep ``user_id``'s reads on the primary for REPLICA_STICKY_SECONDS"""
+    if replica_engines:
+        recent_writers.set(user_id, True)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session):
+    # get_current_user stores the request's user id on its session
+    user_id = session.info.get("user_id")
+    if session.info.pop("wrote", False) and user_id is not None:
+        remember_writer(user_id)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
+
 # Database dependency
 def get_session():
-    with Session(engine) as session:
+    with RoutingSession(engine) as session:
+        yield session
+
+# Async database dependency
+async def get_async_session():
+    # Objects outlive the commit inside the request, so don't expire them
+    # (reloading an expired attribute outside the greenlet would fail)
+    async with AsyncSession(async_engine, expire_on_commit=False, sync_session_class=RoutingSession) as session:
         yield session
+
+# Session dependency used by the routers, picked by Settings.DB_ASYNC
+get_db = get_async_session if settings.DB_ASYNC else get_session
+
+
+def stream_rows(statement, batch_size: int = 1000):
+    """
+    Iterate the rows of ``statement`` in batches from a server-side cursor.
+
+    Opens its own session, since a streamed response body outlives the
+    request's session dependency. Yields lists of rows; the iterator is
+    async in async mode and sync (run in the threadpool by Starlette)
+    otherwise. Memory stays at about one batch whatever the row count.
+    """
+    statement = statement.execution_options(yield_per=batch_size)
+    if settings.DB_ASYNC:
+        return _stream_rows_async(statement)
+    return _stream_rows_sync(statement)
+
+
+def _stream_rows_sync(statement):
+    with Session(engine) as session:
+        for partition in session.execute(statement).partitions():
+            yield partition
+
+
+async def _stream_rows_async(statement):
+    async with AsyncSession(async_engine) as session:
+        result = await session.stream(statement)
+        async for partition in result.partitions():
+            yield partition
+
+
+def bulk_insert(session: Session, model, rows: list[dict]):
+    """
+    Insert many rows of ``model`` in one round trip.
+
+    On Postgres with psycopg this is a COPY ... FROM STDIN; elsewhere an
+    executemany INSERT. Rows must all have the same keys. ORM events are
+    bypassed either way, and COPY also skips Python-side column defaults,
+    so rows carry every value a NOT NULL column needs.
+    """
+    if not rows:
+        return
+    connection = session.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg":
+        columns = list(rows[0])
+        table = model.__table__
+        statement = 'COPY "{}" ({}) FROM STDIN'.format(
+            table.name, ", ".join(f'"{column}"' for column in columns)
+        )
+        values = [tuple(row[column] for column in columns) for row in rows]
+        driver_connection = connection.connection.driver_connection
+        mark_write(session)
+        if connection.dialect.is_async:
+            # Inside run_sync: hand the async COPY back to the event loop
+            await_only(_copy_async(driver_connection, statement, values))
+        else:
+            with driver_connection.cursor() as cursor:
+                with cursor.copy(statement) as copy:
+                    for value in values:
+                        copy.write_row(value)
+        return
+    session.execute(insert(model), rows)
+
+
+def insert_ignore(session: Session, model, rows: list[dict]) -> int:
+    """
+    INSERT ... ON CONFLICT DO NOTHING for many rows in one statement.
+
+    Rows that would violate a unique/primary key are skipped by the
+    database, so concurrent inserts of the same row can't fail. Returns the
+    number of rows actually inserted.
+    """
+    if not rows:
+        return 0
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"insert_ignore is not supported on {dialect}")
+    statement = dialect_insert(model.__table__).values(rows).on_conflict_do_nothing()
+    return session.execute(statement).rowcount
+
+
+async def _copy_async(driver_connection, statement: str, values: list[tuple]):
+    async with driver_connection.cursor() as cursor:
+        async with cursor.copy(statement) as copy:
+            for value in values:
+                await copy.write_row(value)
+
+
+async def release_connection(session):
+    """
+    End ``session``'s transaction and hand its connection back to the pool,
+    e.g. before the request waits on work done in another session. Loaded
+    objects stay usable, detached.
+    """
+    if isinstance(session, AsyncSession):
+        await session.close()
+    elif session.in_transaction():
+        await run_in_threadpool(session.close)
+
+
+async def run_service(session, fn, /, *args, **kwargs):
+    """
+    Await a service call against either session flavour.
+
+    Services are written against the sync ``Session`` API. With an
+    ``AsyncSession`` the call runs through ``run_sync`` so its IO is awaited
+    on the event loop; with a plain ``Session`` it goes to the threadpool just
+    like a sync ``def`` route would.
+    """
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(lambda sync_session: fn(*args, session=sync_session, **kwargs))
+    return await run_in_threadpool(fn, *args, session=session, **kwargs)
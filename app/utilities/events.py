@@ -0,0 +1,228 @@
+"""
+In-process change event broker for the push endpoints (/events).
+
+Services publish after they commit, to a topic: ("user", id) for a user's
+items and their own group memberships, ("group", id) for a group's
+metadata and members. Each connected client is a Subscription holding the
+topics it may see and a bounded queue; an idle subscriber costs a set
+entry per topic and an empty deque, so a worker can hold tens of
+thousands. A subscriber that falls ``queue_size`` events behind gets a
+single "resync" event in place of what was dropped and should re-fetch.
+
+Publishing goes through a fan-out backend. LocalFanout delivers within
+this worker; RedisFanout (EVENTS_FANOUT_URL) relays every event through
+Redis pub/sub so subscribers on any worker receive it.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from uuid import UUID
+
+from fastapi.encoders import jsonable_encoder
+
+from ..settings import settings
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {"type": "resync"}
+
+
+def user_topic(user_id) -> tuple:
+    return ("user", str(user_id))
+
+
+def group_topic(group_id) -> tuple:
+    return ("group", str(group_id))
+
+
+class Subscription:
+    """One connected client: its topics and the events waiting for it"""
+
+    def __init__(self, broker: "Broker", user_id: UUID, queue_size: int):
+        self.broker = broker
+        self.user_id = str(user_id)
+        self.topics: set[tuple] = set()
+        self._events: deque = deque()
+        self._queue_size = queue_size
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, event: dict):
+        if len(self._events) >= self._queue_size:
+            # Too far behind to be worth catching up event by event
+            self.dropped += len(self._events)
+            self._events.clear()
+            self._events.append(RESYNC)
+        elif not (self._events and self._events[-1] is RESYNC):
+            self._events.append(event)
+        self._ready.set()
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        """The next event, or None if ``timeout`` passes first"""
+        if not self._events:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._events.popleft()
+
+    def follow(self, event: dict):
+        """Track the user's own group memberships as they change"""
+        kind = event["type"]
+        if kind == "group.deleted":
+            self.broker.unsubscribe(self, group_topic(event["group_id"]))
+        elif self.user_id in event.get("user_ids", ()):
+            if kind in ("member.added", "group.created"):
+                self.broker.subscribe(self, group_topic(event["group_id"]))
+            elif kind == "member.removed":
+                self.broker.unsubscribe(self, group_topic(event["group_id"]))
+
+    def close(self):
+        self.broker.disconnect(self)
+
+
+class LocalFanout:
+    """Events only reach subscribers of this worker"""
+
+    def __init__(self):
+        # Writes made outside the app lifespan (scripts, benchmarks) have
+        # nobody to deliver to
+        self.deliver = lambda topic, event: None
+
+    def start(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, topic: tuple, event: dict):
+        self.deliver(topic, event)
+
+    def stop(self):
+        self.__init__()
+
+
+class RedisFanout:
+    """
+    Events go through one Redis pub/sub channel; every worker, this one
+    included, delivers what it reads back to its own subscribers. Any
+    Redis-compatible server works; the client is imported only when used.
+    """
+
+    def __init__(self, url: str, channel: str = "todo:events"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._thread = None
+
+    def start(self, deliver):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+
+        def handle(message):
+            topic, event = json.loads(message["data"])
+            deliver(tuple(topic), event)
+
+        pubsub.subscribe(**{self.channel: handle})
+        self._thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def publish(self, topic: tuple, event: dict):
+        self.client.publish(self.channel, json.dumps([topic, event], default=str))
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+
+
+class Broker:
+    """
+    Topic -> subscriptions index, living on the event loop of the worker.
+    ``publish`` is safe from any thread (services run in the threadpool or
+    inside run_sync); delivery always happens on the loop.
+    """
+
+    def __init__(self, fanout, queue_size: int):
+        self.fanout = fanout
+        self.queue_size = queue_size
+        self._topics: dict[tuple, set[Subscription]] = {}
+        self._loop = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+
+    def start(self):
+        """Bind to the running loop; called from the app lifespan"""
+        self._loop = asyncio.get_running_loop()
+        self.fanout.start(self._deliver_threadsafe)
+
+    def stop(self):
+        self.fanout.stop()
+        self._loop = None
+
+    def connect(self, user_id: UUID, group_ids=()) -> Subscription:
+        subscription = Subscription(self, user_id, self.queue_size)
+        self.subscribe(subscription, user_topic(user_id))
+        for group_id in group_ids:
+            self.subscribe(subscription, group_topic(group_id))
+        self.connections += 1
+        return subscription
+
+    def disconnect(self, subscription: Subscription):
+        for topic in list(subscription.topics):
+            self.unsubscribe(subscription, topic)
+        self.connections -= 1
+
+    def subscribe(self, subscription: Subscription, topic: tuple):
+        self._topics.setdefault(topic, set()).add(subscription)
+        subscription.topics.add(topic)
+
+    def unsubscribe(self, subscription: Subscription, topic: tuple):
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._topics[topic]
+        subscription.topics.discard(topic)
+
+    def publish(self, topic: tuple, event_type: str, **data):
+        """Send an event to ``topic``'s subscribers; call after the commit"""
+        with self._lock:
+            self.published += 1
+            event_id = next(self._ids)
+        event = {"type": event_type, "id": event_id, "at": time.time(), **jsonable_encoder(data)}
+        try:
+            self.fanout.publish(topic, event)
+        except Exception:
+            # Losing a notification must never fail the write that caused it
+            logger.exception("publishing %s to %s failed", event_type, topic)
+
+    def _deliver_threadsafe(self, topic: tuple, event: dict):
+        loop = self._loop
+        if loop is None or topic not in self._topics:
+            return
+        loop.call_soon_threadsafe(self._deliver, topic, event)
+
+    def _deliver(self, topic: tuple, event: dict):
+        for subscription in list(self._topics.get(topic, ())):
+            subscription.push(event)
+            subscription.follow(event)
+            self.delivered += 1
+
+    def stats(self) -> dict:
+        return {
+            "fanout": type(self.fanout).__name__,
+            "connections": self.connections,
+            "topics": len(self._topics),
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+
+broker = Broker(
+    RedisFanout(settings.EVENTS_FANOUT_URL) if settings.EVENTS_FANOUT_URL else LocalFanout(),
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+)
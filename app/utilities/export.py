@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+from typing import Literal
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _ndjson_batch(columns: list[str], rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows
+    )
+
+
+def _csv_batch(columns: list[str], rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _csv_header(columns: list[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue()
+
+
+def encode_batches(batches, columns: list[str], format: ExportFormat):
+    """
+    Turn an iterator of row batches (from ``stream_rows``) into text chunks
+    for a StreamingResponse, one chunk per batch. Sync and async iterators
+    are both accepted and the result is of the same kind.
+    """
+    encode = _ndjson_batch if format == "ndjson" else _csv_batch
+    header = _csv_header(columns) if format == "csv" else ""
+    if hasattr(batches, "__aiter__"):
+        return _encode_async(batches, columns, encode, header)
+    return _encode_sync(batches, columns, encode, header)
+
+
+def _encode_sync(batches, columns, encode, header):
+    if header:
+        yield header
+    for batch in batches:
+        yield encode(columns, batch)
+
+
+async def _encode_async(batches, columns, encode, header):
+    if header:
+        yield header
+    async for batch in batches:
+        yield encode(columns, batch)
@@ -0,0 +1,313 @@
+"""
+In-process background jobs for work too heavy for the request path.
+
+A route checks the request, enqueues a job and answers 202 with the job
+id; clients poll GET /jobs/{id}. JOB_WORKERS tasks per process run the
+queued jobs, each kind optionally capped at fewer at once. A handler that
+raises is retried up to JOB_MAX_ATTEMPTS times with doubling delays;
+an HTTPException (e.g. the group is already gone) fails the job at once.
+Handlers should work in bounded batches, each in its own transaction, and
+be safe to run again from the start.
+
+Jobs live in memory by default: lost on restart, and only visible to the
+process that queued them, which suits a single worker. With
+JOB_STORE="database" they are rows of the job table, which every worker
+can poll: queued jobs, and running ones whose JOB_LEASE_SECONDS lease ran
+out with their process, are picked up again when a process starts.
+Deployments with several worker processes need the database store.
+"""
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, or_, update
+from sqlmodel import Session, select
+
+from ..models import as_utc, utcnow
+from ..models.job import Job
+from ..settings import settings
+from .write_batch import run_in_own_session
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("succeeded", "failed")
+
+
+class MemoryJobStore:
+    """Jobs of this process only, the most recent ``max_jobs`` kept"""
+
+    def __init__(self, max_jobs: int = 10_000):
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[UUID, Job] = OrderedDict()
+
+    async def add(self, job: Job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    async def claim(self, job: Job, lease: timedelta) -> bool:
+        job.status = "running"
+        job.attempts += 1
+        job.updated_at = utcnow()
+        return True
+
+    async def save(self, job: Job):
+        job.updated_at = utcnow()
+
+    async def get(self, job_id: UUID) -> Job | None:
+        return self._jobs.get(job_id)
+
+    async def recover(self) -> list[Job]:
+        return []
+
+
+class DatabaseJobStore:
+    """Jobs as rows of the job table, shared by every process"""
+
+    def __init__(self, retention: timedelta):
+        self.retention = retention
+
+    async def add(self, job: Job):
+        await run_in_own_session(self._add, job.model_dump())
+
+    async def claim(self, job: Job, lease: timedelta) -> bool:
+        """Take the job unless another process runs it; False if it does"""
+        claimed = await run_in_own_session(self._claim, job.id, lease)
+        if claimed:
+            job.status = "running"
+            job.attempts = claimed
+        return bool(claimed)
+
+    async def save(self, job: Job):
+        job.updated_at = utcnow()
+        await run_in_own_session(self._save, job.id, {
+            "status": job.status,
+            "progress": job.progress,
+            "result": job.result,
+            "error": job.error,
+            "updated_at": job.updated_at,
+            # A running job saving progress extends its lease
+            "locked_until": job.locked_until,
+        })
+
+    async def get(self, job_id: UUID) -> Job | None:
+        return await run_in_own_session(self._get, job_id)
+
+    async def recover(self) -> list[Job]:
+        """Unfinished jobs to run again; finished ones past retention are dropped"""
+        return await run_in_own_session(self._recover)
+
+    @staticmethod
+    def _add(row: dict, session: Session):
+        session.add(Job(**row))
+        session.commit()
+
+    @staticmethod
+    def _claim(job_id: UUID, lease: timedelta, session: Session) -> int:
+        now = utcnow()
+        claimable = or_(Job.status == "queued", (Job.status == "running") & (Job.locked_until < now))
+        claimed = session.execute(
+            update(Job).where(Job.id == job_id, claimable)
+            .values(status="running", attempts=Job.attempts + 1, locked_until=now + lease, updated_at=now)
+        ).rowcount
+        session.commit()
+        return session.exec(select(Job.attempts).where(Job.id == job_id)).one() if claimed else 0
+
+    @staticmethod
+    def _save(job_id: UUID, values: dict, session: Session):
+        session.execute(update(Job).where(Job.id == job_id).values(**values))
+        session.commit()
+
+    @staticmethod
+    def _get(job_id: UUID, session: Session) -> Job | None:
+        job = session.get(Job, job_id)
+        if job is not None:
+            session.expunge(job)
+        return job
+
+    def _recover(self, session: Session) -> list[Job]:
+        session.execute(delete(Job).where(Job.status.in_(FINISHED), Job.updated_at < utcnow() - self.retention))
+        session.commit()
+        jobs = session.exec(select(Job).where(Job.status.not_in(FINISHED))).all()
+        for job in jobs:
+            session.expunge(job)
+        return list(jobs)
+
+
+class JobRunner:
+    """
+    Queue plus worker tasks on the event loop. Handlers are registered per
+    job kind with ``@job_runner.handler(kind)`` and called as
+    ``await handler(job, **job.params)``; what they return is the result.
+    """
+
+    def __init__(self, store, workers: int, max_queued: int, max_attempts: int, retry_delay: float, lease: float):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = timedelta(seconds=lease)
+        self._handlers: dict[str, tuple[Callable[..., Awaitable[dict | None]], int | None]] = {}
+        self._limits: dict[str, asyncio.Semaphore] = {}
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+        self._lock = threading.Lock()
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+
+    def handler(self, kind: str, concurrency: int | None = None):
+        """Register the handler of ``kind`` jobs, at most ``concurrency`` running at once"""
+        def register(fn):
+            self._handlers[kind] = (fn, concurrency)
+            return fn
+        return register
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A fresh event loop (e.g. another lifespan) gets fresh workers
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._limits = {
+                kind: asyncio.Semaphore(concurrency)
+                for kind, (_, concurrency) in self._handlers.items() if concurrency
+            }
+            self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    async def start(self):
+        """Start the workers and queue the jobs left unfinished by earlier runs"""
+        self._start()
+        jobs = await self.store.recover()
+        now = utcnow()
+        for job in jobs:
+            # Wait out the lease of a job that may still run elsewhere
+            wait = (as_utc(job.locked_until) - now).total_seconds() if job.locked_until else 0
+            self._loop.call_later(max(wait, 0), self._queue.put_nowait, job)
+        if jobs:
+            logger.info("recovered %d unfinished jobs", len(jobs))
+
+    async def stop(self):
+        """Stop the workers; interrupted jobs stay running until their lease passes"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    async def enqueue(self, kind: str, user_id: UUID | None = None, /, **params) -> Job:
+        """Queue a ``kind`` job; 503 when JOB_QUEUE_SIZE jobs already wait"""
+        self._start()
+        if self._queue.qsize() >= self.max_queued:
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many background jobs queued, please retry shortly",
+                headers={"Retry-After": "5"},
+            )
+        job = Job(kind=kind, user_id=user_id, params=jsonable_encoder(params))
+        await self.store.add(job)
+        self._queue.put_nowait(job)
+        return job
+
+    async def get(self, job_id: UUID) -> Job | None:
+        return await self.store.get(job_id)
+
+    async def progress(self, job: Job, **progress):
+        """Record how far a running job got (and renew its lease)"""
+        job.progress = {**(job.progress or {}), **progress}
+        job.locked_until = utcnow() + self.lease
+        await self.store.save(job)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                limit = self._limits.get(job.kind)
+                if limit is None:
+                    await self._run(job)
+                else:
+                    async with limit:
+                        await self._run(job)
+            except Exception:
+                logger.exception("job %s (%s) crashed its worker loop", job.id, job.kind)
+
+    async def _run(self, job: Job):
+        if not await self.store.claim(job, self.lease):
+            return
+        fn, _ = self._handlers[job.kind]
+        retry_in = None
+        with self._lock:
+            self.running += 1
+        try:
+            result = await fn(job, **job.params)
+        except Exception as error:
+            permanent = isinstance(error, HTTPException)
+            job.error = str(error.detail) if permanent else repr(error)
+            if permanent or job.attempts >= self.max_attempts:
+                logger.warning("job %s (%s) failed after %d attempts: %s", job.id, job.kind, job.attempts, job.error)
+                job.status = "failed"
+                with self._lock:
+                    self.failed += 1
+            else:
+                job.status = "queued"
+                retry_in = self.retry_delay * 2 ** (job.attempts - 1)
+                with self._lock:
+                    self.retried += 1
+        else:
+            job.status = "succeeded"
+            job.result = jsonable_encoder(result)
+            job.error = None
+            with self._lock:
+                self.succeeded += 1
+        finally:
+            with self._lock:
+                self.running -= 1
+        job.locked_until = None
+        await self.store.save(job)
+        if retry_in is not None:
+            self._loop.call_later(retry_in, self._queue.put_nowait, job)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "store": type(self.store).__name__,
+                "workers": self.workers,
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "running": self.running,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retried": self.retried,
+                "rejected": self.rejected,
+            }
+
+
+def accepted(job: Job, response) -> dict:
+    """202 body (JobAccepted) for a queued job, with its status URL as Location"""
+    status_url = f"{settings.API_V1_STR}/jobs/{job.id}"
+    response.headers["Location"] = status_url
+    return {"job_id": job.id, "status": job.status, "status_url": status_url}
+
+
+job_runner = JobRunner(
+    DatabaseJobStore(retention=timedelta(hours=settings.JOB_RETENTION_HOURS))
+    if settings.JOB_STORE == "database" else MemoryJobStore(),
+    workers=settings.JOB_WORKERS,
+    max_queued=settings.JOB_QUEUE_SIZE,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_delay=settings.JOB_RETRY_DELAY_SECONDS,
+    lease=settings.JOB_LEASE_SECONDS,
+)
@@ -0,0 +1,167 @@
+"""
+Prometheus metrics.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory before the workers start: prometheus_client then keeps
+every metric in mmap'd files there and a scrape of any worker aggregates
+all of them (counters and histograms summed, gauges summed over live
+workers). Without it the metrics are those of the worker that answers.
+
+Pool gauges are refreshed when /metrics is scraped. A scrape reaches one
+worker only, so with PROMETHEUS_MULTIPROC_DIR every worker also samples
+its own pools every POOL_SAMPLE_SECONDS.
+"""
+import asyncio
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database pool connections by state (checked_out, idle, overflow, size)",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts",
+    "Pool checkouts that gave up waiting for a connection",
+    ["pool"],
+)
+AUTH_FAILURES = Counter(
+    "auth_failures",
+    "Rejected authentication attempts by reason",
+    ["reason"],
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "response_cache_lookups",
+    "Response cache lookups by service read and result (hit, miss)",
+    ["read", "result"],
+)
+WRITE_BATCH_ROWS = Histogram(
+    "write_batch_rows",
+    "Rows committed together by the group-commit write batcher",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+BCRYPT_QUEUE_SECONDS = Histogram(
+    "bcrypt_queue_seconds",
+    "Time a hash/verify call waited for a password hashing worker",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# Routes that matched nothing share one label, so scanners can't blow up
+# the series count with random paths
+UNMATCHED_ROUTE = "<unmatched>"
+
+# How often each worker refreshes its pool gauges in multiprocess mode
+POOL_SAMPLE_SECONDS = 5
+
+_pool_timeouts_seen: dict[str, int] = {}
+_pool_sampler: asyncio.Task | None = None
+
+
+def observe_pools(pool_stats: list[dict]):
+    """Copy PoolStats snapshots into the pool gauges of this worker"""
+    for pool in pool_stats:
+        name = pool["name"]
+        for state in ("checked_out", "idle", "overflow", "size"):
+            if pool[state] is not None:
+                DB_POOL_CONNECTIONS.labels(name, state).set(pool[state])
+        new_timeouts = pool["timeouts"] - _pool_timeouts_seen.get(name, 0)
+        if new_timeouts > 0:
+            DB_POOL_TIMEOUTS.labels(name).inc(new_timeouts)
+            _pool_timeouts_seen[name] = pool["timeouts"]
+
+
+def sample_pools(pool_stats):
+    """In multiprocess mode, refresh this worker's pool gauges in the background"""
+    global _pool_sampler
+    if not MULTIPROCESS:
+        return
+
+    async def sample():
+        while True:
+            observe_pools(pool_stats())
+            await asyncio.sleep(POOL_SAMPLE_SECONDS)
+
+    _pool_sampler = asyncio.get_running_loop().create_task(sample())
+
+
+def stop_sampling_pools():
+    global _pool_sampler
+    if _pool_sampler is not None:
+        _pool_sampler.cancel()
+        _pool_sampler = None
+
+
+def auth_failure(reason: str):
+    AUTH_FAILURES.labels(reason).inc()
+
+
+def render() -> tuple[bytes, str]:
+    """The exposition text and its content type"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the shared files on shutdown"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """Latency histogram and in-flight gauge for every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            REQUEST_LATENCY.labels(method, route, str(status_code)).observe(time.perf_counter() - started)
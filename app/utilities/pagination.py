@@ -0,0 +1,47 @@
+import base64
+import json
+from typing import Any
+
+from fastapi import HTTPException
+
+
+def encode_cursor(position: dict[str, Any]) -> str:
+    """Opaque cursor for the last row of a page"""
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+
+def keyset_page(session, query, key_column, limit: int, cursor: str | None, cursor_key: str = "id"):
+    """
+    Fetch one page of ``query`` ordered by ``key_column`` (unique, indexed).
+
+    Rows after the cursor are found with ``key > last_key`` instead of
+    OFFSET, so every page costs O(limit) however deep the client goes.
+    Returns the rows and the cursor for the next page (None at the end).
+    """
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            last_key = key_column.type.python_type(position[cursor_key])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(key_column > last_key)
+
+    # One extra row tells us whether another page exists
+    rows = session.exec(query.order_by(key_column).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({cursor_key: getattr(rows[-1], cursor_key)})
+    return rows, next_cursor
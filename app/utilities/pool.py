@@ -0,0 +1,156 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+
+class PoolStats:
+    """
+    Connection pool counters fed from SQLAlchemy pool events.
+
+    Checked-out/idle/overflow come from the pool itself where it keeps them
+    (QueuePool); for NullPool the checked-out count is tracked from
+    checkout/checkin events. Wait times are recorded by the timed pool
+    classes below.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.checked_out = 0
+            self.timeouts = 0
+            self.waits = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+    def attach(self, engine):
+        """Listen to the pool events of ``engine`` (sync or async)"""
+        pool = getattr(engine, "sync_engine", engine).pool
+        if isinstance(pool, _WaitTimingMixin):
+            pool.stats = self
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        # engine.dispose() swaps in a new pool (the listeners go with it), so
+        # snapshots look the pool up on the engine rather than keeping this one
+        self._engine = getattr(engine, "sync_engine", engine)
+        return self
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        engine = getattr(self, "_engine", None)
+        pool = engine.pool if engine is not None else None
+        with self._lock:
+            data = {
+                "name": self.name,
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "checked_out": self.checked_out,
+                "idle": None,
+                "overflow": None,
+                "size": None,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": self.wait_seconds_total / self.waits if self.waits else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_total": self.wait_seconds_total,
+            }
+        if isinstance(pool, QueuePool):
+            data.update(
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                size=pool.size(),
+            )
+        return data
+
+
+class _WaitTimingMixin:
+    """Times how long each checkout waits for a free connection"""
+
+    stats: PoolStats | None = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting to the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_WaitTimingMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(settings, is_async: bool = False, in_memory: bool = False) -> dict:
+    """
+    ``create_engine`` keyword arguments for the configured pool.
+
+    DB_NULL_POOL opens a connection per checkout, for deployments where
+    PgBouncer (or similar) already does the pooling.
+    """
+    if settings.DB_NULL_POOL:
+        return {"poolclass": NullPool}
+    if in_memory:
+        # In-memory SQLite keeps one connection per thread; nothing to size
+        return {}
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
@@ -0,0 +1,155 @@
+"""
+Read-through cache for the service reads behind the listing endpoints.
+
+A cached read is keyed by its arguments (the session aside, users by id)
+and by the current generation of the scope it depends on, e.g. one user's
+items or one group's members. Mutating service methods call
+``response_cache.invalidate(scope)`` after they commit; that drops the
+scope's generation, so every entry cached under the old one is simply
+never looked up again and ages out through TTL/LRU. Generations are
+random tokens rather than counters, so losing one to eviction can only
+cause misses, never serve a stale entry.
+
+The cache is off unless configured. With RESPONSE_CACHE_URL the entries
+and generations live in a Redis-compatible server and invalidation
+reaches every worker immediately. RESPONSE_CACHE_SIZE alone keeps them
+per worker: a write invalidates the worker that made it at once and the
+others only within RESPONSE_CACHE_TTL, so that is for single-worker
+deployments.
+
+Reads served by a read replica are never stored: the replica may not
+have the write that bumped the generation yet.
+"""
+import inspect
+import json
+import threading
+import uuid
+from functools import wraps
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+
+from ..settings import settings
+from .cache import CacheBackend, MemoryCacheBackend, NullCacheBackend, RedisCacheBackend
+from . import metrics
+
+
+def _scope_key(scope: tuple) -> str:
+    return "generation:" + ":".join(str(part) for part in scope)
+
+
+def _key_part(value):
+    # Users (and any other row passed in) are keyed by id
+    return getattr(value, "id", value)
+
+
+class ResponseCache:
+    """Cached service reads plus per-scope invalidation and hit counters"""
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return not isinstance(self.backend, NullCacheBackend)
+
+    def use(self, backend: CacheBackend):
+        self.backend = backend
+
+    def _generation(self, scope: tuple) -> str:
+        key = _scope_key(scope)
+        generation = self.backend.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            # Outlives the entries stored under it; expiring early only
+            # costs misses
+            self.backend.set(key, generation, ttl=self.ttl * 10)
+        return generation
+
+    def invalidate(self, *scopes: tuple):
+        """Forget every cached read under ``scopes``; call after the write commits"""
+        if not self.enabled:
+            return
+        for scope in scopes:
+            self.backend.delete(_scope_key(scope))
+        with self._lock:
+            self.invalidations += len(scopes)
+
+    def _count(self, name: str, hit: bool):
+        with self._lock:
+            counters = self.hits if hit else self.misses
+            counters[name] = counters.get(name, 0) + 1
+        metrics.RESPONSE_CACHE_LOOKUPS.labels(name, "hit" if hit else "miss").inc()
+
+    def cached(self, scope: Callable[..., tuple], model=None):
+        """
+        Decorate a service read (under its @classmethod). ``scope`` gets the
+        call's arguments, users as ids, and returns the scope tuple the
+        result depends on. The result is cached, and always returned, in
+        JSON-compatible form, validated through ``model`` first when given
+        so only the fields the response exposes are kept.
+        """
+        def decorate(fn):
+            signature = inspect.signature(fn)
+            owner = next(iter(signature.parameters))
+            name = fn.__qualname__
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = {
+                    key: _key_part(value) for key, value in bound.arguments.items()
+                    if key not in (owner, "session")
+                }
+                key = f"{name}:{self._generation(scope(**arguments))}:{json.dumps(arguments, sort_keys=True, default=str)}"
+                value = self.backend.get(key)
+                if value is not None:
+                    self._count(name, True)
+                    return value
+                self._count(name, False)
+                result = fn(*args, **kwargs)
+                if model is not None:
+                    result = model.model_validate(result, from_attributes=True)
+                value = jsonable_encoder(result)
+                session = bound.arguments.get("session")
+                # Served, but not stored, when it came from a replica
+                if session is None or session.info.get("replica") is None:
+                    self.backend.set(key, value)
+                return value
+
+            return wrapper
+        return decorate
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                "invalidations": self.invalidations,
+                "reads": {
+                    name: {"hits": self.hits.get(name, 0), "misses": self.misses.get(name, 0)}
+                    for name in sorted(self.hits.keys() | self.misses.keys())
+                },
+                "backend": self.backend.stats(),
+            }
+
+
+def _backend() -> CacheBackend:
+    if settings.RESPONSE_CACHE_URL:
+        return RedisCacheBackend.from_url(settings.RESPONSE_CACHE_URL, ttl=settings.RESPONSE_CACHE_TTL)
+    if settings.RESPONSE_CACHE_SIZE > 0:
+        return MemoryCacheBackend(max_size=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL)
+    return NullCacheBackend()
+
+
+response_cache = ResponseCache(_backend(), ttl=settings.RESPONSE_CACHE_TTL)
@@ -0,0 +1,229 @@
+"""
+Revoked access tokens.
+
+Revocations are rows in the ``revokedtoken`` table: one per logged-out
+token (by jti), or one per user (every token issued before revoked_at,
+written when an account is deactivated or a token without a jti logs
+out). Each worker mirrors the live rows in a Denylist and re-reads the
+table at most every REVOCATION_REFRESH_SECONDS, so a revocation made by
+another worker takes effect within that delay; one made by this worker
+applies as soon as its transaction commits.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import event, inspect
+from sqlmodel import Session, select
+
+from ..models import as_utc, utcnow
+from ..settings import settings
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. No false negatives, so a miss
+    settles the question without touching the exact set behind it.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        # Standard sizing: m = -n ln p / (ln 2)^2 bits, k = m / n ln 2 hashes
+        bits = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 64)
+        self.size = bits
+        self.hashes = max(int(round(bits / capacity * math.log(2))), 1)
+        self._bits = bytearray((bits + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        # Double hashing: k positions from two 64-bit halves
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class Denylist:
+    """
+    This worker's copy of the live revocations: a Bloom filter in front of
+    the exact jti set (almost every token checked is not revoked, and the
+    filter answers that in a few hashes), plus the user-level revocations.
+
+    ``refresh_if_due`` re-reads rows revoked since the last pass, with some
+    slack for transactions that committed after their revoked_at, and every
+    ``full_reload_seconds`` reloads the whole live set, dropping expired
+    entries and rebuilding the filter.
+    """
+
+    def __init__(self, refresh_seconds: float, full_reload_seconds: float = 300, commit_slack_seconds: float = 30):
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.commit_slack = timedelta(seconds=commit_slack_seconds)
+        # Guards the entries, never held across a query: a refresh inside
+        # run_sync would otherwise block the event loop for any coroutine
+        # committing a revocation meanwhile
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        # jti -> expires_at; user_id -> (revoked_at, expires_at)
+        self._tokens: dict[str, datetime] = {}
+        self._users: dict[UUID, tuple[datetime, datetime]] = {}
+        self._filter = BloomFilter(1024)
+        self._watermark: datetime | None = None
+        self._refreshed_at = float("-inf")
+        self._reloaded_at = float("-inf")
+        self.refreshes = 0
+
+    def due(self) -> bool:
+        return time.monotonic() - self._refreshed_at >= self.refresh_seconds
+
+    def refresh_if_due(self, session: Session):
+        """Re-read the revocation table if the last pass is older than refresh_seconds"""
+        if not self.due():
+            return
+        # Requests arriving mid-refresh keep using the current entries
+        # rather than queueing behind it
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            if self.due():
+                self._refresh(session)
+        finally:
+            self._refreshing.release()
+
+    def _refresh(self, session: Session):
+        from ..models.user import RevokedToken
+
+        now = utcnow()
+        full = time.monotonic() - self._reloaded_at >= self.full_reload_seconds
+        query = select(RevokedToken)
+        if full:
+            query = query.where(RevokedToken.expires_at > now)
+        else:
+            query = query.where(RevokedToken.revoked_at >= self._watermark - self.commit_slack)
+        rows = session.exec(query).all()
+
+        with self._lock:
+            if full:
+                # Prune rather than replace, keeping anything add() applied
+                # while the query ran
+                self._tokens = {jti: expires for jti, expires in self._tokens.items() if expires > now}
+                self._users = {user: entry for user, entry in self._users.items() if entry[1] > now}
+            for row in rows:
+                self._remember(row.jti, row.user_id, as_utc(row.revoked_at), as_utc(row.expires_at))
+            if full:
+                self._rebuild_filter()
+        if full:
+            self._reloaded_at = time.monotonic()
+        self._watermark = now
+        self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    def _remember(self, jti: str | None, user_id: UUID | None, revoked_at: datetime, expires_at: datetime):
+        if jti is not None:
+            if jti not in self._tokens:
+                self._filter.add(jti)
+            self._tokens[jti] = expires_at
+        if user_id is not None:
+            self._users[user_id] = max((revoked_at, expires_at), self._users.get(user_id, (revoked_at, expires_at)))
+
+    def _rebuild_filter(self):
+        bloom = BloomFilter(max(2 * len(self._tokens), 1024))
+        for jti in self._tokens:
+            bloom.add(jti)
+        self._filter = bloom
+
+    def add(self, jti: str | None, user_id: UUID | None, revoked_at: datetime, expires_at: datetime):
+        """Apply a revocation committed by this worker straight away"""
+        with self._lock:
+            self._remember(jti, user_id, as_utc(revoked_at), as_utc(expires_at))
+
+    def is_revoked(self, jti: str | None, user_id: UUID | None, issued_at: float | None) -> bool:
+        if jti is not None and jti in self._filter and jti in self._tokens:
+            return True
+        entry = self._users.get(user_id) if user_id is not None else None
+        if entry is None:
+            return False
+        # Tokens without an issue time predate revocation support; treat
+        # them as issued before any user-level revocation
+        return issued_at is None or issued_at <= entry[0].timestamp()
+
+    def clear(self):
+        with self._lock:
+            self._tokens, self._users = {}, {}
+            self._filter = BloomFilter(1024)
+            self._watermark = None
+            self._refreshed_at = self._reloaded_at = float("-inf")
+
+    def stats(self) -> dict:
+        return {
+            "tokens": len(self._tokens),
+            "users": len(self._users),
+            "refreshes": self.refreshes,
+            "refresh_seconds": self.refresh_seconds,
+        }
+
+
+denylist = Denylist(refresh_seconds=settings.REVOCATION_REFRESH_SECONDS)
+
+
+def _user_revocation_expiry(revoked_at: datetime) -> datetime:
+    # Every token issued before revoked_at is dead by then
+    return revoked_at + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def revoke_token(session: Session, jti: str, expires_at: datetime):
+    """Revoke one token; applies to this worker once the session commits"""
+    from ..models.user import RevokedToken
+
+    session.add(RevokedToken(jti=jti, expires_at=expires_at))
+
+
+def revoke_user(session: Session, user_id: UUID):
+    """Revoke every token issued to ``user_id`` so far"""
+    from ..models.user import RevokedToken
+
+    revoked_at = utcnow()
+    session.add(RevokedToken(user_id=user_id, revoked_at=revoked_at, expires_at=_user_revocation_expiry(revoked_at)))
+
+
+@event.listens_for(Session, "before_flush")
+def _revoke_deactivated_users(session, flush_context, instances):
+    from ..models.user import User
+
+    for obj in list(session.dirty):
+        if isinstance(obj, User) and obj.id is not None:
+            history = inspect(obj).attrs.isActive.history
+            if history.deleted and history.deleted[0] and not obj.isActive:
+                revoke_user(session, obj.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_revocations(session, flush_context):
+    from ..models.user import RevokedToken
+
+    pending = [obj for obj in session.new if isinstance(obj, RevokedToken)]
+    if pending:
+        session.info.setdefault("revocations", []).extend(
+            (row.jti, row.user_id, row.revoked_at, row.expires_at) for row in pending
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_revocations(session):
+    for revocation in session.info.pop("revocations", ()):
+        denylist.add(*revocation)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_revocations(session):
+    session.info.pop("revocations", None)
@@ -0,0 +1,191 @@
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Callable
+from uuid import UUID
+
+from sqlalchemy import func, or_
+from sqlmodel import select
+
+# Trigrams, matching what pg_trgm indexes on Postgres
+NGRAM_SIZE = 3
+# Past this many candidate ids an IN (...) list costs more than the scan
+MAX_CANDIDATES = 5000
+
+
+def _ngrams(text: str | None) -> set[str]:
+    text = (text or "").lower()
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def similarity(query: str, text: str | None) -> float:
+    """Shared-trigram ratio, the same measure as pg_trgm's similarity()"""
+    a, b = _ngrams(f"  {query} "), _ngrams(f"  {text or ''} ")
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NgramIndex:
+    """
+    In-process trigram index over one table's text columns.
+
+    Stands in for the pg_trgm GIN indexes on SQLite and in tests: it maps
+    every trigram to the ids of the rows containing it, so a substring
+    query only touches rows sharing all of the query's trigrams.
+    """
+
+    def __init__(self, columns: tuple[str, ...]):
+        self.columns = columns
+        self._lock = threading.Lock()
+        self._postings: dict[str, set[UUID]] = defaultdict(set)
+        self._docs: dict[UUID, set[str]] = {}
+
+    def add(self, doc_id: UUID, obj):
+        grams = set()
+        for column in self.columns:
+            grams |= _ngrams(getattr(obj, column, None))
+        with self._lock:
+            self._remove(doc_id)
+            self._docs[doc_id] = grams
+            for gram in grams:
+                self._postings[gram].add(doc_id)
+
+    def remove(self, doc_id: UUID):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: UUID):
+        for gram in self._docs.pop(doc_id, ()):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def candidates(self, query: str) -> set[UUID] | None:
+        """Ids that may contain ``query``, or None if it is too short to narrow"""
+        grams = _ngrams(query)
+        if not grams:
+            return None
+        with self._lock:
+            # Rarest trigram first keeps the intersection small
+            lists = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            result = set(lists[0])
+            for postings in lists[1:]:
+                result &= postings
+                if not result:
+                    break
+        return result
+
+
+class _Row:
+    def __init__(self, columns, values):
+        for column, value in zip(columns, values):
+            setattr(self, column, value)
+
+
+class _FallbackIndexes:
+    """
+    NgramIndex per search scope (e.g. one user's items), built on first use.
+
+    Other workers write to the same database, so an index is only trusted
+    while the scope's head, the highest change number among its rows, is
+    the one read before it was built; otherwise the scope is re-read and
+    indexed again. The head comes from an index lookup rather than a pass
+    over the rows, and it grows with every insert and update because
+    SQLite (the only place this index is used) runs one write transaction
+    at a time. Deletes leave it alone: a deleted row's id lingers in the
+    index, which only costs a wasted candidate, since the ILIKE still runs.
+    """
+
+    def __init__(self, max_scopes: int = 1024):
+        self.max_scopes = max_scopes
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[tuple, tuple[int | None, NgramIndex]] = OrderedDict()
+        self._models: dict[type, tuple[tuple[str, ...], Callable]] = {}
+        self.builds = 0
+
+    def register(self, model, columns: tuple[str, ...], head: Callable):
+        """
+        Index ``columns`` of ``model``. ``head`` gets a scope tuple and
+        returns the statement selecting that scope's highest change number.
+        """
+        self._models[model] = (columns, head)
+
+    def get(self, model, session, query, scope: tuple) -> NgramIndex:
+        """The index over the rows of ``query``, which ``scope`` names"""
+        columns, head = self._models[model]
+        key = (model, scope)
+        # Read before the rows, so a write racing the build shows up as a
+        # newer head next time rather than a stale index
+        seen = session.exec(head(scope)).one()
+        with self._lock:
+            entry = self._indexes.get(key)
+            if entry is not None and entry[0] == seen:
+                self._indexes.move_to_end(key)
+                return entry[1]
+        # Built without the lock held: under run_sync the query yields to the
+        # event loop, and another request blocking on the lock there would
+        # never let it resume
+        index = NgramIndex(columns)
+        rows = query.subquery()
+        for row in session.exec(select(rows.c.id, *(rows.c[c] for c in index.columns))):
+            index.add(row[0], _Row(index.columns, row[1:]))
+        with self._lock:
+            self.builds += 1
+            self._indexes[key] = (seen, index)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_scopes:
+                self._indexes.popitem(last=False)
+        return index
+
+
+fallback_indexes = _FallbackIndexes()
+
+
+def is_postgres(session) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def substring_filter(session, model, query, q: str, description: bool = False, scope: tuple | None = None):
+    """
+    Restrict ``query`` to rows whose name (and optionally description)
+    contains ``q``, case-insensitively.
+
+    On Postgres the ILIKE is served by the pg_trgm GIN indexes; elsewhere
+    the in-process trigram index of ``scope`` (the rows ``query`` selects,
+    e.g. one user's items) narrows the rows first. Without a scope it is a
+    plain scan.
+    """
+    columns = [model.name] + ([model.description] if description else [])
+    condition = or_(*(column.ilike(f"%{q}%") for column in columns))
+    if scope is not None and not is_postgres(session):
+        candidates = fallback_indexes.get(model, session, query, scope).candidates(q)
+        if candidates is not None and len(candidates) <= MAX_CANDIDATES:
+            query = query.where(model.id.in_(candidates))
+    return query.where(condition)
+
+
+def ranked_search(session, model, query, q: str, description: bool = False, limit: int = 20, scope: tuple | None = None):
+    """
+    Rows of ``query`` matching ``q``, best match first.
+
+    Rank is trigram similarity to the name (or the description, when it is
+    searched and scores higher), the same as pg_trgm's similarity().
+    """
+    query = substring_filter(session, model, query, q, description, scope)
+    if is_postgres(session):
+        score = func.similarity(model.name, q)
+        if description:
+            score = func.greatest(score, func.similarity(func.coalesce(model.description, ""), q))
+        return session.exec(query.order_by(score.desc(), model.id).limit(limit)).all()
+
+    rows = session.exec(query).all()
+
+    def score(row):
+        best = similarity(q, row.name)
+        if description:
+            best = max(best, similarity(q, row.description))
+        return best
+
+    return sorted(rows, key=lambda row: (-score(row), str(row.id)))[:limit]
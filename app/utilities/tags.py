@@ -3,4 +3,7 @@ from enum import Enum
 class Tags(Enum):
     items = "items"
     users = "users"
-    groups = "groups"
\ No newline at end of file
+    groups = "groups"
+    events = "events"
+    sync = "sync"
+    jobs = "jobs"
\ No newline at end of file
@@ -0,0 +1,263 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger("app.requests")
+sql_logger = logging.getLogger("app.sql")
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    ``statement`` with literals and expanded IN (...) lists collapsed, so
+    every execution of the same query shape normalizes to the same text
+    """
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _LITERALS.sub("?", statement)
+    return _PLACEHOLDER_LISTS.sub("(...)", statement)
+
+
+class RequestTiming:
+    """Where one request's time went: SQL statements plus named spans"""
+
+    __slots__ = ("started", "queries", "db_seconds", "spans", "scope", "slow_query_seconds", "statements")
+
+    def __init__(self, scope=None, slow_query_seconds: float | None = None, group_statements: bool = False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.spans: dict[str, float] = {}
+        self.scope = scope
+        self.slow_query_seconds = slow_query_seconds
+        # normalized SQL -> [executions, seconds], only kept when grouping
+        self.statements: dict[str, list] | None = {} if group_statements else None
+
+    def route(self) -> str | None:
+        if self.scope is None:
+            return None
+        return getattr(self.scope.get("route"), "path", None)
+
+    def record_query(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        if self.statements is not None:
+            entry = self.statements.setdefault(normalize_sql(statement), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+        if self.slow_query_seconds is not None and seconds >= self.slow_query_seconds:
+            sql_logger.warning(json.dumps({
+                "event": "slow_query",
+                "route": self.route(),
+                "duration_ms": round(seconds * 1000, 2),
+                "statement": normalize_sql(statement),
+            }))
+
+    def repeated_statements(self, threshold: int) -> list[tuple[str, int, float]]:
+        """(normalized SQL, executions, seconds) run at least ``threshold`` times"""
+        if self.statements is None:
+            return []
+        return sorted(
+            ((sql, count, seconds) for sql, (count, seconds) in self.statements.items() if count >= threshold),
+            key=lambda entry: -entry[1],
+        )
+
+    def add_span(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header (durations in ms)"""
+        parts = [
+            f"total;dur={self.elapsed() * 1000:.1f}",
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+        ]
+        parts += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        return ", ".join(parts)
+
+
+# Set by TimingMiddleware for the duration of a request. The threadpool and
+# run_sync both carry the context along, so the engine events below see it.
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def current_timing() -> RequestTiming | None:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str):
+    """Add the time spent in the block to the current request under ``name``"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add_span(name, time.perf_counter() - started)
+
+
+class QueryCounter:
+    """Statements run while a count_queries() block is active"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements: Counter[str] = Counter()
+
+    def record(self, statement: str):
+        self.count += 1
+        self.statements[normalize_sql(statement)] += 1
+
+
+# Active count_queries() counters; like _current, follows the request
+# through the threadpool and run_sync
+_counters: ContextVar[tuple[QueryCounter, ...]] = ContextVar("query_counters", default=())
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the SQL statements run inside the block, including those of an
+    app driven in the same task (e.g. through httpx's ASGITransport)
+    """
+    counter = QueryCounter()
+    token = _counters.set(_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _counters.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    Fail with AssertionError if the block runs more than ``limit`` SQL
+    statements, listing what ran. For checking endpoints don't regress
+    into N+1 patterns::
+
+        with assert_max_queries(2):
+            await client.get("/api/v1/items/", headers=headers)
+    """
+    with count_queries() as counter:
+        yield counter
+    if counter.count > limit:
+        details = "\n".join(f"  {count} x {sql}" for sql, count in counter.statements.most_common())
+        raise AssertionError(f"{counter.count} queries executed, expected at most {limit}:\n{details}")
+
+
+def _tracking() -> bool:
+    return _current.get() is not None or bool(_counters.get())
+
+
+def _record(statement: str, started: float):
+    seconds = time.perf_counter() - started
+    timing = _current.get()
+    if timing is not None:
+        timing.record_query(statement, seconds)
+    for counter in _counters.get():
+        counter.record(statement)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _tracking():
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if started:
+        _record(statement, started.pop())
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute doesn't fire for a failed statement
+    connection = exception_context.connection
+    started = connection.info.get("query_started") if connection is not None else None
+    if started:
+        _record(exception_context.statement or "", started.pop())
+
+
+def instrument_engine(engine):
+    """Count the statements ``engine`` (sync or async) runs and their time"""
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+class TimingMiddleware:
+    """
+    Times every HTTP request and the SQL it runs.
+
+    Adds a Server-Timing header (total, db and any spans, as of the moment
+    the response headers go out) and logs one JSON line per request with the
+    full wall time once the body has been sent. Plain ASGI rather than
+    BaseHTTPMiddleware, so streamed responses pass through untouched.
+
+    Diagnostics, logged as JSON warnings on "app.sql": any statement taking
+    ``slow_query_seconds`` or longer, and, with ``n_plus_one_threshold``
+    set, any normalized statement a request ran that many times or more,
+    the usual sign of a lazy load inside a loop.
+    """
+
+    def __init__(self, app, header: bool = True, slow_query_seconds: float | None = None, n_plus_one_threshold: int = 0):
+        self.app = app
+        self.header = header
+        self.slow_query_seconds = slow_query_seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming(scope, self.slow_query_seconds, group_statements=self.n_plus_one_threshold > 0)
+        token = _current.set(timing)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.header:
+                    MutableHeaders(scope=message).append("Server-Timing", timing.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            for statement, count, seconds in timing.repeated_statements(self.n_plus_one_threshold):
+                sql_logger.warning(json.dumps({
+                    "event": "n_plus_one",
+                    "method": scope["method"],
+                    "route": timing.route(),
+                    "executions": count,
+                    "duration_ms": round(seconds * 1000, 2),
+                    "statement": statement,
+                }))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "route": timing.route(),
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(timing.elapsed() * 1000, 2),
+                    "db_ms": round(timing.db_seconds * 1000, 2),
+                    "queries": timing.queries,
+                    **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in timing.spans.items()},
+                }))
@@ -0,0 +1,161 @@
+"""
+Group commit for small inserts.
+
+Rows submitted by concurrent requests are buffered and written together:
+one multi-row INSERT and one COMMIT (so one WAL flush/fsync) per batch
+instead of per request. Each submitter waits until the batch holding its
+row has committed, so a response still means the row is durable.
+"""
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import db, metrics
+
+logger = logging.getLogger(__name__)
+
+
+async def run_in_own_session(fn, /, *args):
+    """Await the service call ``fn(*args, session=...)`` in a fresh session"""
+    if db.async_engine is not None:
+        async with AsyncSession(db.async_engine, expire_on_commit=False) as session:
+            return await db.run_service(session, fn, *args)
+
+    def call():
+        with Session(db.engine) as session:
+            return fn(*args, session=session)
+
+    return await run_in_threadpool(call)
+
+
+class WriteBatcher:
+    """
+    Coalesces rows into batches of up to ``max_rows``, waiting at most
+    ``max_delay`` seconds after the first row of a batch for more to
+    arrive. A batch is written while the next one fills, so even with no
+    delay, rows arriving during a commit share the following one.
+
+    ``write(rows)`` persists and commits one batch. If it fails, the rows
+    are retried one at a time so a bad row only fails its own request.
+    """
+
+    def __init__(self, write: Callable[[list[dict]], Awaitable[None]], max_rows: int, max_delay: float, name: str = "batch"):
+        self.write = write
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.name = name
+        self._loop = None
+        self._task = None
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._closing = False
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.failures = 0
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            # A fresh event loop (e.g. another lifespan) gets a fresh flusher
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._pending = []
+            self._closing = False
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, row: dict):
+        """Queue ``row``; returns once the batch containing it has committed"""
+        self._start()
+        future = self._loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_rows:
+            self._full.set()
+        self._wakeup.set()
+        await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._pending:
+                if self._closing:
+                    return
+                continue
+            if len(self._pending) < self.max_rows and self.max_delay > 0 and not self._closing:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            batch, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+            # Come straight back for the rows left over, or to stop
+            if self._pending or self._closing:
+                self._wakeup.set()
+            await self._commit(batch)
+
+    async def _commit(self, batch: list[tuple[dict, asyncio.Future]]):
+        try:
+            await self.write([row for row, _ in batch])
+        except Exception as error:
+            if len(batch) == 1:
+                self._fail(batch[0][1], error)
+                return
+            logger.warning("%s of %d rows failed, retrying row by row: %r", self.name, len(batch), error)
+            for row, future in batch:
+                try:
+                    await self.write([row])
+                except Exception as row_error:
+                    self._fail(future, row_error)
+                else:
+                    self._done(future, 1)
+            return
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+        self._done(None, len(batch))
+
+    def _done(self, future, rows: int):
+        if future is not None and not future.done():
+            future.set_result(None)
+        with self._lock:
+            self.batches += 1
+            self.rows += rows
+            self.largest_batch = max(self.largest_batch, rows)
+        metrics.WRITE_BATCH_ROWS.observe(rows)
+
+    def _fail(self, future, error: Exception):
+        with self._lock:
+            self.failures += 1
+        if not future.done():
+            future.set_exception(error)
+
+    async def close(self):
+        """Write whatever is queued and stop the flusher"""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._closing = True
+        self._full.set()
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_rows": self.max_rows,
+                "max_delay_ms": self.max_delay * 1000,
+                "queued": len(self._pending),
+                "batches": self.batches,
+                "rows": self.rows,
+                "rows_per_batch": self.rows / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "failures": self.failures,
+            }
@@ -0,0 +1,67 @@
+"""Shared plumbing for the benchmark scripts"""
+import contextlib
+import os
+import subprocess
+import sys
+
+BASE_ENV = {
+    "PROJECT_NAME": "todo-bench",
+    "SECRET_KEY": "bench-secret",
+    "POSTGRES_SERVER": "unused",
+    "POSTGRES_USER": "unused",
+    "FIRST_SUPERUSER": "admin@example.com",
+    "FIRST_SUPERUSER_PASSWORD": "bench-password",
+}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_child(module: str, tmp: str, args: list[str], **env_overrides) -> str:
+    """
+    Run ``module --child args`` in a fresh interpreter against a throwaway
+    SQLite file in ``tmp``; settings are read at import time, so each
+    configuration needs its own process. Returns the last stdout line.
+    """
+    env = {
+        **os.environ,
+        **BASE_ENV,
+        "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+        **{key: str(value) for key, value in env_overrides.items()},
+    }
+    command = [sys.executable, "-m", module, "--child", *args]
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.stderr.write(result.stderr)
+        result.check_returncode()
+    return result.stdout.strip().splitlines()[-1]
+
+
+@contextlib.asynccontextmanager
+async def app_client():
+    """An httpx client bound to the app, with the app's lifespan running"""
+    import httpx
+    from app.main import app
+    from app.utilities import db
+
+    db.engine.echo = False
+    if db.async_engine is not None:
+        db.async_engine.echo = False
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+async def login(client, prefix: str, name: str) -> dict:
+    """Register ``name`` and return its Authorization header"""
+    credentials = {"email": f"{name}@example.com", "password": "bench-password"}
+    await client.post(f"{prefix}/auth/register", json={"username": name, **credentials})
+    response = await client.post(f"{prefix}/auth/login", json=credentials)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
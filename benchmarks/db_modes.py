@@ -0,0 +1,76 @@
+"""
+Compare request throughput of the sync Session path against the async
+engine (``DB_ASYNC``) path.
+
+Each mode runs in its own interpreter, since settings are read at import
+time, against a throwaway SQLite file (aiosqlite in async mode).
+
+    python -m benchmarks.db_modes --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+
+from .common import app_client, login, percentile, run_child
+
+
+async def _drive(requests: int, concurrency: int, items: int) -> dict:
+    from app.settings import settings
+
+    prefix = settings.API_V1_STR
+    async with app_client() as client:
+        client.headers.update(await login(client, prefix, "bench"))
+        for i in range(items):
+            await client.post(f"{prefix}/items/", json={"name": f"item {i}", "description": "", "is_done": False})
+
+        latencies = []
+        queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.get(f"{prefix}/items/")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "mode": "async" if settings.DB_ASYNC else "sync",
+        "requests": requests,
+        "concurrency": concurrency,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_drive(args.requests, args.concurrency, args.items))))
+        return
+
+    child_args = ["--requests", str(args.requests), "--concurrency", str(args.concurrency), "--items", str(args.items)]
+    for db_async in ("false", "true"):
+        with tempfile.TemporaryDirectory() as tmp:
+            print(run_child("benchmarks.db_modes", tmp, child_args, DB_ASYNC=db_async))
+
+
+if __name__ == "__main__":
+    main()
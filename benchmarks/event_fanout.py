@@ -0,0 +1,93 @@
+"""
+Cost of idle change-feed subscribers and event delivery latency.
+
+Opens N broker subscriptions, each with a task parked on ``get()`` the way
+an idle /events/stream connection waits, and reports the memory they take
+(tracemalloc, so the broker's share only, not the server's socket buffers)
+and how long a published event takes to reach one subscriber, and every
+member of a group, from a worker thread like a service publishes.
+
+    python -m benchmarks.event_fanout --subscribers 20000 --group-size 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+import uuid
+
+from .common import BASE_ENV
+
+
+async def _measure(subscribers: int, group_size: int, rounds: int) -> dict:
+    from app.utilities.events import Broker, LocalFanout, group_topic, user_topic
+
+    broker = Broker(LocalFanout(), queue_size=256)
+    broker.start()
+    group_id = uuid.uuid4()
+    received = {}
+
+    async def listen(subscription):
+        while True:
+            event = await subscription.get()
+            received[event["id"]].append(time.perf_counter())
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    user_ids = [uuid.uuid4() for _ in range(subscribers)]
+    subscriptions = [
+        broker.connect(user_id, [group_id] if i < group_size else ())
+        for i, user_id in enumerate(user_ids)
+    ]
+    tasks = [asyncio.create_task(listen(subscription)) for subscription in subscriptions]
+    await asyncio.sleep(0)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    async def deliver(topic, expected):
+        latencies = []
+        for _ in range(rounds):
+            event_id = broker.published + 1
+            received[event_id] = []
+            started = time.perf_counter()
+            thread = threading.Thread(target=broker.publish, args=(topic, "bench"))
+            thread.start()
+            while len(received[event_id]) < expected:
+                await asyncio.sleep(0)
+            thread.join()
+            latencies.append(max(received[event_id]) - started)
+        return {
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "max_ms": round(max(latencies) * 1000, 3),
+        }
+
+    result = {
+        "subscribers": subscribers,
+        "bytes_per_subscriber": round(allocated / subscribers),
+        "user_event": await deliver(user_topic(user_ids[-1]), 1),
+        f"group_event_to_{group_size}": await deliver(group_topic(group_id), group_size),
+    }
+    for task in tasks:
+        task.cancel()
+    broker.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=20000)
+    parser.add_argument("--group-size", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    for key, value in BASE_ENV.items():
+        os.environ.setdefault(key, value)
+    print(json.dumps(asyncio.run(_measure(args.subscribers, min(args.group_size, args.subscribers), args.rounds))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Peak memory of ``GET /items/export`` as the user's row count grows.
+
+Each row count runs in a fresh interpreter. The response body is drained
+straight from the ASGI app (httpx's ASGI transport would buffer it), and
+the peak of Python allocations during the export is read from
+tracemalloc alongside the process's peak RSS. With a server-side cursor
+both should stay flat from 10k to 100k rows.
+
+    python -m benchmarks.export_memory --rows 10000 50000 100000
+"""
+import argparse
+import asyncio
+import json
+import resource
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from .common import app_client, login, run_child
+
+
+async def _drain(app, path: str, headers: dict) -> int:
+    """Call the ASGI app directly and count body bytes without keeping them"""
+    received = 0
+    done = asyncio.Event()
+    requested = False
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "server": ("bench", 80), "client": ("bench", 1),
+        "root_path": "", "path": path.split("?")[0], "raw_path": path.split("?")[0].encode(),
+        "query_string": path.partition("?")[2].encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Starlette watches for a disconnect while streaming
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"export failed with {message['status']}")
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+
+    await app(scope, receive, send)
+    return received
+
+
+async def _drive(rows: int, format: str) -> dict:
+    from sqlalchemy import insert
+    from app.main import app
+    from app.models.item import Item
+    from app.models.user import User
+    from app.settings import settings
+    from app.utilities.db import engine
+    from sqlmodel import Session, select
+
+    prefix = settings.API_V1_STR
+    async with app_client() as client:
+        headers = await login(client, prefix, "exporter")
+        with Session(engine) as session:
+            user_id = session.exec(select(User.id).where(User.email == "exporter@example.com")).one()
+            for start in range(0, rows, 5000):
+                session.execute(insert(Item), [
+                    {"id": uuid.uuid4(), "name": f"item {i}", "description": "x" * 40, "is_done": False, "user_id": user_id}
+                    for i in range(start, min(start + 5000, rows))
+                ])
+            session.commit()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = await _drain(app, f"{prefix}/items/export?format={format}", headers)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "rows": rows,
+        "format": format,
+        "bytes": size,
+        "seconds": round(elapsed, 2),
+        "peak_traced_mb": round(peak / 2**20, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--async-db", action="store_true", help="run with DB_ASYNC=true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_drive(args.rows[0], args.format))))
+        return
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(run_child(
+                "benchmarks.export_memory", tmp, ["--rows", str(rows), "--format", args.format],
+                DB_ASYNC=str(args.async_db).lower(),
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+p99 latency of ``GET /items/`` while a flood of concurrent logins runs,
+with bcrypt inline in the threadpool (PASSWORD_HASH_WORKERS=0) versus the
+password-hashing process pool.
+
+    python -m benchmarks.login_flood --logins 200 --reads 500
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+from .common import app_client, login, percentile, run_child
+
+
+async def _drive(logins: int, login_concurrency: int, reads: int, read_concurrency: int) -> dict:
+    from app.settings import settings
+    from app.utilities.auth import password_hasher
+
+    prefix = settings.API_V1_STR
+    async with app_client() as client:
+        reader = await login(client, prefix, "reader")
+        await login(client, prefix, "flooder")
+        for i in range(20):
+            await client.post(f"{prefix}/items/", json={"name": f"item {i}", "description": "", "is_done": False}, headers=reader)
+
+        statuses = {}
+        credentials = {"email": "flooder@example.com", "password": "bench-password"}
+
+        async def flood(count):
+            for _ in range(count):
+                response = await client.post(f"{prefix}/auth/login", json=credentials)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        latencies = []
+
+        async def read(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                response = await client.get(f"{prefix}/items/", headers=reader)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(flood(logins // login_concurrency) for _ in range(login_concurrency)),
+            *(read(reads // read_concurrency) for _ in range(read_concurrency)),
+        )
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "hash_workers": password_hasher.workers,
+        "elapsed_s": round(elapsed, 2),
+        "items_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "items_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "login_statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--login-concurrency", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--read-concurrency", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size for the pooled run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(_drive(args.logins, args.login_concurrency, args.reads, args.read_concurrency))
+        print(json.dumps(result))
+        return
+
+    child_args = [
+        "--logins", str(args.logins), "--login-concurrency", str(args.login_concurrency),
+        "--reads", str(args.reads), "--read-concurrency", str(args.read_concurrency),
+    ]
+    pooled = {} if args.workers is None else {"PASSWORD_HASH_WORKERS": args.workers}
+    for overrides in ({"PASSWORD_HASH_WORKERS": 0}, pooled):
+        with tempfile.TemporaryDirectory() as tmp:
+            print(run_child("benchmarks.login_flood", tmp, child_args, **overrides))
+
+
+if __name__ == "__main__":
+    main()
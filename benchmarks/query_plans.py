@@ -0,0 +1,183 @@
+"""
+Check that the hot service queries are served by indexes.
+
+Migrates a fresh database from the init revision to head with Alembic (so
+the migration chain is exercised too), seeds it, then runs the ItemService/GroupService/AuthService
+calls behind the busiest routes while capturing every statement they send.
+Each captured statement is re-run under EXPLAIN; any full table scan is
+reported and the script exits non-zero, so it can gate CI.
+
+SQLite uses EXPLAIN QUERY PLAN ("SCAN <table>" is a full scan). On
+Postgres, point DATABASE_URL at a scratch database; sequential scans are
+disabled for the session so a plan only falls back to one when no usable
+index exists.
+
+    python -m benchmarks.query_plans
+    DATABASE_URL=postgresql+psycopg://.../scratch python -m benchmarks.query_plans
+
+tests/test_query_plans.py runs the same checks on SQLite as part of the
+test suite.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+from .common import BASE_ENV
+
+TABLES = ("user", "item", "group", "groupuserlink")
+
+
+def _migrate():
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(Path(__file__).resolve().parents[1] / "alembic.ini"))
+    # init only drops the pre-UUID tables, which an empty database never had
+    command.stamp(config, "4efa81fabe5e")
+    command.upgrade(config, "head")
+
+
+def seed(session, users: int, items: int):
+    from app.models import GroupUserLink
+    from app.models.group import Group
+    from app.models.item import Item
+    from app.models.user import User
+
+    people = [
+        User(username=f"user{i:04}", email=f"user{i}@example.com", hashed_password="x", isActive=True)
+        for i in range(users)
+    ]
+    session.add_all(people)
+    session.flush()
+    rows = [
+        Item(name=f"item {i}", description="", is_done=False, user_id=person.id)
+        for person in people for i in range(items)
+    ]
+    session.add_all(rows)
+    groups = [Group(name=f"group {i}", admin=people[i].id) for i in range(0, users, 5)]
+    session.add_all(groups)
+    session.flush()
+    for i, group in enumerate(groups):
+        session.add_all(
+            GroupUserLink(group_id=group.id, user_id=person.id) for person in people[i * 5:i * 5 + 5]
+        )
+    session.commit()
+    return people, rows[0].id, groups[0].id
+
+
+def hot_calls(people, item_id, group_id):
+    """(name, fn(session)) for the service calls behind the hot routes"""
+    from app.models.group import GroupInvite
+    from app.models.item import ItemBase
+    from app.routes.auth.service import AuthService
+    from app.routes.group.service import GroupService
+    from app.routes.item.service import ItemService
+
+    owner, other, outsider = people[0], people[1], people[-1]
+
+    def next_page(session):
+        page = ItemService.get_all_items(owner, session=session, limit=5)
+        return ItemService.get_all_items(owner, session=session, limit=5, cursor=page["next_cursor"])
+
+    return [
+        ("AuthService._get_user_by_email", lambda s: AuthService._get_user_by_email(owner.email, session=s)),
+        ("AuthService._get_user_by_email(active_only)", lambda s: AuthService._get_user_by_email(owner.email, session=s, active_only=True)),
+        ("ItemService.get_item", lambda s: ItemService.get_item(item_id, owner, session=s)),
+        ("ItemService.get_items_version", lambda s: ItemService.get_items_version(owner, session=s)),
+        ("ItemService.get_all_items", next_page),
+        ("ItemService.update_item", lambda s: ItemService.update_item(item_id, ItemBase(name="renamed", description="", is_done=True), owner, session=s)),
+        ("ItemService.delete_item", lambda s: ItemService.delete_item(item_id, owner, session=s)),
+        ("GroupService.get_all_groups", lambda s: GroupService.get_all_groups(owner, session=s)),
+        ("GroupService.get_group", lambda s: GroupService.get_group(group_id, owner, session=s)),
+        ("GroupService.get_group_members", lambda s: GroupService.get_group_members(group_id, owner, session=s, limit=2)),
+        ("GroupService.add_user_to_group", lambda s: GroupService.add_user_to_group(group_id, outsider.id, owner, session=s)),
+        ("GroupService.remove_user_from_group", lambda s: GroupService.remove_user_from_group(group_id, outsider.id, owner, session=s)),
+        ("GroupService.invite_user_to_group", lambda s: GroupService.invite_user_to_group(group_id, GroupInvite(email=other.email), owner, session=s)),
+    ]
+
+
+def full_scans(connection, statement: str, parameters) -> tuple[list[str], list[str]]:
+    """(plan lines, the lines that scan a whole table)"""
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        plan = [row[-1] for row in rows]
+        pattern = re.compile(r"^SCAN (\"?)(%s)\1(\s|$)" % "|".join(TABLES))
+    else:
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).all()
+        plan = [row[0] for row in rows]
+        pattern = re.compile(r"Seq Scan on \"?(%s)\"?\s" % "|".join(TABLES))
+    return plan, [line for line in plan if pattern.search(line.strip())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--items", type=int, default=50, help="items per user")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    for key, value in BASE_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp.name}/plans.db")
+    os.environ["DB_ASYNC"] = "false"
+
+    _migrate()
+
+    from sqlalchemy import event, text
+    from sqlmodel import Session
+    from app.utilities import db
+    from app.utilities.auth import set_user_cache_backend
+    from app.utilities.cache import NullCacheBackend
+
+    db.engine.echo = False
+    set_user_cache_backend(NullCacheBackend())
+    # The seeded users are handed to the services after this session closes
+    with Session(db.engine, expire_on_commit=False) as session:
+        people, item_id, group_id = seed(session, args.users, args.items)
+        if db.engine.dialect.name == "sqlite":
+            session.execute(text("ANALYZE"))
+            session.commit()
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            captured.append((statement, parameters))
+
+    failures = 0
+    for name, call in hot_calls(people, item_id, group_id):
+        with Session(db.engine) as session:
+            event.listen(db.engine, "before_cursor_execute", capture)
+            try:
+                call(session)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", capture)
+            statements, captured[:] = list(captured), []
+            session.rollback()
+
+            connection = session.connection()
+            if connection.dialect.name == "postgresql":
+                connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for statement, parameters in statements:
+                plan, scans = full_scans(connection, statement, parameters)
+                failures += bool(scans)
+                print(json.dumps({
+                    "call": name,
+                    "ok": not scans,
+                    "statement": " ".join(statement.split()),
+                    "plan": plan,
+                }))
+            session.rollback()
+
+    db.engine.dispose()
+    if failures:
+        print(f"{failures} statement(s) fall back to a full table scan", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Check read-replica routing with two SQLite files as primary and replica.
+
+The "replica" is refreshed only when the script copies the primary over it
+(SQLite's backup API), which makes replication lag explicit: a read served
+by the replica sees the data as of the last copy. For each engine flavour
+the script checks that
+
+- read-only routes of a user with no recent writes run on the replica,
+- a user's reads stay on the primary right after they write (read your
+  own writes) and move to the replica once REPLICA_STICKY_SECONDS pass,
+- writes always go to the primary.
+
+Exits non-zero if any check fails.
+
+    python -m benchmarks.replicas
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+import tempfile
+
+from .common import app_client, login, run_child
+
+STICKY_SECONDS = 0.5
+
+
+async def _check(tmp: str) -> list[dict]:
+    from sqlalchemy import event
+    from app.settings import settings
+    from app.utilities import db
+
+    prefix = settings.API_V1_STR
+    statements = {"primary": 0, "replica": 0}
+
+    def counter(name):
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements[name] += 1
+        return count
+
+    primary = db.async_engine if db.async_engine is not None else db.engine
+    replica = db.replica_engines[0]
+    event.listen(getattr(primary, "sync_engine", primary), "before_cursor_execute", counter("primary"))
+    event.listen(getattr(replica, "sync_engine", replica), "before_cursor_execute", counter("replica"))
+
+    def replicate():
+        with sqlite3.connect(f"{tmp}/bench.db") as source, sqlite3.connect(f"{tmp}/replica.db") as target:
+            source.backup(target)
+
+    checks = []
+
+    async def request(name, expect, call):
+        before = dict(statements)
+        response = await call()
+        response.raise_for_status()
+        ran = {key: statements[key] - before[key] for key in statements}
+        ok = all(ran[key] > 0 if expected else ran[key] == 0 for key, expected in expect.items())
+        checks.append({"check": name, "ok": ok, "statements": ran})
+        return response
+
+    async def names(client, headers):
+        response = await client.get(f"{prefix}/items/", headers=headers)
+        return [item["name"] for item in response.json()["items"]]
+
+    async with app_client() as client:
+        alice = await login(client, prefix, "alice")
+        bob = await login(client, prefix, "bobby")
+        replicate()
+
+        await request("GET /items/ without recent writes reads the replica", {"replica": True},
+                      lambda: client.get(f"{prefix}/items/", headers=bob))
+        await request("GET /groups/ reads the replica", {"replica": True},
+                      lambda: client.get(f"{prefix}/groups/", headers=bob))
+        await request("POST /items/ writes the primary", {"primary": True, "replica": False},
+                      lambda: client.post(f"{prefix}/items/", json={"name": "fresh", "description": "", "is_done": False}, headers=alice))
+        await request("GET /items/ right after a write stays on the primary", {"replica": False},
+                      lambda: client.get(f"{prefix}/items/", headers=alice))
+        checks.append({"check": "the writer sees the new item", "ok": await names(client, alice) == ["fresh"]})
+        await request("another user's GET /items/ still reads the replica", {"replica": True},
+                      lambda: client.get(f"{prefix}/items/", headers=bob))
+
+        await asyncio.sleep(STICKY_SECONDS * 2)
+        await request("after REPLICA_STICKY_SECONDS the writer reads the replica", {"replica": True},
+                      lambda: client.get(f"{prefix}/items/", headers=alice))
+        checks.append({"check": "the lagging replica lacks the new item", "ok": await names(client, alice) == []})
+        replicate()
+        checks.append({"check": "once replicated the replica has it", "ok": await names(client, alice) == ["fresh"]})
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--tmp", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_check(args.tmp))))
+        return
+
+    failures = 0
+    for db_async in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            checks = json.loads(run_child(
+                "benchmarks.replicas", tmp, ["--tmp", tmp],
+                DB_ASYNC=str(db_async).lower(),
+                DATABASE_REPLICA_URLS=f"sqlite:///{tmp}/replica.db",
+                REPLICA_STICKY_SECONDS=STICKY_SECONDS,
+                # Cached listings would hide which database served a read
+                RESPONSE_CACHE_SIZE=0,
+                METRICS="false",
+            ))
+        for check in checks:
+            failures += not check["ok"]
+            print(json.dumps({"db_async": db_async, **check}))
+    if failures:
+        print(f"{failures} check(s) failed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Latency, throughput and SQL query count for every route.
+
+Boots ``app.main`` in process (lifespan included) against a throwaway
+SQLite file, or the database in --database-url, seeds it at the requested
+scale and drives each route with concurrent httpx ASGI clients. Results go
+to a JSON file keyed by route template, so runs from two commits can be
+diffed directly or with --baseline.
+
+    python -m benchmarks.routes --users 50 --items 200 --output before.json
+    python -m benchmarks.routes --users 50 --items 200 --output after.json --baseline before.json
+    python -m benchmarks.routes --async --database-url postgresql+psycopg://bench@localhost/bench
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+from .common import app_client, login, percentile, run_child
+
+async def _create_items(client, prefix: str, headers: dict, names: list[str]) -> list[str]:
+    ids = []
+    for start in range(0, len(names), 500):
+        operations = [
+            {"op": "create", "item": {"name": name, "description": f"seeded {name}", "is_done": False}}
+            for name in names[start:start + 500]
+        ]
+        response = await client.post(f"{prefix}/items/batch", json={"operations": operations}, headers=headers)
+        response.raise_for_status()
+        ids += [result["item_id"] for result in response.json()["results"]]
+    return ids
+
+
+async def _seed(client, prefix: str, users: int, items: int, groups: int, requests: int) -> dict:
+    """Register users, give each ``items`` items and spread them over groups"""
+    people = []
+    for i in range(users):
+        headers = await login(client, prefix, f"bench{i:04}")
+        me = (await client.post(f"{prefix}/auth/protected", headers=headers)).json()["user"]
+        ids = await _create_items(client, prefix, headers, [f"item {n} of {i}" for n in range(items)])
+        people.append({"id": me["id"], "email": me["email"], "headers": headers, "item_ids": ids})
+
+    owner = people[0]
+    # Rows for the DELETE route to consume, so it never runs out
+    disposable = await _create_items(client, prefix, owner["headers"], [f"disposable {n}" for n in range(requests)])
+    group_ids = []
+    for g in range(groups):
+        response = await client.post(f"{prefix}/groups/", json={"name": f"group {g}", "description": "bench"}, headers=owner["headers"])
+        response.raise_for_status()
+        group_ids.append(response.json()["group_id"])
+    for g, group_id in enumerate(group_ids):
+        members = [person["id"] for person in people[1 + g::max(groups, 1)]]
+        await client.post(f"{prefix}/groups/{group_id}/members", json={"user_ids": members}, headers=owner["headers"])
+
+    return {"people": people, "owner": owner, "group_ids": group_ids, "item_ids": owner["item_ids"], "disposable": disposable}
+
+
+def _scenarios(prefix: str, data: dict) -> list[tuple[str, callable]]:
+    """(route, request(client, i)) in run order"""
+    owner, people, group_ids, item_ids = data["owner"], data["people"], data["group_ids"], data["item_ids"]
+    headers = owner["headers"]
+    others = people[1:] or people
+
+    async def register(client, i):
+        return await client.post(f"{prefix}/auth/register", json={
+            "username": f"newuser{i:06}", "email": f"newuser{i}@example.com", "password": "bench-password",
+        })
+
+    async def login_(client, i):
+        return await client.post(f"{prefix}/auth/login", json={"email": owner["email"], "password": "bench-password"})
+
+    group = lambda i: group_ids[i % len(group_ids)]
+    member = lambda i: others[i % len(others)]["id"]
+
+    scenarios = [
+        ("POST /auth/register", register),
+        ("POST /auth/login", login_),
+        ("POST /auth/protected", lambda c, i: c.post(f"{prefix}/auth/protected", headers=headers)),
+        ("POST /items/", lambda c, i: c.post(f"{prefix}/items/", json={"name": f"new item {i}", "description": "", "is_done": False}, headers=headers)),
+        ("GET /items/{item_id}", lambda c, i: c.get(f"{prefix}/items/{item_ids[i % len(item_ids)]}", headers=headers)),
+        ("GET /items/", lambda c, i: c.get(f"{prefix}/items/", headers=headers)),
+        ("GET /items/search", lambda c, i: c.get(f"{prefix}/items/search", params={"q": f"item {i % 50}"}, headers=headers)),
+        ("PUT /items/{item_id}", lambda c, i: c.put(
+            f"{prefix}/items/{item_ids[i % len(item_ids)]}",
+            json={"name": f"renamed {i}", "description": "", "is_done": True}, headers=headers,
+        )),
+        ("DELETE /items/{item_id}", lambda c, i: c.delete(f"{prefix}/items/{data['disposable'][i]}", headers=headers)),
+    ]
+    if group_ids:
+        scenarios += [
+            ("GET /groups/", lambda c, i: c.get(f"{prefix}/groups/", headers=headers)),
+            ("GET /groups/{group_id}", lambda c, i: c.get(f"{prefix}/groups/{group(i)}", headers=headers)),
+            ("GET /groups/search/{search_term}", lambda c, i: c.get(f"{prefix}/groups/search/group {i % 10}", headers=headers)),
+            ("POST /groups/{group_id}/members/{user_id}", lambda c, i: c.post(f"{prefix}/groups/{group(i)}/members/{member(i)}", headers=headers)),
+            ("GET /groups/{group_id}/members", lambda c, i: c.get(f"{prefix}/groups/{group(i)}/members", headers=headers)),
+            ("DELETE /groups/{group_id}/members/{user_id}", lambda c, i: c.delete(f"{prefix}/groups/{group(i)}/members/{member(i)}", headers=headers)),
+        ]
+    return scenarios
+
+
+async def _run_route(client, request, requests: int, concurrency: int) -> dict:
+    # ASGITransport runs the app in the calling task, so each worker's
+    # count_queries() block sees exactly the statements of its own request
+    from app.utilities.timing import count_queries
+
+    latencies, queries, errors = [], [], 0
+    next_index = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in next_index:
+            started = time.perf_counter()
+            with count_queries() as counter:
+                response = await request(client, i)
+            latencies.append(time.perf_counter() - started)
+            queries.append(counter.count)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "queries_max": max(queries),
+    }
+
+
+async def _drive(args) -> dict:
+    from app.settings import settings
+    from app.utilities import db
+
+    prefix = settings.API_V1_STR
+    async with app_client() as client:
+        data = await _seed(client, prefix, args.users, args.items, args.groups, args.requests)
+        routes = {}
+        for route, request in _scenarios(prefix, data):
+            requests = min(args.requests, args.auth_requests) if route.startswith("POST /auth/") else args.requests
+            routes[route] = await _run_route(client, request, requests, args.concurrency)
+
+    return {
+        "meta": {
+            "dialect": db.engine.dialect.name,
+            "db_async": settings.DB_ASYNC,
+            "users": args.users,
+            "items_per_user": args.items,
+            "groups": args.groups,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+        },
+        "routes": routes,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: dict, baseline: dict):
+    print(f"{'route':48} {'p50 ms':>16} {'p95 ms':>16} {'queries':>12}")
+    for route, now in results["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if before is None:
+            print(f"{route:48} {'(new)':>16}")
+            continue
+        cells = [
+            f"{before[key]:.2f}->{now[key]:.2f}" for key in ("p50_ms", "p95_ms")
+        ] + [f"{before['queries_per_request']:g}->{now['queries_per_request']:g}"]
+        print(f"{route:48} {cells[0]:>16} {cells[1]:>16} {cells[2]:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="seeded users")
+    parser.add_argument("--items", type=int, default=100, help="seeded items per user")
+    parser.add_argument("--groups", type=int, default=5, help="seeded groups")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--auth-requests", type=int, default=50, help="requests per bcrypt-bound auth route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--async", dest="db_async", action="store_true", help="run with DB_ASYNC")
+    parser.add_argument("--database-url", help="run against this database instead of a throwaway SQLite file")
+    parser.add_argument("--output", default="bench-routes.json")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_drive(args))))
+        return
+
+    child_args = [
+        "--users", str(args.users), "--items", str(args.items), "--groups", str(args.groups),
+        "--requests", str(args.requests), "--auth-requests", str(args.auth_requests),
+        "--concurrency", str(args.concurrency),
+    ]
+    env = {"DB_ASYNC": str(args.db_async).lower()}
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    with tempfile.TemporaryDirectory() as tmp:
+        results = json.loads(run_child("benchmarks.routes", tmp, child_args, **env))
+    results["meta"]["commit"] = _git_commit()
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+        output.write("\n")
+    print(f"wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            _compare(results, json.load(baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Serialization cost of a list response, before and after typed response
+models, with the stdlib and orjson renderers.
+
+    before        jsonable_encoder over raw ORM rows, JSONResponse
+    typed         ItemList response model, JSONResponse
+    typed+orjson  ItemList response model, ORJSONResponse (FAST_JSON)
+
+Runs in process on in-memory Item objects, so only serialization is timed.
+
+    python -m benchmarks.serialization --rows 100 1000 --repeat 50
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+
+from .common import BASE_ENV
+
+
+def _time(fn, repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for key, value in BASE_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from app.models.item import Item, ItemList
+
+    for rows in args.rows:
+        user_id = uuid.uuid4()
+        items = [
+            Item(id=uuid.uuid4(), name=f"item {i}", description="x" * 40, is_done=bool(i % 2), user_id=user_id)
+            for i in range(rows)
+        ]
+        content = {"items": items, "next_cursor": None}
+
+        def typed():
+            return ItemList.model_validate(content).model_dump(mode="json")
+
+        results = {
+            "before": _time(lambda: JSONResponse(jsonable_encoder(content)), args.repeat),
+            "typed": _time(lambda: JSONResponse(typed()), args.repeat),
+            "typed+orjson": _time(lambda: ORJSONResponse(typed()), args.repeat),
+        }
+        print(json.dumps({"rows": rows, **{f"{name}_ms": round(ms, 3) for name, ms in results.items()}}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Cold start to first response, per startup configuration.
+
+Each run is a fresh interpreter against a database already migrated to
+head (the steady state of a worker booting into an existing deployment).
+It reports, from process spawn: the app import, lifespan startup and the
+first request touching the database (a login for an unknown user, so no
+bcrypt), plus that first request on its own.
+
+    python -m benchmarks.startup --runs 5 --warm 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import BASE_ENV, run_child
+
+
+def _child():
+    started = time.time()
+    import httpx
+    from app.main import app
+    from app.settings import settings
+    imported = time.time()
+
+    async def boot():
+        async with app.router.lifespan_context(app):
+            ready = time.time()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                response = await client.post(
+                    f"{settings.API_V1_STR}/auth/login",
+                    json={"email": "nobody@example.com", "password": "bench-password"},
+                )
+                assert response.status_code == 401, response.text
+            return ready, time.time()
+
+    ready, responded = asyncio.run(boot())
+    print(json.dumps({"started": started, "imported": imported, "ready": ready, "responded": responded}))
+
+
+def _migrate(tmp: str):
+    env = {**os.environ, **BASE_ENV, "DATABASE_URL": f"sqlite:///{tmp}/bench.db"}
+    # init only drops the pre-UUID tables, which an empty database never had
+    for step in (["stamp", "4efa81fabe5e"], ["upgrade", "head"]):
+        subprocess.run([sys.executable, "-m", "alembic", *step], env=env, check=True, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm", type=int, default=4, help="DB_POOL_WARM for the warmed configuration")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child()
+        return
+
+    configurations = {
+        "create_all": {"SCHEMA_MANAGEMENT": "create_all"},
+        "verify": {"SCHEMA_MANAGEMENT": "verify"},
+        f"verify+warm{args.warm}": {"SCHEMA_MANAGEMENT": "verify", "DB_POOL_WARM": args.warm},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        _migrate(tmp)
+        for name, env in configurations.items():
+            samples = {"import_ms": [], "startup_ms": [], "first_request_ms": [], "cold_start_ms": []}
+            for _ in range(args.runs):
+                spawned = time.time()
+                times = json.loads(run_child("benchmarks.startup", tmp, [], METRICS="false", **env))
+                samples["import_ms"].append(times["imported"] - spawned)
+                samples["startup_ms"].append(times["ready"] - times["imported"])
+                samples["first_request_ms"].append(times["responded"] - times["ready"])
+                samples["cold_start_ms"].append(times["responded"] - spawned)
+            print(json.dumps({
+                "config": name,
+                "runs": args.runs,
+                **{key: round(statistics.median(values) * 1000, 1) for key, values in samples.items()},
+            }))
+
+
+if __name__ == "__main__":
+    main()
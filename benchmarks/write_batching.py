@@ -0,0 +1,102 @@
+"""
+POST /items/ throughput, latency and commit rate with and without group
+commit (ITEM_WRITE_BATCHING).
+
+Every COMMIT is at least one fsync: the WAL flush on Postgres with
+synchronous_commit=on, the journal and database syncs on SQLite. The
+script counts commits on the request engine, so commits/s is the fsync
+rate the write path puts on the database. Each configuration runs in its
+own interpreter against a throwaway SQLite file.
+
+    python -m benchmarks.write_batching --requests 2000 --concurrency 64
+    python -m benchmarks.write_batching --async --delays 0 2 10
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+
+from .common import app_client, login, percentile, run_child
+
+
+async def _drive(requests: int, concurrency: int) -> dict:
+    from sqlalchemy import event
+    from app.settings import settings
+    from app.utilities import db
+
+    prefix = settings.API_V1_STR
+    commits = 0
+
+    def count_commit(connection):
+        nonlocal commits
+        commits += 1
+
+    request_engine = db.async_engine if db.async_engine is not None else db.engine
+    event.listen(getattr(request_engine, "sync_engine", request_engine), "commit", count_commit)
+
+    async with app_client() as client:
+        client.headers.update(await login(client, prefix, "bench"))
+        latencies = []
+        next_index = iter(range(requests))
+
+        async def worker():
+            for i in next_index:
+                started = time.perf_counter()
+                response = await client.post(f"{prefix}/items/", json={"name": f"item {i}", "description": "", "is_done": False})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        commits = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        measured_commits = commits
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "commits": measured_commits,
+        "commits_per_s": round(measured_commits / elapsed, 1),
+        "rows_per_commit": round(requests / measured_commits, 2) if measured_commits else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rows", type=int, default=256, help="ITEM_WRITE_BATCH_ROWS")
+    parser.add_argument("--delays", type=float, nargs="+", default=[0, 2], help="ITEM_WRITE_BATCH_DELAY_MS values to try")
+    parser.add_argument("--async", dest="db_async", action="store_true", help="run with DB_ASYNC")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_drive(args.requests, args.concurrency))))
+        return
+
+    child_args = ["--requests", str(args.requests), "--concurrency", str(args.concurrency)]
+    configurations = {"per-request commit": {"ITEM_WRITE_BATCHING": "false"}}
+    for delay in args.delays:
+        configurations[f"group commit, {delay:g} ms"] = {
+            "ITEM_WRITE_BATCHING": "true",
+            "ITEM_WRITE_BATCH_ROWS": args.rows,
+            "ITEM_WRITE_BATCH_DELAY_MS": delay,
+        }
+    for name, env in configurations.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            result = json.loads(run_child(
+                "benchmarks.write_batching", tmp, child_args,
+                DB_ASYNC=str(args.db_async).lower(), METRICS="false", **env,
+            ))
+        print(json.dumps({"config": name, **result}))
+
+
+if __name__ == "__main__":
+    main()
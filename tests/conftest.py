@@ -0,0 +1,105 @@
+"""
+Test configuration. Settings are read when the app is imported, so the
+environment points at a throwaway SQLite file before anything imports it.
+
+Tests that use ``client`` run once per database mode: sync sessions in
+the threadpool, and DB_ASYNC's AsyncSession on an aiosqlite engine over
+the same file.
+"""
+import os
+import tempfile
+import uuid
+
+_tmp = tempfile.mkdtemp(prefix="todo-tests-")
+os.environ.update({
+    "PROJECT_NAME": "todo-tests",
+    "SECRET_KEY": "test-secret",
+    "POSTGRES_SERVER": "unused",
+    "POSTGRES_USER": "unused",
+    "FIRST_SUPERUSER": "admin@example.com",
+    "FIRST_SUPERUSER_PASSWORD": "test-password",
+    "DATABASE_URL": f"sqlite:///{_tmp}/test.db",
+    "PASSWORD_HASH_WORKERS": "0",
+    "JOB_RETRY_DELAY_SECONDS": "0.01",
+})
+
+import httpx
+import pytest
+from fastapi import Depends
+
+from app.main import app
+from app.settings import settings
+from app.utilities import auth as auth_utilities, db
+from app.utilities.db import create_db_and_tables
+
+PREFIX = settings.API_V1_STR
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs a Postgres database (TEST_POSTGRES_URL)")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    create_db_and_tables()
+
+
+@pytest.fixture(scope="session")
+def async_engine():
+    if db.async_engine is not None:
+        return db.async_engine
+    engine, _ = db._create_async_engine(settings.DATABASE_URL, "primary-async")
+    return engine
+
+
+# Stand-ins for get_current_user that take their session from get_db, so
+# they share it with the route however get_db is overridden (FastAPI caches
+# an overridden dependency under the original callable)
+def _current_user(token=Depends(auth_utilities.auth_scheme), session=Depends(db.get_db)):
+    return auth_utilities.get_user_from_token(token, session)
+
+
+async def _current_user_async(token=Depends(auth_utilities.auth_scheme), session=Depends(db.get_db)):
+    return await auth_utilities.get_user_from_token_async(token, session)
+
+
+@pytest.fixture(params=["sync", "async"])
+def db_mode(request, monkeypatch, async_engine):
+    """Switch the app between DB_ASYNC off and on, as the setting would at import"""
+    is_async = request.param == "async"
+    monkeypatch.setattr(settings, "DB_ASYNC", is_async)
+    monkeypatch.setattr(db, "async_engine", async_engine if is_async else None)
+    overrides = {
+        db.get_db: db.get_async_session if is_async else db.get_session,
+        auth_utilities.get_current_user: _current_user_async if is_async else _current_user,
+    }
+    for dependency, replacement in overrides.items():
+        monkeypatch.setitem(app.dependency_overrides, dependency, replacement)
+    return request.param
+
+
+@pytest.fixture
+async def client(db_mode):
+    """An httpx client bound to the app, with the app's lifespan running"""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+
+
+@pytest.fixture
+async def auth(client):
+    """Register a fresh user and return their Authorization header"""
+    async def register() -> dict:
+        name = f"user-{uuid.uuid4().hex[:12]}"
+        credentials = {"email": f"{name}@example.com", "password": "password123"}
+        response = await client.post(f"{PREFIX}/auth/register", json={"username": name, **credentials})
+        assert response.status_code == 200, response.text
+        response = await client.post(f"{PREFIX}/auth/login", json=credentials)
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return register
@@ -0,0 +1,50 @@
+"""
+Change numbering from Postgres transaction ids. Needs a scratch database:
+set TEST_POSTGRES_URL (postgresql+psycopg://...) to run these.
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, insert, text
+
+from app.models import ChangeCounter, change_head, next_change_seq
+
+pytestmark = pytest.mark.postgres
+
+
+@pytest.fixture
+def pg_engine():
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(url)
+    table = ChangeCounter.__table__
+    with engine.begin() as connection:
+        table.drop(connection, checkfirst=True)
+        table.create(connection)
+        connection.execute(insert(table).values(id=1, value=0, xid_base=1000, pruned_through=0))
+    yield engine
+    with engine.begin() as connection:
+        table.drop(connection)
+    engine.dispose()
+
+
+def test_number_is_the_transaction_id_plus_base(pg_engine):
+    with pg_engine.begin() as connection:
+        seq = next_change_seq(connection)
+        xid = connection.execute(text("SELECT pg_current_xact_id()::text::bigint")).scalar_one()
+        assert seq == xid + 1000
+        assert next_change_seq(connection) == seq
+    with pg_engine.begin() as connection:
+        assert next_change_seq(connection) > seq
+
+
+def test_head_waits_for_running_writers(pg_engine):
+    with pg_engine.connect() as writer, pg_engine.connect() as reader:
+        writer.begin()
+        seq = next_change_seq(writer)
+        with reader.begin():
+            assert change_head(reader) < seq
+        writer.commit()
+        with reader.begin():
+            assert change_head(reader) >= seq
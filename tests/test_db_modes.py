@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import event
+
+from app.settings import settings
+from app.utilities import db
+
+pytestmark = pytest.mark.anyio
+
+PREFIX = settings.API_V1_STR
+
+
+async def test_requests_run_on_the_selected_engine(client, auth, db_mode, async_engine):
+    headers = await auth()
+    engines = {"sync": db.engine, "async": async_engine.sync_engine}
+    seen = {mode: [] for mode in engines}
+    listeners = {
+        mode: (lambda *args, mode=mode: seen[mode].append(args[2])) for mode in engines
+    }
+    for mode, engine in engines.items():
+        event.listen(engine, "before_cursor_execute", listeners[mode])
+    try:
+        response = await client.post(f"{PREFIX}/items/", json={"name": "mode", "description": "", "is_done": False}, headers=headers)
+        assert response.status_code == 200, response.text
+        response = await client.get(f"{PREFIX}/items/", headers=headers)
+        assert [item["name"] for item in response.json()["items"]] == ["mode"]
+    finally:
+        for mode, engine in engines.items():
+            event.remove(engine, "before_cursor_execute", listeners[mode])
+
+    other = "sync" if db_mode == "async" else "async"
+    assert any(statement.startswith("INSERT INTO item") for statement in seen[db_mode])
+    assert not any("item" in statement for statement in seen[other])
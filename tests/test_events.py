@@ -0,0 +1,39 @@
+import logging
+from uuid import uuid4
+
+import pytest
+
+from app.utilities.events import Broker, LocalFanout, user_topic
+
+pytestmark = pytest.mark.anyio
+
+
+def test_publish_before_start_is_dropped_quietly(caplog):
+    broker = Broker(LocalFanout(), queue_size=8)
+    with caplog.at_level(logging.ERROR, logger="app.utilities.events"):
+        broker.publish(user_topic(uuid4()), "item.created", item_ids=[])
+    assert broker.published == 1
+    assert not caplog.records
+
+
+async def test_subscriber_gets_events_of_its_topic():
+    broker = Broker(LocalFanout(), queue_size=8)
+    broker.start()
+    user_id = uuid4()
+    subscription = broker.connect(user_id)
+    broker.publish(user_topic(user_id), "item.created", item_ids=[1])
+    broker.publish(user_topic(uuid4()), "item.created", item_ids=[2])
+    event = await subscription.get(timeout=1)
+    assert event["type"] == "item.created" and event["item_ids"] == [1]
+    assert await subscription.get(timeout=0.05) is None
+    subscription.close()
+    broker.stop()
+
+
+def test_publish_after_stop_is_dropped_quietly(caplog):
+    broker = Broker(LocalFanout(), queue_size=8)
+    broker.fanout.start(lambda topic, event: None)
+    broker.stop()
+    with caplog.at_level(logging.ERROR, logger="app.utilities.events"):
+        broker.publish(user_topic(uuid4()), "item.deleted", item_ids=[])
+    assert not caplog.records
@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import tracemalloc
+import uuid
+
+import anyio
+import pytest
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app.main import app
+from app.models.item import Item
+from app.settings import settings
+from app.utilities import db
+
+pytestmark = pytest.mark.anyio
+
+PREFIX = settings.API_V1_STR
+
+
+async def _export_peak(headers: dict, format: str) -> tuple[int, int]:
+    """
+    Stream the export straight from the ASGI app, counting body bytes
+    without keeping them (httpx's ASGI transport buffers the whole body).
+    Returns the size and the peak of Python allocations meanwhile.
+    """
+    received = 0
+    finished = anyio.Event()
+    requested = False
+    path = f"{PREFIX}/items/export"
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "server": ("test", 80), "client": ("test", 1),
+        "root_path": "", "path": path, "raw_path": path.encode(),
+        "query_string": f"format={format}".encode(),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+    }
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Starlette watches for a disconnect while streaming
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200
+        elif message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body"):
+                finished.set()
+
+    tracemalloc.start()
+    try:
+        await app(scope, receive, send)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert finished.is_set()
+    return received, peak
+
+
+async def _user_with_items(auth, client, rows: int) -> dict:
+    headers = await auth()
+    user_id = uuid.UUID((await client.post(f"{PREFIX}/auth/protected", headers=headers)).json()["user"]["id"])
+    with Session(db.engine) as session:
+        for start in range(0, rows, 5000):
+            session.execute(insert(Item), [
+                {"id": uuid.uuid4(), "name": f"item {i}", "description": "x" * 40, "is_done": False, "user_id": user_id}
+                for i in range(start, min(start + 5000, rows))
+            ])
+        session.commit()
+    return headers
+
+
+async def test_export_bodies(client, auth):
+    headers = await auth()
+    for name in ("milk", "eggs, large"):
+        await client.post(f"{PREFIX}/items/", json={"name": name, "description": "shop", "is_done": False}, headers=headers)
+
+    response = await client.get(f"{PREFIX}/items/export", params={"format": "ndjson"}, headers=headers)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["name"] for row in rows) == ["eggs, large", "milk"]
+    assert all(row.keys() == {"id", "name", "description", "is_done"} for row in rows)
+
+    response = await client.get(f"{PREFIX}/items/export", params={"format": "csv"}, headers=headers)
+    assert response.headers["content-type"].startswith("text/csv")
+    header, *rows = csv.reader(io.StringIO(response.text))
+    assert header == ["id", "name", "description", "is_done"]
+    assert sorted(row[1] for row in rows) == ["eggs, large", "milk"]
+
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+async def test_export_memory_does_not_grow_with_rows(client, auth, format):
+    peaks = {}
+    for rows in (2_000, 20_000):
+        headers = await _user_with_items(auth, client, rows)
+        size, peaks[rows] = await _export_peak(headers, format)
+        assert size > rows * 40
+    # Ten times the rows: the body grows tenfold (to about 2 MB), the peak
+    # must not
+    assert peaks[20_000] < peaks[2_000] * 1.5
+    assert peaks[20_000] < 2 * 2**20
@@ -0,0 +1,76 @@
+import json
+from uuid import UUID
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models.item import Item
+from app.routes.item import service
+from app.settings import settings
+from app.utilities.db import engine
+
+pytestmark = pytest.mark.anyio
+
+PREFIX = settings.API_V1_STR
+
+
+def _lines(count: int) -> str:
+    return "\n".join(json.dumps({"name": f"imported {i}", "description": "", "is_done": False}) for i in range(count))
+
+
+async def test_import_rows_carry_every_required_column(client, auth, monkeypatch):
+    # COPY (psycopg) skips Python-side column defaults, so the rows handed
+    # to bulk_insert must already hold every NOT NULL value
+    handed = []
+    bulk_insert = service.bulk_insert
+
+    def capture(session, model, rows):
+        handed.extend(rows)
+        bulk_insert(session, model, rows)
+
+    monkeypatch.setattr(service, "bulk_insert", capture)
+    response = await client.post(f"{PREFIX}/items/import", content=_lines(3), headers=await auth())
+
+    assert response.status_code == 200, response.text
+    assert response.json()["inserted"] == 3
+    required = {
+        column.name for column in Item.__table__.columns
+        if not column.nullable and column.server_default is None
+    }
+    assert handed and all(required <= row.keys() for row in handed)
+    assert all(row["change_seq"] is not None for row in handed)
+
+
+async def test_imported_items_share_one_change_and_start_at_version_1(client, auth):
+    headers = await auth()
+    response = await client.post(f"{PREFIX}/items/import", content=_lines(4), headers=headers)
+    assert response.json()["inserted"] == 4
+
+    items = (await client.get(f"{PREFIX}/items/", headers=headers)).json()["items"]
+    assert len(items) == 4
+    with Session(engine) as session:
+        rows = session.exec(select(Item).where(Item.id.in_([UUID(item["id"]) for item in items]))).all()
+    assert {row.version for row in rows} == {1}
+    assert all(row.updated_at is not None for row in rows)
+    assert len({row.change_seq for row in rows}) == 1
+
+
+async def test_bad_lines_are_reported_and_skipped(client, auth, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    body = "\n".join([
+        json.dumps({"name": "first", "description": "", "is_done": False}),
+        "{not json",
+        json.dumps({"description": "no name"}),
+        "",
+        *(json.dumps({"name": f"chunked {i}", "description": "", "is_done": False}) for i in range(3)),
+    ])
+    headers = await auth()
+    response = await client.post(f"{PREFIX}/items/import", content=body, headers=headers)
+
+    result = response.json()
+    assert (result["lines"], result["inserted"], result["failed"]) == (6, 4, 2)
+    assert [error["line"] for error in result["errors"]] == [2, 3]
+    assert result["errors"][0]["detail"].startswith("Invalid JSON")
+    assert not result["errors_truncated"]
+    items = (await client.get(f"{PREFIX}/items/", headers=headers)).json()["items"]
+    assert sorted(item["name"] for item in items) == ["chunked 0", "chunked 1", "chunked 2", "first"]
@@ -0,0 +1,142 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app.models import utcnow
+from app.models.job import Job
+from app.settings import settings
+from app.utilities.jobs import DatabaseJobStore, JobRunner, MemoryJobStore
+from app.utilities.write_batch import run_in_own_session
+
+pytestmark = pytest.mark.anyio
+
+PREFIX = settings.API_V1_STR
+
+
+def _runner(store=None, max_attempts=3) -> JobRunner:
+    return JobRunner(store or MemoryJobStore(), workers=2, max_queued=10, max_attempts=max_attempts, retry_delay=0.01, lease=60)
+
+
+async def _finished(runner: JobRunner, job: Job) -> Job:
+    for _ in range(200):
+        job = await runner.get(job.id)
+        if job.status in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job still {job.status}")
+
+
+async def test_failing_job_is_retried_until_it_succeeds():
+    runner = _runner()
+    attempts = []
+
+    @runner.handler("flaky")
+    async def flaky(job, fail_times):
+        attempts.append(job.attempts)
+        if len(attempts) <= fail_times:
+            raise RuntimeError("boom")
+        return {"ok": True}
+
+    job = await _finished(runner, await runner.enqueue("flaky", None, fail_times=2))
+    await runner.stop()
+    assert job.status == "succeeded" and job.result == {"ok": True}
+    assert attempts == [1, 2, 3]
+    assert runner.stats()["retried"] == 2
+
+
+async def test_job_fails_after_max_attempts():
+    runner = _runner(max_attempts=2)
+
+    @runner.handler("broken")
+    async def broken(job):
+        raise RuntimeError("boom")
+
+    job = await _finished(runner, await runner.enqueue("broken"))
+    await runner.stop()
+    assert job.status == "failed" and job.attempts == 2
+    assert "boom" in job.error
+
+
+async def test_http_exception_fails_without_retry():
+    runner = _runner()
+
+    @runner.handler("gone")
+    async def gone(job):
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    job = await _finished(runner, await runner.enqueue("gone"))
+    await runner.stop()
+    assert job.status == "failed" and job.attempts == 1
+    assert job.error == "Group not found"
+
+
+async def test_full_queue_is_refused():
+    runner = JobRunner(MemoryJobStore(), workers=0, max_queued=1, max_attempts=1, retry_delay=0, lease=60)
+    runner.handler("noop")(lambda job: None)
+    await runner.enqueue("noop")
+    with pytest.raises(HTTPException) as refused:
+        await runner.enqueue("noop")
+    await runner.stop()
+    assert refused.value.status_code == 503
+
+
+def _expire_lease(job_id, session):
+    session.execute(update(Job).where(Job.id == job_id).values(locked_until=utcnow() - timedelta(seconds=1)))
+    session.commit()
+
+
+async def test_database_lease_blocks_a_second_claim_until_it_runs_out():
+    store = DatabaseJobStore(retention=timedelta(hours=1))
+    job = Job(kind="lease", params={})
+    await store.add(job)
+
+    assert await store.claim(job, timedelta(seconds=60))
+    elsewhere = await store.get(job.id)
+    assert not await store.claim(elsewhere, timedelta(seconds=60))
+
+    # The claiming process died: once the lease passes the job is taken over
+    await run_in_own_session(_expire_lease, job.id)
+    assert job.id in {recovered.id for recovered in await store.recover()}
+    assert await store.claim(elsewhere, timedelta(seconds=60))
+    assert elsewhere.attempts == 2
+
+
+async def test_database_store_recovers_queued_jobs_on_start():
+    store = DatabaseJobStore(retention=timedelta(hours=1))
+    job = Job(kind="recovered", params={"value": 7})
+    await store.add(job)
+
+    runner = _runner(store)
+    seen = []
+
+    @runner.handler("recovered")
+    async def recovered(job, value):
+        seen.append(value)
+
+    await runner.start()
+    job = await _finished(runner, job)
+    await runner.stop()
+    assert job.status == "succeeded" and seen == [7]
+
+
+async def test_group_delete_runs_as_a_job_the_owner_can_follow(client, auth):
+    admin, stranger = await auth(), await auth()
+    group_id = (await client.post(f"{PREFIX}/groups/", json={"name": "doomed", "description": ""}, headers=admin)).json()["group_id"]
+
+    response = await client.delete(f"{PREFIX}/groups/{group_id}", headers=admin)
+    assert response.status_code == 202
+    accepted = response.json()
+    assert response.headers["Location"] == accepted["status_url"]
+
+    for _ in range(200):
+        job = (await client.get(accepted["status_url"], headers=admin)).json()
+        if job["status"] in ("succeeded", "failed"):
+            break
+        await asyncio.sleep(0.01)
+    assert job["status"] == "succeeded", job
+    assert (await client.get(f"{PREFIX}/groups/{group_id}", headers=admin)).status_code == 404
+    # Other users can't see the job
+    assert (await client.get(accepted["status_url"], headers=stranger)).status_code == 404
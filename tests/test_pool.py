@@ -0,0 +1,41 @@
+from sqlalchemy import create_engine, text
+
+from app.utilities.pool import PoolStats, TimedQueuePool
+
+
+def _engine(tmp_path):
+    return create_engine(
+        f"sqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool, pool_size=2, max_overflow=0
+    )
+
+
+def test_snapshot_reports_the_pool_in_use(tmp_path):
+    engine = _engine(tmp_path)
+    stats = PoolStats("test").attach(engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        assert stats.snapshot()["checked_out"] == 1
+    assert stats.snapshot()["idle"] == 1
+
+    engine.dispose()
+
+    snapshot = stats.snapshot()
+    assert snapshot["pool_class"] == "TimedQueuePool"
+    assert snapshot["idle"] == 0
+    assert snapshot["checked_out"] == 0
+
+
+def test_counters_survive_dispose(tmp_path):
+    engine = _engine(tmp_path)
+    stats = PoolStats("test").attach(engine)
+    with engine.connect():
+        pass
+    engine.dispose()
+    with engine.connect() as connection:
+        assert stats.snapshot()["checked_out"] == 1
+        connection.execute(text("SELECT 1"))
+    snapshot = stats.snapshot()
+    assert snapshot["checkouts"] == 2
+    assert snapshot["connects"] == 2
+    assert snapshot["idle"] == 1
+    assert stats.waits == 2
@@ -0,0 +1,39 @@
+import pytest
+
+from app.settings import settings
+from app.utilities.timing import assert_max_queries
+
+pytestmark = pytest.mark.anyio
+
+PREFIX = settings.API_V1_STR
+
+
+async def _get(client, path, headers, limit):
+    with assert_max_queries(limit):
+        response = await client.get(f"{PREFIX}{path}", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_item_listing_does_not_grow_with_rows(client, auth):
+    headers = await auth()
+    # Authentication, the collection version behind the ETag, the page
+    assert (await _get(client, "/items/", headers, 4))["items"] == []
+    for i in range(20):
+        await client.post(f"{PREFIX}/items/", json={"name": f"item {i}", "description": "", "is_done": False}, headers=headers)
+    assert len((await _get(client, "/items/", headers, 4))["items"]) == 20
+    # Plus the search index's head and, on first use, its build
+    assert len((await _get(client, "/items/?q=item", headers, 6))["items"]) == 20
+
+
+async def test_group_listing_does_not_grow_with_rows(client, auth):
+    admin, member = await auth(), await auth()
+    member_id = (await client.post(f"{PREFIX}/auth/protected", headers=member)).json()["user"]["id"]
+    assert (await _get(client, "/groups/", admin, 2))["groups"] == []
+    for i in range(10):
+        group_id = (await client.post(f"{PREFIX}/groups/", json={"name": f"group {i}", "description": ""}, headers=admin)).json()["group_id"]
+        await client.post(f"{PREFIX}/groups/{group_id}/members/{member_id}", headers=admin)
+    assert len((await _get(client, "/groups/", admin, 2))["groups"]) == 10
+    assert len((await _get(client, "/groups/?q=group", member, 5))["groups"]) == 10
+    # Members come from the link table, not a lazy load per user
+    assert len((await _get(client, f"/groups/{group_id}/members", admin, 4))["members"]) == 2
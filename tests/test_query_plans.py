@@ -0,0 +1,70 @@
+"""
+The hot service queries must be served by indexes on a database built by
+the migration chain (not create_all), the way a fresh deployment gets it.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlmodel import Session
+
+from app.utilities import auth
+from app.utilities.cache import NullCacheBackend
+from benchmarks.query_plans import full_scans, hot_calls, seed
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _alembic(url: str, *args: str):
+    # A separate process: env.py reconfigures logging for the whole interpreter
+    subprocess.run(
+        [sys.executable, "-m", "alembic", *args],
+        cwd=ROOT, env={**os.environ, "DATABASE_URL": url}, check=True, capture_output=True,
+    )
+
+
+@pytest.fixture(scope="module")
+def migrated(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('plans')}/plans.db"
+    # The documented steps for an empty database
+    _alembic(url, "stamp", "4efa81fabe5e")
+    _alembic(url, "upgrade", "head")
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
+
+
+def test_hot_queries_use_indexes(migrated, monkeypatch):
+    monkeypatch.setattr(auth, "user_cache", NullCacheBackend())
+    # The seeded users are handed to the services after this session closes
+    with Session(migrated, expire_on_commit=False) as session:
+        people, item_id, group_id = seed(session, users=100, items=20)
+        session.execute(text("ANALYZE"))
+        session.commit()
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            captured.append((statement, parameters))
+
+    scans = []
+    for name, call in hot_calls(people, item_id, group_id):
+        with Session(migrated) as session:
+            event.listen(migrated, "before_cursor_execute", capture)
+            try:
+                call(session)
+            finally:
+                event.remove(migrated, "before_cursor_execute", capture)
+            statements, captured[:] = list(captured), []
+            session.rollback()
+            assert statements, name
+            for statement, parameters in statements:
+                plan, full = full_scans(session.connection(), statement, parameters)
+                if full:
+                    scans.append(f"{name}: {' '.join(statement.split())}\n    {plan}")
+            session.rollback()
+    assert not scans, "full table scans:\n" + "\n".join(scans)
@@ -0,0 +1,103 @@
+import itertools
+from datetime import timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import SQLModel, create_engine, select
+
+from app.models import utcnow
+from app.models.item import Item
+from app.models.user import RevokedToken
+from app.routes.item.service import ItemService
+from app.utilities import db
+from app.utilities.cache import MemoryCacheBackend
+from app.utilities.response_cache import response_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def replica(monkeypatch, tmp_path):
+    replica = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    monkeypatch.setattr(db, "replica_engines", [replica])
+    monkeypatch.setattr(db, "_next_replica", itertools.cycle([0]))
+    monkeypatch.setattr(db, "recent_writers", MemoryCacheBackend(ttl=60))
+    yield replica
+    replica.dispose()
+
+
+async def test_reads_move_to_the_replica_and_release_the_primary(replica):
+    with db.RoutingSession(db.engine) as session:
+        # Authentication already read through the primary
+        session.execute(text("SELECT 1"))
+        assert session.in_transaction()
+        await db.route_reads(session, uuid4())
+        assert session.info["replica"] is replica
+        assert not session.in_transaction()
+        assert session.connection().engine is replica
+
+
+async def test_writer_reads_stay_on_the_primary(replica):
+    user_id = uuid4()
+    with db.RoutingSession(db.engine) as session:
+        session.info["user_id"] = user_id
+        session.add(RevokedToken(jti=uuid4().hex, expires_at=utcnow() + timedelta(minutes=1)))
+        session.commit()
+
+    with db.RoutingSession(db.engine) as session:
+        await db.route_reads(session, user_id)
+        assert "replica" not in session.info
+    with db.RoutingSession(db.engine) as session:
+        await db.route_reads(session, uuid4())
+        assert session.info["replica"] is replica
+
+
+async def test_stickiness_ends_after_its_ttl(replica, monkeypatch):
+    monkeypatch.setattr(db, "recent_writers", MemoryCacheBackend(ttl=0))
+    user_id = uuid4()
+    db.remember_writer(user_id)
+    with db.RoutingSession(db.engine) as session:
+        await db.route_reads(session, user_id)
+        assert session.info["replica"] is replica
+
+
+async def test_read_only_transaction_does_not_pin(replica):
+    user_id = uuid4()
+    with db.RoutingSession(db.engine) as session:
+        session.info["user_id"] = user_id
+        session.exec(select(RevokedToken).limit(1)).all()
+        session.commit()
+    assert db.recent_writers.get(user_id) is None
+
+
+async def test_replica_reads_are_not_cached(replica, monkeypatch):
+    # The replica has the schema but not yet the item written to the primary
+    SQLModel.metadata.create_all(replica)
+    monkeypatch.setattr(response_cache, "backend", MemoryCacheBackend(ttl=60))
+    user = SimpleNamespace(id=uuid4())
+    with db.RoutingSession(db.engine) as session:
+        session.add(Item(name="fresh", description="", is_done=False, user_id=user.id))
+        session.commit()
+
+    with db.RoutingSession(db.engine) as session:
+        await db.route_reads(session, uuid4())
+        assert ItemService.get_all_items(user, session=session)["items"] == []
+    with db.RoutingSession(db.engine) as session:
+        assert [item["name"] for item in ItemService.get_all_items(user, session=session)["items"]] == ["fresh"]
+
+
+async def test_writes_on_a_routed_session_go_to_the_primary(replica):
+    SQLModel.metadata.create_all(replica)
+    jti = uuid4().hex
+    with db.RoutingSession(db.engine) as session:
+        await db.route_reads(session, uuid4())
+        session.add(RevokedToken(jti=jti, expires_at=utcnow() + timedelta(minutes=1)))
+        session.commit()
+
+    query = select(RevokedToken).where(RevokedToken.jti == jti)
+    with db.RoutingSession(db.engine) as session:
+        assert session.exec(query).one()
+    with db.RoutingSession(replica) as session:
+        assert session.exec(query).all() == []
@@ -0,0 +1,100 @@
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.models.group import Group
+from app.models.item import Item
+from app.settings import settings
+from app.utilities import db
+from app.utilities.search import fallback_indexes
+
+pytestmark = pytest.mark.anyio
+
+PREFIX = settings.API_V1_STR
+
+
+async def _item_names(client, headers, q) -> list[str]:
+    response = await client.get(f"{PREFIX}/items/search", params={"q": q}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [item["name"] for item in response.json()["items"]]
+
+
+async def _group_names(client, headers, q) -> list[str]:
+    response = await client.get(f"{PREFIX}/groups/search/{q}", headers=headers)
+    assert response.status_code == 200, response.text
+    return [group["name"] for group in response.json()["groups"]]
+
+
+async def test_item_index_is_reused_until_the_items_change(client, auth):
+    headers = await auth()
+    await client.post(f"{PREFIX}/items/", json={"name": "oat milk", "description": "", "is_done": False}, headers=headers)
+    assert await _item_names(client, headers, "milk") == ["oat milk"]
+    builds = fallback_indexes.builds
+    assert await _item_names(client, headers, "milk") == ["oat milk"]
+    assert fallback_indexes.builds == builds
+
+    # Another worker writing the same database
+    with Session(db.engine) as session:
+        item = session.exec(select(Item).where(Item.name == "oat milk")).one()
+        item.name = "oat milkshake"
+        session.add(item)
+        session.commit()
+    assert await _item_names(client, headers, "shake") == ["oat milkshake"]
+    assert fallback_indexes.builds == builds + 1
+
+
+async def test_batch_update_reaches_the_item_index(client, auth):
+    headers = await auth()
+    response = await client.post(
+        f"{PREFIX}/items/batch",
+        json={"operations": [{"op": "create", "item": {"name": "green tea", "description": "", "is_done": False}}]},
+        headers=headers,
+    )
+    item_id = response.json()["results"][0]["item_id"]
+    assert await _item_names(client, headers, "tea") == ["green tea"]
+    await client.post(
+        f"{PREFIX}/items/batch",
+        json={"operations": [{"op": "update", "id": item_id, "item": {"name": "black coffee", "description": "", "is_done": False}}]},
+        headers=headers,
+    )
+    assert await _item_names(client, headers, "coffee") == ["black coffee"]
+
+
+async def test_group_index_sees_renames_and_joins(client, auth):
+    admin, member = await auth(), await auth()
+    response = await client.post(f"{PREFIX}/groups/", json={"name": "chess club", "description": ""}, headers=admin)
+    group_id = response.json()["group_id"]
+    assert await _group_names(client, admin, "chess") == ["chess club"]
+
+    with Session(db.engine) as session:
+        group = session.get(Group, UUID(group_id))
+        group.name = "go club"
+        session.add(group)
+        session.commit()
+    assert await _group_names(client, admin, "go club") == ["go club"]
+
+    assert await _group_names(client, member, "club") == []
+    member_id = (await client.post(f"{PREFIX}/auth/protected", headers=member)).json()["user"]["id"]
+    await client.post(f"{PREFIX}/groups/{group_id}/members/{member_id}", headers=admin)
+    assert await _group_names(client, member, "club") == ["go club"]
+
+
+def test_index_is_built_without_the_lock_held():
+    # Under run_sync the build's queries yield to the event loop; a search
+    # blocking on the lock there would never let the build resume
+    locked_during = []
+
+    def check(*args):
+        locked_during.append(fallback_indexes._lock.locked())
+
+    event.listen(db.engine, "before_cursor_execute", check)
+    try:
+        with Session(db.engine) as session:
+            user_id = uuid4()
+            query = select(Item).where(Item.user_id == user_id)
+            fallback_indexes.get(Item, session, query, ("items", user_id))
+    finally:
+        event.remove(db.engine, "before_cursor_execute", check)
+    assert locked_during and not any(locked_during)
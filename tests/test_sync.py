@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from app.routes.sync.service import SyncService
+from app.settings import settings
+from app.utilities.pagination import decode_cursor
+
+pytestmark = pytest.mark.anyio
+
+PREFIX = settings.API_V1_STR
+
+
+async def _sync(client, headers, since=None, limit=100) -> dict:
+    params = {"limit": limit, **({"since": since} if since else {})}
+    response = await client.get(f"{PREFIX}/sync/", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def _create(client, headers, name) -> str:
+    response = await client.post(
+        f"{PREFIX}/items/batch",
+        json={"operations": [{"op": "create", "item": {"name": name, "description": "", "is_done": False}}]},
+        headers=headers,
+    )
+    return response.json()["results"][0]["item_id"]
+
+
+async def test_changes_since_token(client, auth):
+    headers = await auth()
+    kept = await _create(client, headers, "kept")
+    dropped = await _create(client, headers, "dropped")
+    first = await _sync(client, headers)
+    assert {item["name"] for item in first["items"]} == {"kept", "dropped"}
+    assert not first["has_more"] and not first["reset"]
+
+    unchanged = await _sync(client, headers, first["token"])
+    assert unchanged["items"] == [] and unchanged["deleted_item_ids"] == []
+
+    await client.put(f"{PREFIX}/items/{kept}", json={"name": "renamed", "description": "", "is_done": True}, headers=headers)
+    await client.delete(f"{PREFIX}/items/{dropped}", headers=headers)
+    delta = await _sync(client, headers, first["token"])
+    assert [item["name"] for item in delta["items"]] == ["renamed"]
+    assert delta["deleted_item_ids"] == [dropped]
+    assert decode_cursor(delta["token"])["seq"] >= decode_cursor(first["token"])["seq"]
+
+
+async def test_membership_changes(client, auth):
+    admin, member = await auth(), await auth()
+    start = (await _sync(client, member))["token"]
+    group_id = (await client.post(f"{PREFIX}/groups/", json={"name": "sync group", "description": ""}, headers=admin)).json()["group_id"]
+    member_id = (await client.post(f"{PREFIX}/auth/protected", headers=member)).json()["user"]["id"]
+
+    await client.post(f"{PREFIX}/groups/{group_id}/members/{member_id}", headers=admin)
+    added = await _sync(client, member, start)
+    assert {row["group_id"] for row in added["members_added"]} == {group_id}
+
+    await client.delete(f"{PREFIX}/groups/{group_id}/members/{member_id}", headers=admin)
+    removed = await _sync(client, member, added["token"])
+    assert removed["members_removed"] == [{"group_id": group_id, "user_id": member_id}]
+
+
+async def test_pages_end_on_transaction_boundaries(client, auth):
+    headers = await auth()
+    start = (await _sync(client, headers))["token"]
+    await _create(client, headers, "alone")
+    lines = "\n".join(json.dumps({"name": f"bulk {i}", "description": "", "is_done": False}) for i in range(5))
+    await client.post(f"{PREFIX}/items/import", content=lines, headers=headers)
+
+    first = await _sync(client, headers, start, limit=3)
+    assert [item["name"] for item in first["items"]] == ["alone"]
+    assert first["has_more"]
+    # The import is one transaction: it comes back whole despite the limit
+    second = await _sync(client, headers, first["token"], limit=3)
+    assert len(second["items"]) == 5
+    assert not second["has_more"]
+
+
+async def test_token_older_than_pruned_tombstones_resets(client, auth, monkeypatch):
+    headers = await auth()
+    item_id = await _create(client, headers, "short lived")
+    old = (await _sync(client, headers))["token"]
+    await client.delete(f"{PREFIX}/items/{item_id}", headers=headers)
+    await _create(client, headers, "later")
+
+    monkeypatch.setattr(settings, "SYNC_TOMBSTONE_DAYS", -1)
+    monkeypatch.setattr(SyncService, "_next_prune", 0)
+    reset = await _sync(client, headers, old)
+    assert reset["reset"] and reset["items"] == []
+
+    after = await _sync(client, headers, reset["token"])
+    assert not after["reset"]
+
+
+async def test_invalid_token(client, auth):
+    response = await client.get(f"{PREFIX}/sync/", params={"since": "not-a-token"}, headers=await auth())
+    assert response.status_code == 400
+
+
+async def test_joining_a_group_brings_its_existing_members(client, auth):
+    admin, early, newcomer = await auth(), await auth(), await auth()
+    ids = {}
+    for name, headers in (("admin", admin), ("early", early), ("newcomer", newcomer)):
+        ids[name] = (await client.post(f"{PREFIX}/auth/protected", headers=headers)).json()["user"]["id"]
+    group_id = (await client.post(f"{PREFIX}/groups/", json={"name": "old group", "description": ""}, headers=admin)).json()["group_id"]
+    await client.post(f"{PREFIX}/groups/{group_id}/members/{ids['early']}", headers=admin)
+    start = (await _sync(client, newcomer))["token"]
+
+    await client.post(f"{PREFIX}/groups/{group_id}/members/{ids['newcomer']}", headers=admin)
+    joined = await _sync(client, newcomer, start)
+    assert {row["user_id"] for row in joined["members_added"]} == set(ids.values())
+
+    # Only the join itself is news to the members already there
+    assert [row["user_id"] for row in (await _sync(client, early, start))["members_added"]] == [ids["newcomer"]]
+
+
+async def test_changes_are_scoped_to_the_user(client, auth):
+    mine, theirs = await auth(), await auth()
+    start = (await _sync(client, mine))["token"]
+    await _create(client, mine, "mine")
+    dropped = await _create(client, theirs, "theirs")
+    await client.delete(f"{PREFIX}/items/{dropped}", headers=theirs)
+    await client.post(f"{PREFIX}/groups/", json={"name": "their group", "description": ""}, headers=theirs)
+
+    delta = await _sync(client, mine, start)
+    assert [item["name"] for item in delta["items"]] == ["mine"]
+    assert delta["deleted_item_ids"] == []
+    assert delta["members_added"] == [] and delta["members_removed"] == []